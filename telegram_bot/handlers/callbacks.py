@@ -15,10 +15,17 @@ WB_BACKEND_URL = os.getenv("WB_BACKEND_URL")
 
 bot = None
 
-async def get_drivers():
+async def get_drivers(available=False):
+    """
+    Список водителей; available=True — только свободные сегодня
+    (без заказов в работе, рейсов и смен в календаре)
+    """
     try:
         logger.info(f"Getting drivers from {WB_BACKEND_URL}/orders/transport/drivers/")
-        response = requests.get(f"{WB_BACKEND_URL}/orders/transport/drivers/")
+        response = requests.get(
+            f"{WB_BACKEND_URL}/orders/transport/drivers/",
+            params={"available": "true"} if available else None,
+        )
         if response.status_code == 200:
             return response.json()
         logger.warning(f"Failed to get drivers: {response.status_code} - {response.text}")
@@ -28,10 +35,16 @@ async def get_drivers():
         return []
 
 # Функция для получения списка грузовиков
-async def get_trucks():
+async def get_trucks(available=False):
+    """
+    Список грузовиков; available=True — только свободные сегодня
+    """
     try:
         logger.info(f"Getting trucks from {WB_BACKEND_URL}/orders/transport/trucks/")
-        response = requests.get(f"{WB_BACKEND_URL}/orders/transport/trucks/")
+        response = requests.get(
+            f"{WB_BACKEND_URL}/orders/transport/trucks/",
+            params={"available": "true"} if available else None,
+        )
         if response.status_code == 200:
             return response.json()
         logger.warning(f"Failed to get trucks: {response.status_code} - {response.text}")
@@ -52,6 +65,12 @@ async def reject_order(callback: CallbackQuery):
             f"{WB_BACKEND_URL}/orders/{order_id}/reject/",
             json={"status": "rejected"}
         )
+
+        if response.status_code == 409:
+            logger.info(f"Order {order_id} already processed: {response.text}")
+            await callback.message.edit_reply_markup(reply_markup=None)
+            await callback.answer("Заказ уже обработан другим администратором", show_alert=True)
+            return
         
         if response.status_code in [200, 201, 202, 204]:
             logger.info(f"Order {order_id} rejected successfully")
@@ -130,8 +149,8 @@ async def accept_order(callback: CallbackQuery):
         message_lines = callback.message.text.split('\n')
         order_id_line = message_lines[0]
         
-        # Получаем список водителей
-        drivers = await get_drivers()
+        # Получаем список свободных водителей
+        drivers = await get_drivers(available=True)
         if not drivers:
             await callback.answer("Нет доступных водителей")
             return
@@ -173,8 +192,8 @@ async def select_driver(callback: CallbackQuery):
         driver_id = parts[1]
         order_id = parts[2]
 
-        # Получаем список грузовиков
-        trucks = await get_trucks()
+        # Получаем список свободных грузовиков
+        trucks = await get_trucks(available=True)
         if not trucks:
             await callback.answer("Нет доступных грузовиков")
             return
@@ -264,15 +283,23 @@ async def confirm_selection(callback: CallbackQuery):
         truck_id = parts[2]
         order_id = parts[3]
 
-        # Отправляем запрос на бэкенд для назначения водителя и грузовика
+        # Отправляем запрос на бэкенд для назначения водителя и грузовика;
+        # expected_status: если заказ уже принял другой администратор, вернется 409
         response = requests.post(
             f"{WB_BACKEND_URL}/orders/{order_id}/assign_driver/",
             json={
                 "driver_id": driver_id,
-                "truck_id": truck_id
+                "truck_id": truck_id,
+                "expected_status": "new"
             }
         )
 
+        if response.status_code == 409:
+            logger.info(f"Order {order_id} already processed: {response.text}")
+            await callback.message.edit_reply_markup(reply_markup=None)
+            await callback.answer("Заказ уже обработан другим администратором", show_alert=True)
+            return
+
         if response.status_code == 200:
             result = response.json()
             logger.info(f"Driver and truck assigned successfully: {result}")
@@ -109,6 +109,50 @@ def build_message_for_admin(order_data: Dict) -> str:
         logger.error(f"Error building admin message: {str(e)}")
         return "Ошибка при формировании сообщения для заказа"
 
+def format_sequence_numbers(sequence_numbers) -> str:
+    return ", ".join(f"#{number}" for number in sequence_numbers)
+
+def build_trip_message(trip_data: Dict) -> str:
+    """
+    Создает сообщение для администраторов о запланированном рейсе
+    """
+    sequence_numbers = trip_data.get("sequence_numbers", [])
+    message_parts = [
+        f"🚛 Рейс #{trip_data.get('trip_id', 'N/A')} на {trip_data.get('date', '')}",
+        f"🏢 Склад: {trip_data.get('warehouse_name', '')}",
+        f"🚚 Грузовик: {trip_data.get('truck_info', '')}",
+        f"👨‍✈️ Водитель: {trip_data.get('driver_name', '')}",
+        f"\n📦 Заказов: {len(sequence_numbers)}",
+        format_sequence_numbers(sequence_numbers),
+    ]
+    if (utilization := trip_data.get("utilization")) is not None:
+        message_parts.append(f"\n📊 Загрузка: {utilization}%")
+    return "\n".join(message_parts)
+
+def build_status_batch_message(batch_data: Dict) -> str:
+    """
+    Создает сообщение для администраторов о массовой смене статуса заказов
+    """
+    sequence_numbers = batch_data.get("sequence_numbers", [])
+    status = batch_data.get("status_display") or batch_data.get("status", "")
+    return "\n".join([
+        f"🔄 Статус «{status}»",
+        f"📦 Заказов: {len(sequence_numbers)}",
+        format_sequence_numbers(sequence_numbers),
+    ])
+
+def build_assignment_batch_message(batch_data: Dict) -> str:
+    """
+    Создает сообщение для администраторов о назначении экипажа на несколько заказов
+    """
+    sequence_numbers = batch_data.get("sequence_numbers", [])
+    return "\n".join([
+        f"✅ Назначен экипаж на {len(sequence_numbers)} заказов",
+        format_sequence_numbers(sequence_numbers),
+        f"\n🚚 Грузовик: {batch_data.get('truck_info', '')}",
+        f"👨‍✈️ Водитель: {batch_data.get('driver_name', '')}",
+    ])
+
 def build_user_message(notification_data: Dict) -> str:
     """
     Создает текстовое сообщение для пользователя
@@ -154,7 +198,11 @@ def build_user_message(notification_data: Dict) -> str:
             driver_phone = notification_data.get("driver_phone", "")
             truck_info = notification_data.get("truck_info", "")
             
-            message_text = f"✅ Ваш заказ #{sequence_number} принят!\n\n"
+            sequence_numbers = notification_data.get("sequence_numbers", [])
+            if len(sequence_numbers) > 1:
+                message_text = f"✅ Ваши заказы {format_sequence_numbers(sequence_numbers)} приняты!\n\n"
+            else:
+                message_text = f"✅ Ваш заказ #{sequence_number} принят!\n\n"
             
             # Добавляем информацию о водителе и грузовике
             driver_info = []
@@ -172,6 +220,24 @@ def build_user_message(notification_data: Dict) -> str:
                 
             return message_text
             
+        elif notification_type == "trip_assigned":
+            # Несколько заказов клиента в одном рейсе — одно сообщение
+            sequence_numbers = notification_data.get("sequence_numbers", [])
+            if len(sequence_numbers) > 1:
+                message_text = f"✅ Ваши заказы {format_sequence_numbers(sequence_numbers)} приняты!\n\n"
+            else:
+                message_text = f"✅ Ваш заказ {format_sequence_numbers(sequence_numbers)} принят!\n\n"
+
+            trip_info = [f"📅 Дата забора: {notification_data.get('date', '')}"]
+            if warehouse_name := notification_data.get("warehouse_name"):
+                trip_info.append(f"🏢 Склад: {warehouse_name}")
+            trip_info.append(f"🚚 Грузовик: {notification_data.get('truck_info', '')}")
+            trip_info.append(f"👨‍✈️ Водитель: {notification_data.get('driver_name', 'Не указан')}")
+            if driver_phone := notification_data.get("driver_phone"):
+                trip_info.append(f"📱 Телефон: {driver_phone}")
+
+            return message_text + "\n".join(trip_info)
+
         elif notification_type == "order_rejected":
             # Формируем сообщение для клиента об отклонении заказа
             message_text = f"❌ Ваш заказ #{sequence_number} был отклонен.\n\n"
@@ -253,6 +319,14 @@ def send_admin_notification(order_data: Dict) -> bool:
         return False
         
     
+    # Рейс и массовые операции — информационные сообщения без кнопок принятия заказа
+    if order_data.get("notification_type") == "trip_planned":
+        return send_telegram_message(ADMIN_GROUP_ID, build_trip_message(order_data))
+    if order_data.get("notification_type") == "orders_status_changed":
+        return send_telegram_message(ADMIN_GROUP_ID, build_status_batch_message(order_data))
+    if order_data.get("notification_type") == "orders_assigned":
+        return send_telegram_message(ADMIN_GROUP_ID, build_assignment_batch_message(order_data))
+
     # Создаем текст сообщения
     message_text = build_message_for_admin(order_data)
     
@@ -2,16 +2,21 @@ from django.contrib import admin
 
 from .models import (
     AdditionalService,
+    ArchivedOrder,
     BoxPricing,
     City,
     Container,
+    DailyWarehouseStats,
     Marketplace,
     Order,
+    OrderEvent,
     PalletPricing,
     Pricing,
     User,
     Warehouse,
     Driver,
+    DriverShift,
+    Trip,
     Truck,
 )
 
@@ -42,9 +47,22 @@ class OrderAdmin(admin.ModelAdmin):
         "created_at",
     )
     search_fields = ("id", "client_name", "phone_number")
-    list_filter = ("status", "warehouse")
+    list_filter = ("status", "warehouse", "box_container_type", "pallet_container_type")
+    list_select_related = ("warehouse__marketplace",)
     readonly_fields = ("total_price",)
     filter_horizontal = ("services",)
+    # Колонки для списка: list_display и __str__ (склад выводится с маркетплейсом)
+    changelist_columns = (
+        "id",
+        "sequence_number",
+        "client_name",
+        "phone_number",
+        "status",
+        "total_price",
+        "created_at",
+        "warehouse__name",
+        "warehouse__marketplace__name",
+    )
 
     fieldsets = (
         ("Основная информация", {"fields": ("status", "warehouse", "total_price")}),
@@ -66,6 +84,8 @@ class OrderAdmin(admin.ModelAdmin):
                 "fields": (
                     "cargo_type",
                     "container_type",
+                    "box_container_type",
+                    "pallet_container_type",
                     "box_count",
                     "pallet_count",
                     "length",
@@ -81,6 +101,19 @@ class OrderAdmin(admin.ModelAdmin):
         ),
     )
 
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        # Форма редактирования использует тот же queryset и читает все поля
+        match = request.resolver_match
+        if match and match.url_name == "orders_order_changelist":
+            queryset = queryset.only(*self.changelist_columns)
+        return queryset
+
+    def delete_queryset(self, request, queryset):
+        # Удаление по одному, чтобы Order.delete обновил дневную статистику
+        for order in queryset:
+            order.delete()
+
 
 class PricingAdmin(admin.ModelAdmin):
     list_display = (
@@ -238,12 +271,84 @@ class DriverAdmin(admin.ModelAdmin):
 
 @admin.register(Truck)
 class TruckAdmin(admin.ModelAdmin):
-    list_display = ('brand', 'model', 'plate_number', 'is_active', 'created_at')
+    list_display = (
+        'brand', 'model', 'plate_number', 'pallet_capacity', 'max_weight_kg', 'cargo_volume_m3',
+        'is_active', 'created_at',
+    )
     list_filter = ('is_active', 'brand')
     search_fields = ('brand', 'model', 'plate_number')
     ordering = ('-created_at',)
 
 
+@admin.register(Trip)
+class TripAdmin(admin.ModelAdmin):
+    list_display = ('id', 'date', 'warehouse', 'driver', 'truck', 'status', 'created_at')
+    list_filter = ('status', 'warehouse')
+    date_hierarchy = 'date'
+    list_select_related = ('warehouse', 'driver', 'truck')
+
+
+@admin.register(DriverShift)
+class DriverShiftAdmin(admin.ModelAdmin):
+    list_display = ('driver', 'starts_at', 'ends_at', 'order', 'trip', 'comment')
+    list_filter = ('driver',)
+    date_hierarchy = 'starts_at'
+    list_select_related = ('driver',)
+    raw_id_fields = ('order', 'trip')
+
+
+@admin.register(DailyWarehouseStats)
+class DailyWarehouseStatsAdmin(admin.ModelAdmin):
+    list_display = ('date', 'warehouse', 'orders_count', 'canceled_count', 'revenue', 'box_count', 'pallet_count')
+    list_filter = ('warehouse',)
+    date_hierarchy = 'date'
+    list_select_related = ('warehouse',)
+
+    # Сводки поддерживаются автоматически, ручное редактирование запрещено
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    list_display = ('sequence_number', 'status', 'warehouse', 'total_price', 'created_at', 'archived_at')
+    list_filter = ('status',)
+    search_fields = ('id', 'sequence_number', 'telegram_user_id')
+    list_select_related = ('warehouse',)
+    show_full_result_count = False
+
+    # Архив только для чтения
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(OrderEvent)
+class OrderEventAdmin(admin.ModelAdmin):
+    list_display = ('at', 'order_id', 'type', 'from_status', 'to_status')
+    list_filter = ('type',)
+    search_fields = ('order__id',)
+    date_hierarchy = 'at'
+
+    # Журнал только для чтения
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
 # Регистрация моделей в админ-панели
 # Основные рабочие модели
 admin.site.register(Order, OrderAdmin)
@@ -0,0 +1,167 @@
+"""
+Архивация закрытых заказов.
+
+Заказы в статусах ArchivedOrder.CLOSED_STATUSES, созданные раньше заданного
+месяца, пачками переносятся в ArchivedOrder и удаляются из основной таблицы.
+Перенос пачки выполняется в одной транзакции вместе с записью события
+"archived" в журнал. Дневная статистика складов не меняется: архивные
+заказы учитываются в ней так же, как активные.
+"""
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import pubsub
+from .models import ArchivedOrder, Order, OrderEvent
+from .serializers import OrderSerializer
+
+TRUE_VALUES = ("1", "true", "yes", "on")
+# Архивных заказов в списке /orders/?include_archived=true за один запрос
+ARCHIVED_PAGE_SIZE = 100
+MAX_ARCHIVED_PAGE_SIZE = 1000
+# Фильтры списка заказов, для которых в архиве есть колонки
+ARCHIVED_FILTER_FIELDS = ("status", "warehouse_id")
+
+
+def include_archived(params):
+    """
+    Значение флага include_archived из параметров запроса
+    """
+    return str(params.get("include_archived", "")).lower() in TRUE_VALUES
+
+
+def archived_page(params):
+    """
+    (limit, offset) архивной части списка из параметров archived_limit и
+    archived_offset. ValueError при ошибке
+    """
+    limit = int(params.get("archived_limit", ARCHIVED_PAGE_SIZE))
+    offset = int(params.get("archived_offset", 0))
+    if limit <= 0 or offset < 0:
+        raise ValueError("archived_limit должен быть больше 0, archived_offset — не меньше 0")
+    return min(limit, MAX_ARCHIVED_PAGE_SIZE), offset
+
+
+def archived_queryset(filters):
+    """
+    Архивные заказы, подходящие под фильтры списка, или None, если фильтр
+    задан по колонке, которой в архиве нет (типы контейнеров): такие заказы
+    в архиве не найти, и архивная часть не возвращается
+    """
+    if any(field not in ARCHIVED_FILTER_FIELDS for field in filters):
+        return None
+    return ArchivedOrder.objects.filter(**filters)
+
+
+def month_start(value):
+    value = timezone.localtime(value)
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(value, months):
+    month_index = value.month - 1 + months
+    return value.replace(year=value.year + month_index // 12, month=month_index % 12 + 1)
+
+
+def cutoff_for(months, now=None):
+    """
+    Начало месяца, отстоящего на months месяцев от текущего.
+    Архивируются заказы, созданные раньше этой даты
+    """
+    return add_months(month_start(now or timezone.now()), -months)
+
+
+def is_partitioned():
+    return connection.vendor == "postgresql"
+
+
+def ensure_partitions(months):
+    """
+    Создает месячные секции архива для переданных начал месяцев (PostgreSQL)
+    """
+    if not is_partitioned():
+        return
+    table = ArchivedOrder._meta.db_table
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        for month in sorted(months):
+            # Границы секции подставляются литералами: DDL не принимает параметры
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {quote(f'{table}_p{month:%Y%m}')} "
+                f"PARTITION OF {quote(table)} "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+            )
+
+
+def archived_payload(archived, fields=None):
+    """
+    Представление архивного заказа для API, при fields — только эти поля
+    """
+    payload = {**archived.payload, "archived": True, "archived_at": archived.archived_at}
+    if fields:
+        payload = {name: value for name, value in payload.items() if name in fields}
+    return payload
+
+
+def candidates(cutoff):
+    return Order.objects.filter(status__in=ArchivedOrder.CLOSED_STATUSES, created_at__lt=cutoff)
+
+
+def archive_batch(cutoff, batch_size):
+    """
+    Переносит в архив одну пачку заказов. Возвращает число перенесенных
+    """
+    with transaction.atomic():
+        orders = list(
+            candidates(cutoff)
+            .select_related("driver", "truck")
+            .prefetch_related("services")
+            .select_for_update(skip_locked=True, of=("self",))
+            .order_by("created_at")[:batch_size]
+        )
+        if not orders:
+            return 0
+
+        now = timezone.now()
+        ensure_partitions({month_start(order.created_at) for order in orders})
+        ArchivedOrder.objects.bulk_create(
+            ArchivedOrder(
+                id=order.id,
+                sequence_number=order.sequence_number,
+                status=order.status,
+                created_at=order.created_at,
+                updated_at=order.updated_at,
+                archived_at=now,
+                warehouse_id=order.warehouse_id,
+                telegram_user_id=order.telegram_user_id,
+                total_price=order.total_price,
+                box_count=order.box_count,
+                pallet_count=order.pallet_count,
+                payload=OrderSerializer(order).data,
+            )
+            for order in orders
+        )
+        events = OrderEvent.objects.bulk_create(
+            OrderEvent(
+                order_id=order.id,
+                warehouse_id=order.warehouse_id,
+                type="archived",
+                from_status=order.status,
+                at=now,
+            )
+            for order in orders
+        )
+        pubsub.publish(events)
+        # Удаление запросом, минуя Order.delete: статистика не должна уменьшаться
+        Order.objects.filter(pk__in=[order.id for order in orders]).delete()
+    return len(orders)
+
+
+def archive_orders(cutoff, batch_size=500):
+    """
+    Переносит в архив все подходящие заказы, возвращая размер каждой пачки
+    """
+    while True:
+        moved = archive_batch(cutoff, batch_size)
+        if not moved:
+            return
+        yield moved
@@ -0,0 +1,53 @@
+"""
+Свободные водители и грузовики (?available=true в /orders/transport/).
+
+Водитель или грузовик занят в день забора, если на него есть заказ в работе
+(accepted, processing) с забором в этот день или раньше — заказ прошлых дней,
+который еще не выполнен, тоже занимает экипаж, — или незавершенный рейс
+в этот день. Проверка — один запрос с NOT EXISTS по заказам (индексы
+(driver_id, status, created_at) и (truck_id, status, created_at) только по
+заказам в работе) и по рейсам.
+Водитель занят и тогда, когда у него есть смена в этот день (или в
+заданном интервале) — по календарю orders/schedule.py.
+"""
+import datetime
+
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from . import loading, schedule
+from .models import Order, Trip
+from .trips import BUSY_STATUSES
+
+
+def parse_at(value):
+    """
+    День забора из параметра at: дата (YYYY-MM-DD) или момент времени в ISO 8601.
+    По умолчанию сегодня. ValueError при ошибке формата
+    """
+    if not value:
+        return timezone.localdate()
+    if len(value) == 10:
+        return datetime.date.fromisoformat(value)
+    moment = datetime.datetime.fromisoformat(value)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return timezone.localdate(moment)
+
+
+def available(queryset, field, day, window=None):
+    """
+    Водители (field="driver") или грузовики (field="truck") из queryset,
+    свободные в день day. window — интервал для проверки смен водителей,
+    по умолчанию весь день
+    """
+    start, end = loading.day_bounds(day)
+    if field == "driver":
+        queryset = queryset.exclude(pk__in=schedule.busy_drivers(*(window or (start, end))))
+    busy_orders = Order.objects.filter(
+        **{field: OuterRef("pk")},
+        status__in=loading.ACTIVE_STATUSES,
+        created_at__lt=end,
+    )
+    busy_trips = Trip.objects.filter(**{field: OuterRef("pk")}, date=day, status__in=BUSY_STATUSES)
+    return queryset.exclude(Exists(busy_orders)).exclude(Exists(busy_trips))
@@ -0,0 +1,31 @@
+"""
+Общие утилиты для бенчмарков и нагрузочных тестов
+"""
+import statistics
+
+
+def percentile(samples, pct):
+    """
+    Возвращает перцентиль pct (0-100) по методу ближайшего ранга
+    """
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+def summarize(samples):
+    """
+    Сводная статистика по выборке задержек в миллисекундах
+    """
+    if not samples:
+        return {"count": 0, "mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    return {
+        "count": len(samples),
+        "mean": round(statistics.fmean(samples), 3),
+        "p50": round(percentile(samples, 50), 3),
+        "p95": round(percentile(samples, 95), 3),
+        "p99": round(percentile(samples, 99), 3),
+        "max": round(max(samples), 3),
+    }
@@ -0,0 +1,216 @@
+"""
+Микробенчмарки путей расчета стоимости.
+
+Каждый случай из матрицы CARGO_CASES × SERVICE_COUNTS прогоняется через
+три реализации расчета: Order.calculate_price, PricingViewSet.calculate_price
+и OrderSerializer.calculate_order_price. Для каждой пары (случай, путь)
+замеряются операции в секунду и число SQL-запросов на один расчет.
+"""
+import time
+from decimal import Decimal
+
+from django.db import connection
+from rest_framework.test import APIRequestFactory
+
+from orders.models import (
+    AdditionalService,
+    BoxPricing,
+    City,
+    Marketplace,
+    Order,
+    PalletPricing,
+    Pricing,
+    Warehouse,
+)
+from orders.serializers import OrderSerializer
+from orders.views import PricingViewSet
+
+PATHS = ("order", "view", "serializer")
+SERVICE_COUNTS = (0, 5, 10)
+
+# Груз: (тип контейнера коробок, тип паллет, размеры)
+CARGO_CASES = {
+    "box-60x40x40": {"box_container_type": "60x40x40 см"},
+    "box-50x40x40": {"box_container_type": "50x40x40 см"},
+    "box-45x45x45": {"box_container_type": "45x45x45 см"},
+    "box-custom-small": {
+        "box_container_type": "Другой размер",
+        "dimensions": {"length": 30, "width": 30, "height": 30},
+    },
+    "box-custom-medium": {
+        "box_container_type": "Другой размер",
+        "dimensions": {"length": 60, "width": 50, "height": 50},
+    },
+    "box-custom-large": {
+        "box_container_type": "Другой размер",
+        "dimensions": {"length": 80, "width": 60, "height": 60},
+    },
+    "pallet-0-200": {"pallet_container_type": "0-200 кг"},
+    "pallet-200-300": {"pallet_container_type": "200-300 кг"},
+    "pallet-300-400": {"pallet_container_type": "300-400 кг"},
+    "pallet-400-500": {"pallet_container_type": "400-500 кг"},
+    "pallet-custom-750": {
+        "pallet_container_type": "Другой вес",
+        "dimensions": {"weight": 750},
+    },
+    "pallet-custom-1200": {
+        "pallet_container_type": "Другой вес",
+        "dimensions": {"weight": 1200},
+    },
+}
+
+BOX_COUNT = 10
+PALLET_COUNT = 4
+
+
+def build_fixture():
+    """
+    Создает склад, тарифы и 10 услуг. Вызывается внутри транзакции,
+    которая откатывается после прогона.
+    """
+    marketplace = Marketplace.objects.create(name="Бенчмарк")
+    city = City.objects.create(name="Бенчмарк")
+    warehouse = Warehouse.objects.create(name="Бенчмарк", marketplace=marketplace, city=city)
+    Pricing.objects.create(
+        name="Доставка", pricing_type="delivery", warehouse=warehouse, base_price=Decimal("1500.00")
+    )
+    Pricing.objects.create(
+        name="Коробка", pricing_type="box", base_price=Decimal("0"), unit_price=Decimal("450.00")
+    )
+    Pricing.objects.create(
+        name="Паллета", pricing_type="pallet", base_price=Decimal("0"), unit_price=Decimal("2000.00")
+    )
+    for size, price in BoxPricing.get_default_prices().items():
+        if size.startswith("V") or size.startswith("0.1"):
+            BoxPricing.objects.get_or_create(
+                size_category="Другой размер", volume_range=size, defaults={"price": price}
+            )
+        else:
+            BoxPricing.objects.get_or_create(size_category=size, defaults={"price": price})
+    for category, price in PalletPricing.get_default_prices().items():
+        PalletPricing.objects.get_or_create(weight_category=category, defaults={"price": price})
+    services = [
+        AdditionalService.objects.create(name=f"Услуга {i}", price=Decimal("300.00"), service_type="other")
+        for i in range(max(SERVICE_COUNTS))
+    ]
+    return warehouse, services
+
+
+def make_cargo(spec):
+    cargo = dict(spec)
+    cargo["box_count"] = BOX_COUNT if "box_container_type" in spec else 0
+    cargo["pallet_count"] = PALLET_COUNT if "pallet_container_type" in spec else 0
+    cargo.setdefault("dimensions", {})
+    return cargo
+
+
+def order_callable(warehouse, cargo, services):
+    dimensions = cargo["dimensions"]
+    order = Order.objects.create(
+        warehouse=warehouse,
+        cargo_type="box" if cargo["box_count"] else "pallet",
+        box_container_type=cargo.get("box_container_type"),
+        pallet_container_type=cargo.get("pallet_container_type"),
+        box_count=cargo["box_count"],
+        pallet_count=cargo["pallet_count"],
+        length=dimensions.get("length"),
+        width=dimensions.get("width"),
+        height=dimensions.get("height"),
+        weight=dimensions.get("weight"),
+        client_name="Бенчмарк",
+        phone_number="+70000000000",
+        additional_services={"cargo": cargo},
+    )
+    order.services.set(services)
+    return order.calculate_price
+
+
+def view_callable(warehouse, cargo, services):
+    factory = APIRequestFactory()
+    view = PricingViewSet.as_view({"post": "calculate_price"})
+    payload = {
+        "delivery": {"warehouse_id": warehouse.id},
+        "cargo": cargo,
+        "additional_services": [service.id for service in services],
+    }
+
+    def call():
+        response = view(factory.post("/orders/calculate-price/", payload, format="json"))
+        if response.status_code != 200:
+            raise RuntimeError(f"calculate_price вернул {response.status_code}: {response.data}")
+        return response
+
+    return call
+
+
+def serializer_callable(warehouse, cargo, services):
+    # Устаревший формат формы: только тип контейнера и количество
+    cargo_type = {"quantities": {}}
+    if cargo["box_count"]:
+        cargo_type["quantities"]["Коробка"] = cargo["box_count"]
+        cargo_type["selectedBoxSizes"] = [cargo["box_container_type"]]
+    if cargo["pallet_count"]:
+        cargo_type["quantities"]["Паллета"] = cargo["pallet_count"]
+        cargo_type["selectedPalletWeights"] = [cargo["pallet_container_type"]]
+    data = {
+        "delivery": {"warehouse": warehouse.id},
+        "cargoType": cargo_type,
+        "additionalServices": [service.id for service in services],
+    }
+    serializer = OrderSerializer()
+    return lambda: serializer.calculate_order_price(data)
+
+
+CALLABLES = {
+    "order": order_callable,
+    "view": view_callable,
+    "serializer": serializer_callable,
+}
+
+
+def measure(func, iterations, repeat=3):
+    """
+    Возвращает (операций в секунду, SQL-запросов на вызов).
+    Скорость берется по лучшему из repeat прогонов: более медленные
+    прогоны отражают шум машины, а не код.
+    """
+    queries = 0
+
+    def count(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+
+    func()
+    # Счетчик через execute_wrapper: connection.queries ограничен 9000
+    # записями и при DEBUG быстро заполняется
+    with connection.execute_wrapper(count):
+        func()
+
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        best = min(best, time.perf_counter() - started)
+    return iterations / best, queries
+
+
+def run(iterations=100, repeat=3, paths=PATHS):
+    """
+    Прогоняет матрицу случаев. Должен вызываться внутри транзакции.
+    Возвращает словарь {"случай/услуги/путь": {"ops_per_sec", "queries"}}
+    """
+    warehouse, services = build_fixture()
+    results = {}
+    for case, spec in CARGO_CASES.items():
+        cargo = make_cargo(spec)
+        for service_count in SERVICE_COUNTS:
+            for path in paths:
+                func = CALLABLES[path](warehouse, cargo, services[:service_count])
+                ops, queries = measure(func, iterations, repeat)
+                results[f"{case}/services-{service_count}/{path}"] = {
+                    "ops_per_sec": round(ops, 1),
+                    "queries": queries,
+                }
+    return results
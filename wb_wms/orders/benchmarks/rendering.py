@@ -0,0 +1,55 @@
+"""
+Бенчмарк кодирования и разбора JSON для списка заказов.
+
+Заказы сериализуются OrderSerializer один раз, после чего одни и те же
+данные кодируются стандартным JSONRenderer DRF и FastJSONRenderer,
+а полученное тело разбирается JSONParser и FastJSONParser.
+"""
+import io
+import time
+
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from orders.models import Order
+from orders.renderers import FastJSONParser, FastJSONRenderer
+from orders.serializers import OrderSerializer
+
+RENDERERS = {"json": JSONRenderer, "fast": FastJSONRenderer}
+PARSERS = {"json": JSONParser, "fast": FastJSONParser}
+
+
+def load_payload(count):
+    """
+    Данные ответа списка для count последних заказов и время их сериализации
+    """
+    queryset = OrderSerializer.setup_queryset(Order.objects.order_by("-created_at"))[:count]
+    started = time.perf_counter()
+    data = OrderSerializer(queryset, many=True).data
+    return data, time.perf_counter() - started
+
+
+def best_of(func, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def run(count=10000, repeat=5):
+    """
+    Возвращает число заказов, время сериализации и лучшее из repeat
+    прогонов время кодирования и разбора (секунды) для каждой реализации
+    """
+    data, serialize_seconds = load_payload(count)
+    results = {}
+    for name, renderer_class in RENDERERS.items():
+        renderer = renderer_class()
+        render_seconds, body = best_of(lambda: renderer.render(data, "application/json"), repeat)
+        parser = PARSERS[name]()
+        parse_seconds, _ = best_of(lambda: parser.parse(io.BytesIO(body), "application/json", {}), repeat)
+        results[name] = {"render": render_seconds, "parse": parse_seconds, "bytes": len(body)}
+    return {"orders": len(data), "serialize": serialize_seconds, "results": results}
@@ -0,0 +1,46 @@
+"""
+Проверки конфигурации, выполняемые Django при старте (runserver, migrate, check)
+"""
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+from django.db import DatabaseError, connections
+
+
+@register()
+def check_connection_settings(app_configs, **kwargs):
+    """
+    Проверяет настройки постоянных соединений с БД
+    """
+    errors = []
+    database = settings.DATABASES["default"]
+
+    max_age = database.get("CONN_MAX_AGE", 0)
+    if max_age is not None and (not isinstance(max_age, int) or max_age < 0):
+        errors.append(
+            Error(
+                f"Некорректное значение DB_CONN_MAX_AGE: {max_age!r}",
+                hint="Укажите неотрицательное число секунд или 'none'.",
+                id="orders.E001",
+            )
+        )
+
+    return errors
+
+
+@register(Tags.database)
+def check_database_available(app_configs, databases=None, **kwargs):
+    """
+    Проверяет, что к БД можно подключиться (manage.py check --database default)
+    """
+    errors = []
+    for alias in databases or []:
+        try:
+            connections[alias].ensure_connection()
+        except DatabaseError as e:
+            errors.append(
+                Error(
+                    f"Не удалось подключиться к базе данных '{alias}': {e}",
+                    id="orders.E005",
+                )
+            )
+    return errors
@@ -0,0 +1,60 @@
+"""
+Условные GET-запросы (ETag / Last-Modified) для заказов.
+
+Версия заказа — его updated_at, версия списка — число заказов и максимальный
+updated_at по отфильтрованному набору. Обе считаются одним легким запросом
+до сериализации, поэтому на 304 не тратится работа по сборке ответа.
+В ETag также входят параметры запроса и формат ответа: ?fields=, фильтры
+и include_archived дают разные представления одного ресурса.
+
+Версия учитывает только строку заказа: изменения водителя, грузовика или
+услуг, которые не сохраняют сам заказ, ее не меняют. Массовые обновления
+заказов в обход Order.save должны сами выставлять updated_at.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def make_etag(request, *parts):
+    """
+    ETag из версии ресурса, параметров запроса и формата ответа
+    """
+    renderer = getattr(request, "accepted_renderer", None)
+    key = ":".join(
+        str(part)
+        for part in (*parts, request.META.get("QUERY_STRING", ""), getattr(renderer, "format", ""))
+    )
+    return f'"{hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()}"'
+
+
+def list_version(queryset, field="updated_at"):
+    """
+    Версия набора: (число строк, максимальное значение field)
+    """
+    version = queryset.order_by().aggregate(count=Count("pk"), last=Max(field))
+    return version["count"], version["last"]
+
+
+def not_modified(request, etag, last_modified=None):
+    """
+    Ответ 304 (или 412 для If-Match), если представление у клиента актуально,
+    иначе None
+    """
+    return get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(last_modified.timestamp()) if last_modified else None,
+    )
+
+
+def set_validators(response, etag, last_modified=None):
+    """
+    Добавляет к ответу ETag и Last-Modified
+    """
+    response["ETag"] = etag
+    if last_modified:
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+    return response
@@ -0,0 +1,350 @@
+"""
+Автоматическое назначение водителей и грузовиков на открытые заказы.
+
+Открытые заказы (статус new, без водителя) группируются по складу
+назначения и дню забора; крупные группы делятся на части не больше
+вместимости экипажа, адреса забора внутри части идут подряд. Экипаж —
+пара активных водителя и грузовика: грузовик подбирается водителю по
+истории открытых заказов и текущей загрузке. Вместимость экипажа на день —
+max_orders заказов и вместимость грузовика (см. orders/loading.py).
+
+Группы распределяются по экипажам раундами: в каждом раунде решается
+задача о назначениях (венгерский алгоритм) на матрице стоимостей
+группы × экипажи, после чего загрузка экипажей пересчитывается.
+Стоимость растет с загрузкой экипажа и снижается, если экипаж уже едет
+на тот же склад в тот же день. Матрица строится по группам, а не по
+заказам, поэтому 1000 заказов планируются за доли секунды.
+
+Водители со сменами в календаре (orders/schedule.py) в день забора
+в этот день не планируются.
+
+Если установлен scipy, используется scipy.optimize.linear_sum_assignment,
+иначе реализация на Python.
+"""
+import datetime
+import time
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import loading, schedule
+from .models import Driver, Order, Truck
+from .notifications import notify_assignment
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:
+    linear_sum_assignment = None
+
+# Статусы, в которых заказ занимает экипаж
+ACTIVE_STATUSES = ("accepted", "processing")
+# Заказов на экипаж одновременно по умолчанию
+DEFAULT_MAX_ORDERS = 20
+
+# Веса стоимости назначения группы на экипаж
+LOAD_COST = 10
+SAME_STOP_BONUS = 50
+SAME_WAREHOUSE_BONUS = 20
+# Стоимость недопустимого назначения (не хватает вместимости)
+INFEASIBLE = 10 ** 9
+
+# Поля заказа, нужные планировщику и массовой записи
+ORDER_FIELDS = (
+    "id", "pickup_address", "sequence_number", "telegram_user_id",
+    *Order.TRACKED_FIELDS, *loading.LOAD_FIELDS,
+)
+
+
+def hungarian(cost):
+    """
+    Задача о назначениях для прямоугольной матрицы cost (строки × столбцы).
+    Возвращает пары (строка, столбец) минимальной суммарной стоимости;
+    назначается min(строк, столбцов) пар
+    """
+    if not cost or not cost[0]:
+        return []
+    if linear_sum_assignment is not None:
+        rows, cols = linear_sum_assignment(cost)
+        return list(zip(rows.tolist(), cols.tolist()))
+
+    transposed = len(cost) > len(cost[0])
+    if transposed:
+        cost = [list(column) for column in zip(*cost)]
+    n, m = len(cost), len(cost[0])
+
+    # Алгоритм с потенциалами, O(n² · m)
+    u = [0] * (n + 1)
+    v = [0] * (m + 1)
+    p = [0] * (m + 1)
+    way = [0] * (m + 1)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = [float("inf")] * (m + 1)
+        used = [False] * (m + 1)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            row = cost[i0 - 1]
+            ui0 = u[i0]
+            delta = float("inf")
+            j1 = 0
+            for j in range(1, m + 1):
+                if not used[j]:
+                    current = row[j - 1] - ui0 - v[j]
+                    if current < minv[j]:
+                        minv[j] = current
+                        way[j] = j0
+                    if minv[j] < delta:
+                        delta = minv[j]
+                        j1 = j
+            for j in range(m + 1):
+                if used[j]:
+                    u[p[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+
+    pairs = [(p[j] - 1, j - 1) for j in range(1, m + 1) if p[j]]
+    if transposed:
+        pairs = [(col, row) for row, col in pairs]
+    return sorted(pairs)
+
+
+def pickup_day(order):
+    """
+    День забора заказа
+    """
+    return timezone.localdate(order.created_at)
+
+
+class Crew:
+    """
+    Водитель с грузовиком и их загрузка по дням: число заказов, нагрузка
+    грузовика и остановки (склад, день), в том числе назначенные текущим планом
+    """
+
+    def __init__(self, driver, truck):
+        self.driver = driver
+        self.truck = truck
+        self.limits = loading.capacity(truck)
+        self.loads = Counter()
+        self.cargo = defaultdict(lambda: loading.EMPTY)
+        self.stops = set()
+        self.warehouses = set()
+
+    def cost(self, group, max_orders):
+        load = self.loads[group.day]
+        if load + len(group.orders) > max_orders:
+            return INFEASIBLE
+        if not loading.fits(self.cargo[group.day], self.limits, group.load):
+            return INFEASIBLE
+        cost = LOAD_COST * load
+        if group.stop in self.stops:
+            cost -= SAME_STOP_BONUS
+        elif group.warehouse_id in self.warehouses:
+            cost -= SAME_WAREHOUSE_BONUS
+        return cost
+
+    def add_stop(self, warehouse_id, day, count, cargo):
+        self.loads[day] += count
+        self.cargo[day] = loading.add(self.cargo[day], cargo)
+        self.stops.add((warehouse_id, day))
+        self.warehouses.add(warehouse_id)
+
+    def take(self, group):
+        self.add_stop(group.warehouse_id, group.day, len(group.orders), group.load)
+
+
+class Group:
+    """
+    Заказы одного склада и дня забора, назначаемые одному экипажу
+    """
+
+    def __init__(self, warehouse_id, day, orders):
+        self.warehouse_id = warehouse_id
+        self.day = day
+        self.orders = orders
+        self.load = loading.add(*(loading.order_load(order) for order in orders))
+
+    @property
+    def stop(self):
+        return (self.warehouse_id, self.day)
+
+
+def open_orders():
+    return Order.objects.filter(status="new", driver__isnull=True).only(*ORDER_FIELDS)
+
+
+def build_groups(orders, max_orders):
+    by_stop = defaultdict(list)
+    for order in orders:
+        by_stop[(order.warehouse_id, pickup_day(order))].append(order)
+
+    groups = []
+    for (warehouse_id, day), stop_orders in sorted(by_stop.items(), key=lambda item: (item[0][1], item[0][0])):
+        # Одинаковые адреса забора попадают в одну часть группы
+        stop_orders.sort(key=lambda order: ((order.pickup_address or "").strip().lower(), order.created_at))
+        for start in range(0, len(stop_orders), max_orders):
+            groups.append(Group(warehouse_id, day, stop_orders[start:start + max_orders]))
+    return groups
+
+
+def build_crews(since):
+    """
+    Пары (водитель, грузовик) из активного парка с загрузкой по дням
+    начиная с since. Водителю достается грузовик, на котором он уже
+    возит заказы, остальным — наименее загруженные свободные
+    """
+    drivers = {driver.id: driver for driver in Driver.objects.filter(is_active=True).order_by("id")}
+    trucks = {truck.id: truck for truck in Truck.objects.filter(is_active=True).order_by("id")}
+    if not drivers or not trucks:
+        return []
+
+    active = Order.objects.filter(
+        status__in=ACTIVE_STATUSES, driver__isnull=False, created_at__gte=since
+    ).values_list("driver_id", "truck_id", "warehouse_id", "created_at", *loading.LOAD_FIELDS)
+    pairs = Counter()
+    truck_loads = Counter()
+    stops = defaultdict(list)
+    for driver_id, truck_id, warehouse_id, created_at, *cargo in active:
+        pairs[(driver_id, truck_id)] += 1
+        truck_loads[truck_id] += 1
+        stops[driver_id].append((warehouse_id, timezone.localdate(created_at), loading.row_load(*cargo)))
+
+    crews = {}
+    free = set(trucks)
+    for (driver_id, truck_id), _ in pairs.most_common():
+        if driver_id in drivers and driver_id not in crews and truck_id in free:
+            free.discard(truck_id)
+            crews[driver_id] = Crew(drivers[driver_id], trucks[truck_id])
+    unpaired = [driver for driver_id, driver in drivers.items() if driver_id not in crews]
+    for driver, truck_id in zip(unpaired, sorted(free, key=lambda truck_id: (truck_loads[truck_id], truck_id))):
+        crews[driver.id] = Crew(driver, trucks[truck_id])
+
+    for driver_id, crew in crews.items():
+        for warehouse_id, day, cargo in stops[driver_id]:
+            crew.add_stop(warehouse_id, day, 1, cargo)
+    return sorted(crews.values(), key=lambda crew: crew.driver.id)
+
+
+def make_plan(orders=None, max_orders=DEFAULT_MAX_ORDERS):
+    """
+    План назначений: (назначения [(группа, экипаж)], неназначенные заказы).
+    orders — открытые заказы (по умолчанию все).
+    Дни независимы (вместимость экипажа считается на день), поэтому
+    задача о назначениях решается отдельно для каждого дня
+    """
+    orders = list(open_orders() if orders is None else orders)
+    groups = build_groups(orders, max_orders)
+    if not groups:
+        return [], []
+    first_day = min(group.day for group in groups)
+    since = timezone.make_aware(datetime.datetime.combine(first_day, datetime.time.min))
+    crews = build_crews(since)
+
+    by_day = defaultdict(list)
+    for group in groups:
+        by_day[group.day].append(group)
+
+    booked = schedule.busy_by_day(by_day)
+    assignments = []
+    unassigned = []
+    for day, remaining in sorted(by_day.items()):
+        day_crews = [crew for crew in crews if crew.driver.id not in booked[day]]
+        while remaining and day_crews:
+            cost = [[crew.cost(group, max_orders) for crew in day_crews] for group in remaining]
+            taken = set()
+            for row, col in hungarian(cost):
+                if cost[row][col] >= INFEASIBLE:
+                    continue
+                day_crews[col].take(remaining[row])
+                assignments.append((remaining[row], day_crews[col]))
+                taken.add(row)
+            if not taken:
+                break
+            remaining = [group for i, group in enumerate(remaining) if i not in taken]
+        unassigned.extend(order for group in remaining for order in group.orders)
+    return assignments, unassigned
+
+
+def describe(assignments, unassigned):
+    """
+    Представление плана для API
+    """
+    return {
+        "assignments": [
+            {
+                "driver": {"id": crew.driver.id, "full_name": crew.driver.full_name},
+                "truck": {"id": crew.truck.id, "plate_number": crew.truck.plate_number},
+                "warehouse_id": group.warehouse_id,
+                "pickup_date": group.day,
+                "orders": [order.id for order in group.orders],
+            }
+            for group, crew in assignments
+        ],
+        "unassigned": [order.id for order in unassigned],
+        "orders_count": sum(len(group.orders) for group, _ in assignments) + len(unassigned),
+        "assigned_count": sum(len(group.orders) for group, _ in assignments),
+    }
+
+
+def plan(max_orders=DEFAULT_MAX_ORDERS):
+    """
+    Пробный план без записи в БД
+    """
+    started = time.perf_counter()
+    assignments, unassigned = make_plan(max_orders=max_orders)
+    result = describe(assignments, unassigned)
+    result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+def notify(assignments):
+    """
+    Уведомления администраторам и клиентам по каждому назначенному заказу
+    """
+    for group, crew in assignments:
+        for order in group.orders:
+            notify_assignment(order, crew.driver, crew.truck)
+
+
+def apply(max_orders=DEFAULT_MAX_ORDERS):
+    """
+    Строит план по заблокированным открытым заказам и записывает его
+    в одной транзакции: один UPDATE на группу, события и статистика пачкой.
+    Заказы, занятые параллельной транзакцией, пропускаются; грузовики
+    блокируются до чтения их загрузки (см. orders/loading.py).
+    После фиксации по каждому назначенному заказу уходят те же
+    уведомления, что при ручном назначении
+    """
+    started = time.perf_counter()
+    with transaction.atomic():
+        loading.lock_fleet()
+        orders = list(open_orders().select_for_update(skip_locked=True))
+        assignments, unassigned = make_plan(orders, max_orders)
+        now = timezone.now()
+        for group, crew in assignments:
+            Order.bulk_update_tracked(
+                group.orders,
+                {
+                    "driver_id": crew.driver.id,
+                    "truck_id": crew.truck.id,
+                    "status": "accepted",
+                    "driver_assigned_at": now,
+                },
+                details={"dispatch": True},
+            )
+        if assignments:
+            transaction.on_commit(lambda: notify(assignments))
+    result = describe(assignments, unassigned)
+    result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
@@ -0,0 +1,116 @@
+"""
+Идемпотентное создание заказа (/api/order/) по заголовку Idempotency-Key.
+
+Мини-приложение повторяет запрос при обрыве связи; без ключа каждый
+повтор создавал бы новый заказ и новое уведомление администраторам.
+
+Повтор с ключом, по которому уже есть ответ, получает этот ответ одним
+запросом по уникальному индексу ключа. Новый ключ вставляется в таблицу
+в той же транзакции, что и заказ, до создания заказа. Параллельный
+запрос с тем же ключом упирается в уникальный индекс: в PostgreSQL его
+INSERT ждет завершения первой транзакции и после фиксации получает
+IntegrityError — тогда ответ читается заново. Если первая транзакция
+откатилась, вставка проходит и заказ создается. Блокировок на уровне
+приложения нет.
+
+Тот же ключ с другим телом запроса — ошибка клиента (422). Ответы с
+ошибкой сервера не сохраняются: повтор выполняется заново.
+"""
+import hashlib
+import json
+
+from django.db import IntegrityError, transaction
+from django.http import JsonResponse
+
+from .models import IdempotencyKey
+
+HEADER = "Idempotency-Key"
+# Заголовок ответа, отданного из сохраненного
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = IdempotencyKey._meta.get_field("key").max_length
+
+
+class KeyTaken(Exception):
+    """
+    Ключ уже записан другим запросом
+    """
+
+
+def parse_key(value):
+    """
+    Ключ из заголовка. ValueError, если пустой или слишком длинный
+    """
+    value = value.strip()
+    if not value:
+        raise ValueError(f"пустой заголовок {HEADER}")
+    if len(value) > MAX_KEY_LENGTH:
+        raise ValueError(f"{HEADER} длиннее {MAX_KEY_LENGTH} символов")
+    return value
+
+
+def fingerprint(body):
+    return hashlib.sha256(body).hexdigest()
+
+
+def replay(key, body_fingerprint):
+    """
+    Ответ на повтор запроса с ключом key или None, если ключ не встречался
+    """
+    try:
+        record = IdempotencyKey.objects.only("fingerprint", "status_code", "response").get(key=key)
+    except IdempotencyKey.DoesNotExist:
+        return None
+    if record.fingerprint != body_fingerprint:
+        return JsonResponse(
+            {"success": False, "message": f"{HEADER} уже использован с другими данными заказа"},
+            status=422,
+        )
+    if record.status_code is None:
+        # Строка видна только после фиксации вместе с ответом; сюда не
+        # попасть, пока ключ вставляется в одной транзакции с заказом
+        return JsonResponse(
+            {"success": False, "message": "Запрос с этим ключом еще выполняется"},
+            status=409,
+        )
+    response = JsonResponse(record.response, status=record.status_code)
+    response[REPLAYED_HEADER] = "true"
+    return response
+
+
+def claim(key, body_fingerprint):
+    """
+    Записывает ключ без ответа. KeyTaken, если он уже есть. Вызывается
+    внутри транзакции создания заказа
+    """
+    try:
+        with transaction.atomic():
+            return IdempotencyKey.objects.create(key=key, fingerprint=body_fingerprint)
+    except IntegrityError:
+        raise KeyTaken(key)
+
+
+def store(record, response, order_id=None):
+    """
+    Сохраняет ответ на запрос с ключом record
+    """
+    record.status_code = response.status_code
+    record.response = json.loads(response.content)
+    record.order_id = order_id
+    record.save(update_fields=["status_code", "response", "order"])
+
+
+def purge(cutoff, batch_size=5000):
+    """
+    Удаляет ключи, созданные раньше cutoff, пачками по индексу created_at.
+    Возвращает число удаленных
+    """
+    deleted = 0
+    while True:
+        ids = list(
+            IdempotencyKey.objects.filter(created_at__lt=cutoff)
+            .order_by("created_at")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(pk__in=ids).delete()[0]
@@ -0,0 +1,379 @@
+"""
+Импорт заказов из CSV или NDJSON (/orders/import/).
+
+Файл читается построчно: тело запроса или загруженный файл не
+загружаются в память целиком. Каждая строка проверяется отдельно и
+оценивается по снимку тарифов (orders/tariffs.py), который читается один
+раз на импорт. Корректные строки копятся в пачки по CHUNK_SIZE; пачка
+записывается в своей транзакции: номера заказов выделяются одним
+запросом (Order.allocate_sequence_numbers), заказы и их услуги —
+bulk_create, статистика складов и журнал событий — пачкой, как в
+Order.bulk_update_tracked. Если параллельный заказ занял один из
+выделенных номеров (без последовательности PostgreSQL), пачка повторяется
+с новыми номерами.
+
+Колонки (CSV — заголовок, NDJSON — ключи объекта) называются как поля
+заказа: warehouse_id, client_name, phone_number — обязательные; company,
+email, pickup_address, box_count, box_container_type, pallet_count,
+pallet_container_type, length, width, height, weight, telegram_user_id,
+services — id дополнительных услуг через запятую (в NDJSON — список).
+Разделитель CSV (запятая, точка с запятой или табуляция) определяется по
+заголовку, кодировка — UTF-8 или Windows-1251.
+"""
+import csv
+import json
+import logging
+import re
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+
+from .models import DailyWarehouseStats, Order, OrderEvent, Warehouse
+from .tariffs import TariffSnapshot
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 500
+# Строк в одном импорте; остальные не читаются
+MAX_ROWS = 50_000
+# Попыток записать пачку, если выделенные номера заняты параллельно
+SEQUENCE_ATTEMPTS = 3
+
+CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+EXTENSIONS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+
+REQUIRED_FIELDS = ("warehouse_id", "client_name", "phone_number")
+TEXT_FIELDS = (
+    "client_name",
+    "phone_number",
+    "company",
+    "email",
+    "pickup_address",
+    "box_container_type",
+    "pallet_container_type",
+)
+COUNT_FIELDS = ("box_count", "pallet_count")
+DECIMAL_FIELDS = ("length", "width", "height", "weight")
+
+EVENT_DETAILS = {"import": True}
+
+
+class RowError(ValueError):
+    """
+    Ошибки строки: {колонка: сообщение}
+    """
+
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def detect_format(name, content_type=None):
+    """
+    Формат файла по расширению или типу содержимого. ValueError, если не определен
+    """
+    for extension, fmt in EXTENSIONS.items():
+        if (name or "").lower().endswith(extension):
+            return fmt
+    fmt = CONTENT_TYPES.get((content_type or "").split(";")[0].strip())
+    if fmt is None:
+        raise ValueError("поддерживаются CSV (.csv) и NDJSON (.ndjson, .jsonl)")
+    return fmt
+
+
+def decode_lines(stream):
+    """
+    Строки текста из байтового потока (файл или тело запроса) по одной
+    """
+    first = True
+    for line in stream:
+        try:
+            text = line.decode("utf-8")
+        except UnicodeDecodeError:
+            text = line.decode("cp1251")
+        if first:
+            text = text.lstrip("\ufeff")
+            first = False
+        yield text
+
+
+def read_csv(lines):
+    """
+    (номер строки файла, словарь значений) для строк CSV
+    """
+    header = next(lines, None)
+    if header is None:
+        return
+    try:
+        dialect = csv.Sniffer().sniff(header, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    columns = [column.strip() for column in next(csv.reader([header], dialect))]
+    reader = csv.reader(lines, dialect)
+    for values in reader:
+        if not any(value.strip() for value in values):
+            continue
+        # line_num считает строки без заголовка
+        yield reader.line_num + 1, dict(zip(columns, values))
+
+
+def read_ndjson(lines):
+    """
+    (номер строки файла, объект) для строк NDJSON. Некорректный JSON —
+    RowError вместо объекта
+    """
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            value = json.loads(line)
+        except ValueError as e:
+            yield number, RowError({"row": f"Некорректный JSON: {e}"})
+            continue
+        if not isinstance(value, dict):
+            yield number, RowError({"row": "Строка должна быть объектом JSON"})
+            continue
+        yield number, value
+
+
+def _text(value):
+    if value is None:
+        return ""
+    return str(value).strip()
+
+
+def _service_ids(value):
+    if value in (None, ""):
+        return []
+    if isinstance(value, (list, tuple)):
+        items = value
+    elif isinstance(value, int):
+        items = [value]
+    else:
+        items = [item for item in re.split(r"[,;\s]+", str(value)) if item]
+    return [int(item) for item in items]
+
+
+def build_order(raw, snapshot, warehouses):
+    """
+    Несохраненный заказ и id услуг из значений строки. RowError при ошибках
+    """
+    errors = {}
+    values = {}
+
+    for field in TEXT_FIELDS:
+        text = _text(raw.get(field))
+        max_length = Order._meta.get_field(field).max_length
+        if max_length and len(text) > max_length:
+            errors[field] = f"Не длиннее {max_length} символов"
+        values[field] = text
+
+    for field in REQUIRED_FIELDS:
+        if not _text(raw.get(field)):
+            errors[field] = "Обязательное поле"
+
+    warehouse = _text(raw.get("warehouse_id"))
+    if warehouse and "warehouse_id" not in errors:
+        try:
+            values["warehouse_id"] = int(warehouse)
+        except ValueError:
+            errors["warehouse_id"] = "Ожидается число"
+        else:
+            if values["warehouse_id"] not in warehouses:
+                errors["warehouse_id"] = "Склад не найден"
+
+    for field in COUNT_FIELDS:
+        text = _text(raw.get(field))
+        try:
+            values[field] = int(text) if text else 0
+            if values[field] < 0:
+                errors[field] = "Не может быть отрицательным"
+        except ValueError:
+            errors[field] = "Ожидается целое число"
+    if not errors.keys() & set(COUNT_FIELDS) and not values["box_count"] and not values["pallet_count"]:
+        errors["box_count"] = "Нужны коробки или паллеты"
+
+    for field in DECIMAL_FIELDS:
+        text = _text(raw.get(field)).replace(",", ".")
+        try:
+            value = Decimal(text) if text else None
+        except InvalidOperation:
+            errors[field] = "Ожидается число"
+            continue
+        if value is not None and (not value.is_finite() or value < 0 or value >= Decimal("1e8")):
+            errors[field] = "Некорректное значение"
+            continue
+        values[field] = value.quantize(Decimal("0.01")) if value is not None else None
+
+    if values["email"]:
+        try:
+            validate_email(values["email"])
+        except ValidationError:
+            errors["email"] = "Некорректный email"
+
+    telegram_user_id = _text(raw.get("telegram_user_id"))
+    try:
+        values["telegram_user_id"] = int(telegram_user_id) if telegram_user_id else None
+    except ValueError:
+        errors["telegram_user_id"] = "Ожидается число"
+
+    try:
+        service_ids = list(dict.fromkeys(_service_ids(raw.get("services"))))
+        unknown = [service_id for service_id in service_ids if service_id not in snapshot.services]
+        if unknown:
+            errors["services"] = f"Услуги не найдены: {', '.join(map(str, unknown))}"
+    except (TypeError, ValueError):
+        errors["services"] = "Ожидаются id услуг"
+
+    if errors:
+        raise RowError(errors)
+
+    # Тип груза и контейнера — как при создании заказа из мини-приложения
+    if values["box_count"] and values["pallet_count"]:
+        cargo_type = "mixed"
+    elif values["box_count"]:
+        cargo_type = "box"
+    else:
+        cargo_type = "pallet"
+    order = Order(
+        status="new",
+        cargo_type=cargo_type,
+        container_type=(
+            values["box_container_type"] if cargo_type == "box" else values["pallet_container_type"]
+        ) or None,
+        company=values["company"] or None,
+        email=values["email"] or None,
+        pickup_address=values["pickup_address"] or None,
+        box_container_type=(values["box_container_type"] or None) if values["box_count"] else None,
+        pallet_container_type=(values["pallet_container_type"] or None) if values["pallet_count"] else None,
+        **{
+            field: values[field]
+            for field in (
+                "warehouse_id", "client_name", "phone_number", "box_count", "pallet_count",
+                "length", "width", "height", "weight", "telegram_user_id",
+            )
+        },
+    )
+    order.total_price = snapshot.price(order, service_ids)
+    return order, service_ids
+
+
+def write_chunk(chunk):
+    """
+    Записывает пачку [(номер строки, заказ, id услуг)] в одной транзакции.
+    IntegrityError, если номера не удалось выделить за SEQUENCE_ATTEMPTS попыток
+    """
+    orders = [order for _, order, _ in chunk]
+    for attempt in range(SEQUENCE_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                for order, number in zip(orders, Order.allocate_sequence_numbers(len(orders))):
+                    order.sequence_number = number
+                Order.objects.bulk_create(orders)
+                Order.services.through.objects.bulk_create(
+                    Order.services.through(order_id=order.pk, additionalservice_id=service_id)
+                    for _, order, service_ids in chunk
+                    for service_id in service_ids
+                )
+                current = [order.get_tracked_values() for order in orders]
+                DailyWarehouseStats.apply_order_changes([(None, values) for values in current])
+                OrderEvent.record_order_changes(
+                    [(order.pk, None, values, EVENT_DETAILS) for order, values in zip(orders, current)]
+                )
+            return
+        except IntegrityError:
+            if attempt == SEQUENCE_ATTEMPTS - 1:
+                raise
+            logger.info("Sequence numbers taken concurrently, retrying import chunk")
+            for order in orders:
+                order._state.adding = True
+
+
+def import_orders(stream, fmt, dry_run=False):
+    """
+    Импортирует заказы из байтового потока в формате fmt (csv, ndjson).
+    dry_run — только проверка и расчет стоимости без записи.
+    Возвращает отчет по строкам
+    """
+    started = time.perf_counter()
+    snapshot = TariffSnapshot()
+    warehouses = set(Warehouse.objects.values_list("id", flat=True))
+    lines = decode_lines(stream)
+    rows = read_csv(lines) if fmt == "csv" else read_ndjson(lines)
+
+    report = []
+    total = valid = created = failed = 0
+    truncated = False
+    chunk = []
+
+    def flush():
+        nonlocal created, failed
+        if not chunk:
+            return
+        try:
+            write_chunk(chunk)
+        except Exception as e:
+            logger.exception("Error writing import chunk: %s", e)
+            failed += len(chunk)
+            report.extend(
+                {"row": number, "status": "error", "errors": {"row": f"Ошибка записи: {e}"}}
+                for number, _, _ in chunk
+            )
+        else:
+            created += len(chunk)
+            report.extend(
+                {
+                    "row": number,
+                    "status": "created",
+                    "id": str(order.pk),
+                    "sequence_number": order.sequence_number,
+                    "total_price": order.total_price,
+                }
+                for number, order, _ in chunk
+            )
+        chunk.clear()
+
+    for number, raw in rows:
+        if total >= MAX_ROWS:
+            truncated = True
+            break
+        total += 1
+        try:
+            if isinstance(raw, RowError):
+                raise raw
+            order, service_ids = build_order(raw, snapshot, warehouses)
+        except RowError as e:
+            failed += 1
+            report.append({"row": number, "status": "error", "errors": e.errors})
+            continue
+        valid += 1
+        if dry_run:
+            report.append({"row": number, "status": "valid", "total_price": order.total_price})
+            continue
+        chunk.append((number, order, service_ids))
+        if len(chunk) >= CHUNK_SIZE:
+            flush()
+    if not dry_run:
+        flush()
+
+    report.sort(key=lambda row: row["row"])
+    return {
+        "format": fmt,
+        "dry_run": dry_run,
+        "total": total,
+        "valid": valid,
+        "created": created,
+        "failed": failed,
+        "truncated": truncated,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        "rows": report,
+    }
@@ -0,0 +1,327 @@
+"""
+Загрузка грузовиков: сколько паллетомест, килограммов и кубометров
+занимают заказы и помещаются ли они в грузовик.
+
+Нагрузка заказа — тройка (паллеты, кг, м³):
+    паллеты — pallet_count, каждая занимает паллетоместо и PALLET_VOLUME_M3;
+    коробки — box_count × объем коробки: стандартные размеры берутся из
+    названия («60x40x40 см»), «Другой размер» — по длине, ширине и высоте
+    заказа, как в BoxPricing.calculate_volume;
+    вес — как в расчете стоимости (Order.calculate_total_price, «Другой
+    вес»): weight — вес одной паллеты, для заказа из одних коробок — вес
+    всего груза. Если вес не заполнен — оценка: верхняя граница весовой
+    категории паллеты; коробки без weight — BOX_WEIGHT_KG на коробку.
+
+Вместимость грузовика — поля pallet_capacity, max_weight_kg, cargo_volume_m3;
+незаполненное поле не ограничивает загрузку. Загрузка считается по дням
+забора (как в orders/dispatch.py) по заказам в работе.
+
+Нагрузки заказов читаются одним запросом values_list в кортежи, дальнейшие
+расчеты идут без ORM-объектов, поэтому пересчет дня по всему парку
+занимает миллисекунды.
+
+Назначение на грузовик проверяется и записывается в одной транзакции,
+после блокировки строки грузовика (lock_truck, lock_fleet): иначе два
+параллельных назначения разных заказов прочитают одну и ту же загрузку,
+оба пройдут проверку и вместе перегрузят грузовик. Грузовики блокируются
+раньше заказов — при одном порядке блокировок назначения и планировщики
+не блокируют друг друга взаимно.
+"""
+import datetime
+import re
+from collections import defaultdict
+
+from django.utils import timezone
+
+from .models import BoxPricing, Order, Truck
+
+# Статусы, в которых заказ занимает грузовик
+ACTIVE_STATUSES = ("accepted", "processing")
+
+# Паллета 120×80 см с грузом высотой до 150 см
+PALLET_VOLUME_M3 = 1.2 * 0.8 * 1.5
+# Оценки веса, если вес заказа не указан
+BOX_WEIGHT_KG = 15.0
+PALLET_WEIGHT_KG = 500.0
+
+# Объем коробки, если размер не указан (самая ходовая 60x40x40 см)
+DEFAULT_BOX_VOLUME_M3 = 0.096
+
+LOAD_FIELDS = (
+    "pallet_count",
+    "box_count",
+    "box_container_type",
+    "pallet_container_type",
+    "length",
+    "width",
+    "height",
+    "weight",
+)
+
+DIMENSIONS = ("pallets", "weight", "volume")
+DIMENSION_NAMES = {"pallets": "паллетоместа", "weight": "грузоподъемность", "volume": "объем кузова"}
+
+EMPTY = (0, 0.0, 0.0)
+
+_SIZE_PATTERN = re.compile(r"(\d+(?:[.,]\d+)?)\s*[xх×]\s*(\d+(?:[.,]\d+)?)\s*[xх×]\s*(\d+(?:[.,]\d+)?)")
+
+
+class CapacityError(ValueError):
+    """
+    Заказы не помещаются в грузовик
+    """
+
+
+def _number(value):
+    return float(value.replace(",", "."))
+
+
+def box_volume(size, length=None, width=None, height=None):
+    """
+    Объем одной коробки, м³
+    """
+    match = _SIZE_PATTERN.search(size or "")
+    if match:
+        return BoxPricing.box_volume(*(_number(value) for value in match.groups()))
+    if length and width and height:
+        return BoxPricing.box_volume(float(length), float(width), float(height))
+    return DEFAULT_BOX_VOLUME_M3
+
+
+def pallet_weight(category):
+    """
+    Оценка веса паллеты по весовой категории («200-300 кг» → 300)
+    """
+    numbers = re.findall(r"\d+", category or "")
+    return float(numbers[-1]) if numbers else PALLET_WEIGHT_KG
+
+
+def row_load(pallet_count, box_count, box_size, pallet_category, length, width, height, weight):
+    """
+    Нагрузка заказа по значениям LOAD_FIELDS
+    """
+    pallets = pallet_count or 0
+    boxes = box_count or 0
+    volume = pallets * PALLET_VOLUME_M3
+    if boxes:
+        volume += boxes * box_volume(box_size, length, width, height)
+    if weight and pallets:
+        kg = pallets * float(weight) + boxes * BOX_WEIGHT_KG
+    elif weight:
+        kg = float(weight)
+    else:
+        kg = pallets * pallet_weight(pallet_category) + boxes * BOX_WEIGHT_KG
+    return (pallets, kg, volume)
+
+
+def order_load(order):
+    return row_load(*(getattr(order, field) for field in LOAD_FIELDS))
+
+
+def add(*loads):
+    pallets, weight, volume = EMPTY
+    for load in loads:
+        pallets += load[0]
+        weight += load[1]
+        volume += load[2]
+    return (pallets, weight, volume)
+
+
+def capacity(truck):
+    """
+    Вместимость грузовика (паллеты, кг, м³); None — без ограничения
+    """
+    return (
+        truck.pallet_capacity,
+        float(truck.max_weight_kg) if truck.max_weight_kg is not None else None,
+        float(truck.cargo_volume_m3) if truck.cargo_volume_m3 is not None else None,
+    )
+
+
+def fits(load, limits, extra=EMPTY):
+    """
+    Помещается ли нагрузка load (плюс extra) во вместимость limits
+    """
+    pallets, weight, volume = limits
+    return (
+        (pallets is None or load[0] + extra[0] <= pallets)
+        and (weight is None or load[1] + extra[1] <= weight + 1e-9)
+        and (volume is None or load[2] + extra[2] <= volume + 1e-9)
+    )
+
+
+def exceeded(load, limits):
+    """
+    Измерения, по которым нагрузка превышает вместимость
+    """
+    return [
+        name
+        for name, value, limit in zip(DIMENSIONS, load, limits)
+        if limit is not None and value > limit + 1e-9
+    ]
+
+
+def utilization(load, limits):
+    """
+    Загрузка по измерениям в процентах и максимальная из них
+    """
+    result = {
+        name: round(value / limit * 100, 1) if limit else None
+        for name, value, limit in zip(DIMENSIONS, load, limits)
+    }
+    known = [value for value in result.values() if value is not None]
+    result["max"] = max(known) if known else None
+    return result
+
+
+def describe_load(load, limits):
+    return {
+        "load": {"pallets": load[0], "weight": round(load[1], 1), "volume": round(load[2], 3)},
+        "capacity": dict(zip(DIMENSIONS, limits)),
+        "utilization": utilization(load, limits),
+        "overloaded": not fits(load, limits),
+    }
+
+
+def parse_day(value):
+    """
+    День из параметра YYYY-MM-DD, по умолчанию сегодня. ValueError при ошибке формата
+    """
+    return datetime.date.fromisoformat(value) if value else timezone.localdate()
+
+
+def day_bounds(day):
+    start = timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+    return start, start + datetime.timedelta(days=1)
+
+
+def truck_loads(day, truck_ids=None, exclude_ids=()):
+    """
+    Нагрузка грузовиков заказами в работе за день забора: {truck_id: нагрузка}
+    """
+    start, end = day_bounds(day)
+    orders = Order.objects.filter(
+        status__in=ACTIVE_STATUSES, truck__isnull=False, created_at__gte=start, created_at__lt=end
+    )
+    if truck_ids is not None:
+        orders = orders.filter(truck_id__in=truck_ids)
+    if exclude_ids:
+        orders = orders.exclude(pk__in=exclude_ids)
+    loads = defaultdict(lambda: EMPTY)
+    for truck_id, *values in orders.values_list("truck_id", *LOAD_FIELDS):
+        loads[truck_id] = add(loads[truck_id], row_load(*values))
+    return loads
+
+
+def lock_truck(truck_id):
+    """
+    Блокирует строку грузовика до конца транзакции и возвращает грузовик
+    с актуальной вместимостью
+    """
+    return Truck.objects.select_for_update().get(pk=truck_id)
+
+
+def lock_fleet():
+    """
+    Блокирует активные грузовики до конца транзакции (в порядке id) —
+    перед планированием назначений по всему парку
+    """
+    list(Truck.objects.filter(is_active=True).select_for_update().order_by("id").values_list("pk", flat=True))
+
+
+def check_assignment(truck, orders):
+    """
+    Проверяет, что заказы помещаются в грузовик вместе с уже назначенными
+    на него в те же дни. CapacityError, если нет. Грузовик должен быть
+    заблокирован lock_truck в той же транзакции, что и запись назначения
+    """
+    limits = capacity(truck)
+    if all(limit is None for limit in limits):
+        return
+    by_day = defaultdict(list)
+    for order in orders:
+        by_day[timezone.localdate(order.created_at)].append(order)
+    exclude_ids = [order.pk for order in orders]
+    for day, day_orders in by_day.items():
+        load = add(
+            truck_loads(day, [truck.pk], exclude_ids)[truck.pk],
+            *(order_load(order) for order in day_orders),
+        )
+        over = exceeded(load, limits)
+        if over:
+            raise CapacityError(
+                f"Грузовик {truck.plate_number} перегружен на {day:%d.%m.%Y}: "
+                + ", ".join(DIMENSION_NAMES[name] for name in over)
+            )
+
+
+def fleet(day):
+    """
+    Загрузка активных грузовиков за день
+    """
+    trucks = list(Truck.objects.filter(is_active=True).order_by("id"))
+    loads = truck_loads(day)
+    return [
+        {
+            "truck": {"id": truck.id, "plate_number": truck.plate_number},
+            **describe_load(loads[truck.id], capacity(truck)),
+        }
+        for truck in trucks
+    ]
+
+
+def pack(day, order_ids=None):
+    """
+    Раскладка заказов дня по грузовикам без записи в БД: First Fit Decreasing
+    по остаточной вместимости грузовиков. Заказы идут по убыванию наибольшей
+    доли вместимости парка, которую они занимают; каждый кладется в первый
+    грузовик, где помещается. Участвуют грузовики с заданной вместимостью.
+    По умолчанию раскладываются открытые заказы дня (статус new, без грузовика)
+    """
+    start, end = day_bounds(day)
+    orders = Order.objects.filter(created_at__gte=start, created_at__lt=end)
+    if order_ids is not None:
+        orders = orders.filter(pk__in=order_ids)
+    else:
+        orders = orders.filter(status="new", truck__isnull=True)
+    rows = [(pk, row_load(*values)) for pk, *values in orders.values_list("pk", *LOAD_FIELDS)]
+
+    trucks = [
+        truck
+        for truck in Truck.objects.filter(is_active=True).order_by("id")
+        if any(limit is not None for limit in capacity(truck))
+    ]
+    limits = [capacity(truck) for truck in trucks]
+    current = truck_loads(day, exclude_ids=[pk for pk, _ in rows])
+    loads = [current[truck.id] for truck in trucks]
+    placed = [[] for _ in trucks]
+
+    # Нормировка измерений по самому вместительному грузовику
+    scale = [
+        max((limit[i] for limit in limits if limit[i]), default=None) or 1
+        for i in range(len(DIMENSIONS))
+    ]
+    rows.sort(key=lambda row: max(value / size for value, size in zip(row[1], scale)), reverse=True)
+
+    unplaced = []
+    for pk, load in rows:
+        for i, truck_limits in enumerate(limits):
+            if fits(loads[i], truck_limits, load):
+                loads[i] = add(loads[i], load)
+                placed[i].append(pk)
+                break
+        else:
+            unplaced.append(pk)
+
+    return {
+        "date": day,
+        "trucks": [
+            {
+                "truck": {"id": truck.id, "plate_number": truck.plate_number},
+                "orders": placed[i],
+                **describe_load(loads[i], limits[i]),
+            }
+            for i, truck in enumerate(trucks)
+        ],
+        "unplaced": unplaced,
+    }
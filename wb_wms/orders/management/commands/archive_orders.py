@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from orders import archive
+from orders.models import ArchivedOrder
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит закрытые заказы старше N месяцев в архивную таблицу '
+        '(в PostgreSQL — в месячные секции)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int, default=12, help='Возраст заказов в месяцах')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true', help='Только посчитать заказы для архивации')
+
+    def handle(self, *args, **options):
+        if options['months'] < 1:
+            raise CommandError('--months должен быть не меньше 1')
+
+        cutoff = archive.cutoff_for(options['months'])
+        statuses = ', '.join(ArchivedOrder.CLOSED_STATUSES)
+        if options['dry_run']:
+            count = archive.candidates(cutoff).count()
+            self.stdout.write(f'К архивации: {count} заказов ({statuses}), созданных до {cutoff:%Y-%m-%d}')
+            return
+
+        total = 0
+        for moved in archive.archive_orders(cutoff, options['batch_size']):
+            total += moved
+            self.stdout.write(f'Перенесено в архив: {total}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Архивировано {total} заказов ({statuses}), созданных до {cutoff:%Y-%m-%d}'
+        ))
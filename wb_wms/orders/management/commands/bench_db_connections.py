@@ -0,0 +1,94 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from django.test import Client
+from django.urls import reverse
+
+from orders.benchmarks import summarize
+from orders.models import Warehouse
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает задержку запросов без постоянных соединений с БД и с ними'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=200,
+            help='Количество запросов на каждый эндпоинт',
+        )
+        parser.add_argument(
+            '--max-age',
+            type=int,
+            default=600,
+            help='CONN_MAX_AGE для режима с постоянными соединениями',
+        )
+
+    def handle(self, *args, **options):
+        count = options['requests']
+        if count <= 0:
+            raise CommandError('--requests должен быть больше 0')
+
+        warehouse = Warehouse.objects.first()
+        price_payload = {
+            "delivery": {"warehouse_id": warehouse.id if warehouse else None},
+            "cargo": {"box_count": 3, "box_container_type": "60x40x40 см"},
+            "additional_services": [],
+        }
+        endpoints = [
+            ('health', lambda client: client.get(reverse('orders:health-check'))),
+            (
+                'calculate-price',
+                lambda client: client.post(
+                    reverse('orders:calculate-price'),
+                    price_payload,
+                    content_type='application/json',
+                ),
+            ),
+        ]
+
+        original_max_age = connection.settings_dict['CONN_MAX_AGE']
+        client = Client()
+        results = {}
+        try:
+            for mode, max_age in (('разовые', 0), ('постоянные', options['max_age'])):
+                # Новое значение CONN_MAX_AGE учитывается при следующем подключении
+                connection.close()
+                connection.settings_dict['CONN_MAX_AGE'] = max_age
+
+                for name, send in endpoints:
+                    send(client)
+                    close_old_connections()
+
+                    samples = []
+                    for _ in range(count):
+                        started = time.perf_counter()
+                        response = send(client)
+                        # Тестовый клиент не закрывает соединения по request_finished,
+                        # поэтому повторяем поведение WSGI-обработчика вручную
+                        close_old_connections()
+                        samples.append((time.perf_counter() - started) * 1000)
+                        if response.status_code >= 500:
+                            raise CommandError(
+                                f'{name}: сервер вернул {response.status_code}'
+                            )
+                    results[(name, mode)] = summarize(samples)
+        finally:
+            connection.close()
+            connection.settings_dict['CONN_MAX_AGE'] = original_max_age
+
+        self.stdout.write(f'{"эндпоинт":<18}{"режим":<14}{"mean":>10}{"p50":>10}{"p95":>10}{"p99":>10}')
+        for (name, mode), stats in results.items():
+            self.stdout.write(
+                f'{name:<18}{mode:<14}{stats["mean"]:>10.3f}{stats["p50"]:>10.3f}'
+                f'{stats["p95"]:>10.3f}{stats["p99"]:>10.3f}'
+            )
+
+        for name, _ in endpoints:
+            cold = results[(name, 'разовые')]['mean']
+            warm = results[(name, 'постоянные')]['mean']
+            self.stdout.write(self.style.SUCCESS(
+                f'{name}: {cold - warm:.3f} мс экономии на запрос ({cold:.3f} → {warm:.3f} мс)'
+            ))
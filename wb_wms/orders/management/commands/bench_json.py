@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from orders import renderers
+from orders.benchmarks import rendering
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает кодирование и разбор JSON списка заказов стандартным модулем json и orjson'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=10000, help='Количество заказов в ответе')
+        parser.add_argument('--repeat', type=int, default=5, help='Число прогонов, берется лучший')
+
+    def handle(self, *args, **options):
+        if options['orders'] <= 0 or options['repeat'] <= 0:
+            raise CommandError('--orders и --repeat должны быть больше 0')
+        if not renderers.available():
+            self.stdout.write(self.style.WARNING(
+                'orjson не установлен или отключен настройками REST_FRAMEWORK, '
+                'FastJSONRenderer использует модуль json'
+            ))
+
+        report = rendering.run(options['orders'], options['repeat'])
+        if report['orders'] < options['orders']:
+            self.stdout.write(self.style.WARNING(
+                f'В базе только {report["orders"]} заказов, для полного объема запустите seed_perf_data'
+            ))
+
+        self.stdout.write(f'Заказов: {report["orders"]}, сериализация: {report["serialize"] * 1000:.1f} мс')
+        self.stdout.write(f'{"реализация":<12}{"render, мс":>12}{"parse, мс":>12}{"байт":>12}')
+        for name, stats in report['results'].items():
+            self.stdout.write(
+                f'{name:<12}{stats["render"] * 1000:>12.1f}{stats["parse"] * 1000:>12.1f}{stats["bytes"]:>12}'
+            )
+
+        before, after = report['results']['json'], report['results']['fast']
+        if before['bytes'] != after['bytes']:
+            self.stdout.write(self.style.WARNING('Размер ответа отличается от стандартного рендерера'))
+        self.stdout.write(self.style.SUCCESS(
+            f'render: x{before["render"] / after["render"]:.1f}, parse: x{before["parse"] / after["parse"]:.1f}'
+        ))
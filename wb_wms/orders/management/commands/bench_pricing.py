@@ -0,0 +1,107 @@
+import json
+import platform
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from orders.benchmarks import pricing
+
+BASELINE_PATH = Path(pricing.__file__).resolve().parent / 'baselines' / 'pricing.json'
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Микробенчмарки расчета стоимости с проверкой регрессий относительно базовых значений'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=100, help='Вызовов на каждый случай за прогон')
+        parser.add_argument('--repeat', type=int, default=3, help='Число прогонов, берется лучший')
+        parser.add_argument('--path', action='append', choices=pricing.PATHS, help='Только указанные пути расчета')
+        parser.add_argument('--baseline', default=str(BASELINE_PATH), help='Файл базовых значений')
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=0.25,
+            help='Допустимое падение ops/sec относительно базовых значений (доля)',
+        )
+        parser.add_argument('--update-baseline', action='store_true', help='Перезаписать базовые значения')
+
+    def handle(self, *args, **options):
+        # Данные для прогона создаются в транзакции и откатываются
+        try:
+            with transaction.atomic():
+                results = pricing.run(options['iterations'], options['repeat'], options['path'] or pricing.PATHS)
+                raise Rollback
+        except Rollback:
+            pass
+
+        report = {
+            'meta': {
+                'vendor': connection.vendor,
+                'python': platform.python_version(),
+                'iterations': options['iterations'],
+                'repeat': options['repeat'],
+            },
+            'results': results,
+        }
+        self.print_results(results)
+
+        baseline_path = Path(options['baseline'])
+        if options['update_baseline']:
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(baseline_path, 'w') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2, sort_keys=True)
+                f.write('\n')
+            self.stdout.write(self.style.SUCCESS(f'Базовые значения сохранены в {baseline_path}'))
+            return
+
+        if not baseline_path.exists():
+            self.stdout.write(self.style.WARNING(
+                f'Нет базовых значений ({baseline_path}), запустите с --update-baseline'
+            ))
+            return
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+
+        regressions = self.compare(baseline, report, options['threshold'])
+        if regressions:
+            for line in regressions:
+                self.stderr.write(line)
+            raise CommandError(f'Регрессия производительности в {len(regressions)} случаях')
+        self.stdout.write(self.style.SUCCESS('Регрессий не обнаружено'))
+
+    def print_results(self, results):
+        self.stdout.write(f'{"случай":<50}{"ops/sec":>12}{"queries":>9}')
+        for name, stats in results.items():
+            self.stdout.write(f'{name:<50}{stats["ops_per_sec"]:>12.1f}{stats["queries"]:>9}')
+
+    def compare(self, baseline, report, threshold):
+        """
+        Число запросов сравнивается всегда. Скорость сравнивается только
+        с базовыми значениями, снятыми на той же СУБД.
+        """
+        same_vendor = baseline.get('meta', {}).get('vendor') == report['meta']['vendor']
+        if not same_vendor:
+            self.stdout.write(self.style.WARNING(
+                f'Базовые значения сняты на {baseline.get("meta", {}).get("vendor")}, '
+                f'сравнивается только число запросов'
+            ))
+
+        regressions = []
+        for name, stats in report['results'].items():
+            before = baseline.get('results', {}).get(name)
+            if not before:
+                continue
+            if stats['queries'] > before['queries']:
+                regressions.append(f'{name}: запросов {before["queries"]} → {stats["queries"]}')
+            floor = before['ops_per_sec'] * (1 - threshold)
+            if same_vendor and stats['ops_per_sec'] < floor:
+                regressions.append(
+                    f'{name}: ops/sec {before["ops_per_sec"]:.1f} → {stats["ops_per_sec"]:.1f} '
+                    f'(порог {floor:.1f})'
+                )
+        return regressions
@@ -0,0 +1,298 @@
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.benchmarks import summarize
+
+# Доли сценариев в смеси, приближенной к реальному трафику
+SCENARIO_MIXES = {
+    "default": {"quote": 60, "order": 15, "browse": 15, "accept": 10},
+    "quotes": {"quote": 100},
+    "orders": {"order": 100},
+    "browse": {"browse": 100},
+    "accept": {"accept": 100},
+}
+
+BOX_SIZES = ["60x40x40 см", "50x40x40 см", "45x45x45 см", "Другой размер"]
+PALLET_WEIGHTS = ["0-200 кг", "200-300 кг", "300-400 кг", "400-500 кг", "Другой вес"]
+
+
+class StubBotHandler(BaseHTTPRequestHandler):
+    """
+    Заглушка API Telegram-бота: принимает любые уведомления
+    """
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        body = b'{"status": "success"}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = 'Нагрузочное тестирование API смесью сценариев с отчетом p50/p95/p99'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--duration', type=float, default=30, help='Длительность, секунд')
+        parser.add_argument('--concurrency', type=int, default=16, help='Число параллельных клиентов')
+        parser.add_argument('--scenario', choices=sorted(SCENARIO_MIXES), default='default')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--spawn-server',
+            action='store_true',
+            help='Запустить runserver на --base-url с заглушкой бота',
+        )
+        parser.add_argument('--bot-port', type=int, default=8765, help='Порт заглушки бота')
+        parser.add_argument('--admin-user', help='Логин для просмотра списка заказов в админке')
+        parser.add_argument('--admin-password')
+        parser.add_argument('--output', help='Сохранить результаты в JSON')
+        parser.add_argument('--compare', help='Сравнить с результатами из JSON')
+
+    def handle(self, *args, **options):
+        self.base_url = options['base_url'].rstrip('/')
+        self.options = options
+
+        stub = ThreadingHTTPServer(('127.0.0.1', options['bot_port']), StubBotHandler)
+        threading.Thread(target=stub.serve_forever, daemon=True).start()
+
+        server = None
+        try:
+            if options['spawn_server']:
+                server = self.spawn_server(f"http://127.0.0.1:{options['bot_port']}")
+            self.load_reference_data()
+            report = self.run(SCENARIO_MIXES[options['scenario']])
+        finally:
+            if server:
+                server.terminate()
+                server.wait(timeout=10)
+            stub.shutdown()
+
+        self.print_report(report)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+        if options['compare']:
+            with open(options['compare']) as f:
+                self.print_comparison(json.load(f), report)
+
+    def spawn_server(self, bot_url):
+        address = self.base_url.split('://', 1)[-1]
+        env = dict(os.environ, TELEGRAM_BOT_URL=bot_url)
+        server = subprocess.Popen(
+            [sys.executable, 'manage.py', 'runserver', '--noreload', address],
+            cwd=settings.BASE_DIR,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                if requests.get(f'{self.base_url}/orders/health/', timeout=1).ok:
+                    return server
+            except requests.RequestException:
+                pass
+            time.sleep(0.2)
+        server.terminate()
+        raise CommandError('Сервер не запустился за 30 секунд')
+
+    def load_reference_data(self):
+        def fetch(path):
+            response = requests.get(f'{self.base_url}{path}', timeout=10)
+            response.raise_for_status()
+            return response.json()
+
+        self.warehouse_ids = [w['id'] for w in fetch('/orders/warehouses/')]
+        self.service_ids = [s['id'] for s in fetch('/orders/services/') if s.get('is_active')]
+        self.driver_ids = [d['id'] for d in fetch('/orders/transport/drivers/')]
+        self.truck_ids = [t['id'] for t in fetch('/orders/transport/trucks/')]
+        if not self.warehouse_ids:
+            raise CommandError('В базе нет складов: заполните данные (например, seed_perf_data)')
+
+    def run(self, mix):
+        deadline = time.monotonic() + self.options['duration']
+        samples = {}
+        errors = {}
+        lock = threading.Lock()
+        scenarios = list(mix)
+        weights = [mix[name] for name in scenarios]
+
+        def worker(index):
+            rng = random.Random(self.options['seed'] + index)
+            session = requests.Session()
+            if self.options['admin_user']:
+                self.admin_login(session)
+            local_samples, local_errors = {}, {}
+
+            def call(name, method, path, **kwargs):
+                started = time.perf_counter()
+                try:
+                    response = session.request(method, f'{self.base_url}{path}', timeout=30, **kwargs)
+                    ok = response.status_code < 400
+                except requests.RequestException:
+                    response, ok = None, False
+                local_samples.setdefault(name, []).append((time.perf_counter() - started) * 1000)
+                if not ok:
+                    local_errors[name] = local_errors.get(name, 0) + 1
+                return response if ok else None
+
+            while time.monotonic() < deadline:
+                scenario = rng.choices(scenarios, weights)[0]
+                getattr(self, f'scenario_{scenario}')(rng, call)
+
+            with lock:
+                for name, values in local_samples.items():
+                    samples.setdefault(name, []).extend(values)
+                for name, count in local_errors.items():
+                    errors[name] = errors.get(name, 0) + count
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.options['concurrency']) as pool:
+            list(pool.map(worker, range(self.options['concurrency'])))
+        elapsed = time.monotonic() - started
+
+        operations = {}
+        for name, values in sorted(samples.items()):
+            operations[name] = summarize(values)
+            operations[name]['errors'] = errors.get(name, 0)
+            operations[name]['rps'] = round(len(values) / elapsed, 2)
+        return {
+            'scenario': self.options['scenario'],
+            'concurrency': self.options['concurrency'],
+            'duration': round(elapsed, 2),
+            'total_rps': round(sum(len(v) for v in samples.values()) / elapsed, 2),
+            'operations': operations,
+        }
+
+    def admin_login(self, session):
+        login_url = f'{self.base_url}/admin/login/'
+        session.get(login_url, timeout=10)
+        session.post(
+            login_url,
+            data={
+                'username': self.options['admin_user'],
+                'password': self.options['admin_password'],
+                'csrfmiddlewaretoken': session.cookies.get('csrftoken', ''),
+                'next': '/admin/',
+            },
+            headers={'Referer': login_url},
+            timeout=10,
+        )
+
+    def random_cargo(self, rng):
+        cargo = {}
+        if rng.random() < 0.7:
+            cargo['box_count'] = rng.randint(1, 50)
+            cargo['box_container_type'] = rng.choice(BOX_SIZES)
+        if not cargo or rng.random() < 0.3:
+            cargo['pallet_count'] = rng.randint(1, 10)
+            cargo['pallet_container_type'] = rng.choice(PALLET_WEIGHTS)
+        cargo['cargo_type'] = 'box' if 'box_count' in cargo else 'pallet'
+        cargo['dimensions'] = {
+            'length': rng.randint(20, 120),
+            'width': rng.randint(20, 80),
+            'height': rng.randint(20, 80),
+            'weight': rng.randint(50, 900),
+        }
+        return cargo
+
+    def random_services(self, rng):
+        if not self.service_ids:
+            return []
+        return rng.sample(self.service_ids, rng.randint(0, min(3, len(self.service_ids))))
+
+    def scenario_quote(self, rng, call):
+        # Клиент меняет параметры формы, и мини-приложение пересчитывает цену
+        for _ in range(rng.randint(3, 8)):
+            call('calculate-price', 'POST', '/orders/calculate-price/', json={
+                'delivery': {'warehouse_id': rng.choice(self.warehouse_ids)},
+                'cargo': self.random_cargo(rng),
+                'additional_services': self.random_services(rng),
+            })
+
+    def scenario_order(self, rng, call):
+        for _ in range(rng.randint(1, 5)):
+            call('api_order', 'POST', '/api/order/', json={
+                'delivery': {'warehouse_id': rng.choice(self.warehouse_ids)},
+                'cargo': self.random_cargo(rng),
+                'client': {
+                    'name': f'Нагрузочный клиент {rng.randint(1, 1000)}',
+                    'phone': f'+7900{rng.randint(1000000, 9999999)}',
+                    'company': 'Load Test',
+                    'email': 'load@example.com',
+                    'user_id': rng.randint(10**8, 10**9),
+                },
+                'pickup_address': 'Москва, ул. Тестовая, 1',
+                'additional_services': self.random_services(rng),
+            })
+
+    def scenario_browse(self, rng, call):
+        response = call('order-list', 'GET', '/orders/')
+        if response is not None:
+            orders = response.json()
+            for order in rng.sample(orders, min(3, len(orders))):
+                call('order-detail', 'GET', f"/orders/{order['id']}/")
+        if self.options['admin_user']:
+            call('admin-changelist', 'GET', '/admin/orders/order/')
+
+    def scenario_accept(self, rng, call):
+        # Администратор принимает заказ в группе: списки водителей и машин,
+        # назначение и повторное чтение заказа ботом для уведомления клиента
+        response = call('order-list', 'GET', '/orders/')
+        if response is None:
+            return
+        orders = [o for o in response.json() if o.get('status') == 'new']
+        if not orders or not self.driver_ids or not self.truck_ids:
+            return
+        order_id = rng.choice(orders)['id']
+        call('driver-list', 'GET', '/orders/transport/drivers/')
+        call('truck-list', 'GET', '/orders/transport/trucks/')
+        call('assign-driver', 'POST', f'/orders/{order_id}/assign_driver/', json={
+            'driver_id': rng.choice(self.driver_ids),
+            'truck_id': rng.choice(self.truck_ids),
+        })
+        call('order-detail', 'GET', f'/orders/{order_id}/')
+
+    def print_report(self, report):
+        self.stdout.write(
+            f"Сценарий {report['scenario']}, клиентов {report['concurrency']}, "
+            f"{report['duration']} с, всего {report['total_rps']} req/s"
+        )
+        self.stdout.write(
+            f'{"операция":<20}{"count":>8}{"err":>6}{"rps":>9}{"p50":>10}{"p95":>10}{"p99":>10}'
+        )
+        for name, stats in report['operations'].items():
+            self.stdout.write(
+                f'{name:<20}{stats["count"]:>8}{stats["errors"]:>6}{stats["rps"]:>9.2f}'
+                f'{stats["p50"]:>10.2f}{stats["p95"]:>10.2f}{stats["p99"]:>10.2f}'
+            )
+
+    def print_comparison(self, baseline, report):
+        self.stdout.write('Сравнение с базовым прогоном (p95 мс, rps):')
+        for name, stats in report['operations'].items():
+            before = baseline.get('operations', {}).get(name)
+            if not before:
+                continue
+            delta = (stats['p95'] - before['p95']) / before['p95'] * 100 if before['p95'] else 0
+            line = (
+                f'{name:<20}p95 {before["p95"]:.2f} → {stats["p95"]:.2f} ({delta:+.1f}%), '
+                f'rps {before["rps"]:.2f} → {stats["rps"]:.2f}'
+            )
+            self.stdout.write(self.style.WARNING(line) if delta > 10 else line)
@@ -0,0 +1,24 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from orders import idempotency
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет старые ключи Idempotency-Key создания заказов. Повтор запроса '
+        'со старым ключом после удаления создаст новый заказ'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7, help='Хранить ключи за столько дней')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Ключей в одном DELETE')
+
+    def handle(self, *args, **options):
+        if options['days'] < 1 or options['batch_size'] <= 0:
+            raise CommandError('--days должен быть не меньше 1, --batch-size — больше 0')
+        cutoff = timezone.now() - datetime.timedelta(days=options['days'])
+        deleted = idempotency.purge(cutoff, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Удалено ключей: {deleted}'))
@@ -0,0 +1,41 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders import stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет и сверяет дневную статистику складов с таблицей заказов. '
+        'Лучше запускать вне пиковой нагрузки: заказы, измененные во время '
+        'сверки, могут потребовать повторного запуска'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', type=datetime.date.fromisoformat, help='YYYY-MM-DD')
+        parser.add_argument('--to', dest='date_to', type=datetime.date.fromisoformat, help='YYYY-MM-DD')
+        parser.add_argument('--dry-run', action='store_true', help='Только показать расхождения')
+        parser.add_argument(
+            '--fail-on-mismatch',
+            action='store_true',
+            help='Завершиться с ошибкой, если найдены расхождения (для мониторинга)',
+        )
+
+    def handle(self, *args, **options):
+        mismatches = stats.reconcile(options['date_from'], options['date_to'], dry_run=options['dry_run'])
+
+        for date, warehouse_id, expected, actual in mismatches[:50]:
+            self.stdout.write(f'{date} склад {warehouse_id}: ожидалось {expected}, было {actual}')
+        if len(mismatches) > 50:
+            self.stdout.write(f'... и еще {len(mismatches) - 50}')
+
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS('Расхождений нет'))
+        elif options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'Найдено расхождений: {len(mismatches)}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Исправлено строк статистики: {len(mismatches)}'))
+
+        if mismatches and options['fail_on_mismatch']:
+            raise CommandError(f'Найдено расхождений: {len(mismatches)}')
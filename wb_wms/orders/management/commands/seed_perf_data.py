@@ -0,0 +1,381 @@
+import contextlib
+import datetime
+import itertools
+import random
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import models, transaction
+from django.utils import timezone
+
+from orders import stats
+from orders.models import (
+    AdditionalService,
+    BoxPricing,
+    City,
+    Driver,
+    Marketplace,
+    Order,
+    OrderEvent,
+    PalletPricing,
+    Pricing,
+    Truck,
+    Warehouse,
+)
+
+# Распределения, приближенные к реальному трафику
+STATUS_WEIGHTS = {
+    "new": 15,
+    "accepted": 20,
+    "processing": 10,
+    "completed": 45,
+    "canceled": 5,
+    "rejected": 5,
+}
+CARGO_WEIGHTS = {"box": 60, "pallet": 30, "mixed": 10}
+BOX_SIZE_WEIGHTS = {
+    "60x40x40 см": 40,
+    "50x40x40 см": 25,
+    "45x45x45 см": 15,
+    "Другой размер": 20,
+}
+PALLET_WEIGHT_WEIGHTS = {
+    "0-200 кг": 30,
+    "200-300 кг": 25,
+    "300-400 кг": 20,
+    "400-500 кг": 15,
+    "Другой вес": 10,
+}
+SERVICE_COUNT_WEIGHTS = {0: 50, 1: 30, 2: 15, 3: 5}
+SERVICE_TYPES = ["pickup", "palletizing", "loader", "other"]
+ASSIGNED_STATUSES = {"accepted", "processing", "completed"}
+# Вместимость грузовиков: (паллетомест, кг, м³) — Газель, 5 т, 10 т
+TRUCK_CAPACITIES = [(4, 1500, 9), (10, 5000, 36), (18, 10000, 54)]
+
+
+@contextlib.contextmanager
+def explicit_timestamps(model):
+    """
+    Отключает auto_now/auto_now_add, чтобы bulk_create сохранил заданные даты
+    """
+    fields = [
+        field for field in model._meta.fields
+        if isinstance(field, models.DateTimeField) and (field.auto_now or field.auto_now_add)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def weighted(rng, weights):
+    return rng.choices(list(weights), list(weights.values()))[0]
+
+
+class Command(BaseCommand):
+    help = 'Генерирует детерминированный большой набор данных для тестов производительности'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=1, help='Зерно генератора')
+        parser.add_argument('--orders', type=int, default=100_000)
+        parser.add_argument('--marketplaces', type=int, default=5)
+        parser.add_argument('--cities', type=int, default=10)
+        parser.add_argument('--warehouses', type=int, default=50)
+        parser.add_argument('--drivers', type=int, default=100)
+        parser.add_argument('--trucks', type=int, default=80)
+        parser.add_argument('--services', type=int, default=12)
+        parser.add_argument('--customers', type=int, default=20_000, help='Число клиентов Telegram')
+        parser.add_argument('--days', type=int, default=365, help='Период создания заказов, дней')
+        parser.add_argument(
+            '--end-date',
+            type=datetime.date.fromisoformat,
+            default=datetime.date.today(),
+            help='Конец периода (YYYY-MM-DD), по умолчанию сегодня',
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Добавить данные, даже если заказы уже есть (результат не будет детерминированным)',
+        )
+
+    def handle(self, *args, **options):
+        if Order.objects.exists() and not options['force']:
+            raise CommandError(
+                'В базе уже есть заказы. Используйте пустую базу или --force'
+            )
+
+        rng = random.Random(options['seed'])
+        self.options = options
+
+        with transaction.atomic():
+            warehouses = self.create_reference_data(rng)
+        drivers = list(
+            Driver.objects.filter(is_active=True).order_by('id').values_list('id', flat=True)
+        )
+        trucks = list(
+            Truck.objects.filter(is_active=True).order_by('id').values_list('id', flat=True)
+        )
+        services = list(
+            AdditionalService.objects.filter(is_active=True).order_by('id').values_list('id', 'price')
+        )
+
+        delivery_prices = dict(
+            Pricing.objects.filter(pricing_type='delivery', is_active=True)
+            .values_list('warehouse_id', 'base_price')
+        )
+        self.box_prices = BoxPricing.get_default_prices()
+        self.pallet_prices = PalletPricing.get_default_prices()
+
+        # Популярные склады и постоянные клиенты дают больше заказов (распределение Ципфа).
+        # Накопленные веса считаются один раз: иначе choices пересчитывает их на каждый заказ
+        warehouse_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(warehouses))))
+        customers = [rng.randint(10**8, 10**10) for _ in range(options['customers'])]
+        customer_weights = list(itertools.accumulate(1 / (rank + 1) ** 0.8 for rank in range(len(customers))))
+
+        total = options['orders']
+        last_number = Order.objects.aggregate(models.Max('sequence_number'))['sequence_number__max'] or 0
+        # Период привязан к дате, а не к текущему времени, чтобы данные совпадали между прогонами
+        end = timezone.make_aware(datetime.datetime.combine(options['end_date'], datetime.time.min))
+        start = end - datetime.timedelta(days=options['days'])
+        step = (end - start) / max(total, 1)
+        through = Order.services.through
+
+        created = 0
+        with explicit_timestamps(Order):
+            while created < total:
+                batch_size = min(options['batch_size'], total - created)
+                orders = []
+                links = []
+                events = []
+                for i in range(created, created + batch_size):
+                    created_at = start + step * i + datetime.timedelta(seconds=rng.randint(0, 59))
+                    warehouse = rng.choices(warehouses, cum_weights=warehouse_weights)[0]
+                    order_services = rng.sample(
+                        services, min(weighted(rng, SERVICE_COUNT_WEIGHTS), len(services))
+                    )
+                    order = self.build_order(
+                        rng,
+                        number=last_number + i + 1,
+                        created_at=created_at,
+                        warehouse=warehouse,
+                        telegram_user_id=rng.choices(customers, cum_weights=customer_weights)[0],
+                        drivers=drivers,
+                        trucks=trucks,
+                    )
+                    order.total_price = (
+                        self.cargo_price(order)
+                        + delivery_prices.get(warehouse.id, Decimal('0.00'))
+                        + sum((price for _, price in order_services), Decimal('0.00'))
+                    )
+                    orders.append(order)
+                    events.extend(self.build_events(order))
+                    links.extend(
+                        through(order_id=order.id, additionalservice_id=service_id)
+                        for service_id, _ in order_services
+                    )
+
+                with transaction.atomic():
+                    Order.objects.bulk_create(orders, batch_size=1000)
+                    through.objects.bulk_create(links, batch_size=5000)
+                    OrderEvent.objects.bulk_create(events, batch_size=5000)
+
+                created += batch_size
+                self.stdout.write(f'Создано заказов: {created}/{total}')
+
+        # bulk_create обходит Order.save: события записаны выше,
+        # а сводки пересчитываются целиком; последовательность номеров
+        # продолжается после записанных
+        stats.reconcile()
+        Order.reset_sequence_numbers()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Сгенерировано {total} заказов на {len(warehouses)} складах (seed={options["seed"]})'
+        ))
+
+    def create_reference_data(self, rng):
+        options = self.options
+        marketplaces = Marketplace.objects.bulk_create(
+            Marketplace(name=f'Маркетплейс {i + 1}') for i in range(options['marketplaces'])
+        )
+        cities = City.objects.bulk_create(
+            City(name=f'Город {i + 1}') for i in range(options['cities'])
+        )
+        warehouses = Warehouse.objects.bulk_create(
+            Warehouse(
+                name=f'Склад {i + 1}',
+                marketplace=rng.choice(marketplaces),
+                city=rng.choice(cities),
+            )
+            for i in range(options['warehouses'])
+        )
+        Pricing.objects.bulk_create(
+            Pricing(
+                name=f'Доставка на {warehouse.name}',
+                pricing_type='delivery',
+                warehouse=warehouse,
+                base_price=Decimal(rng.randrange(500, 5000, 100)),
+            )
+            for warehouse in warehouses
+        )
+        Driver.objects.bulk_create(
+            Driver(full_name=f'Водитель {i + 1}', phone=f'+7901{rng.randint(1000000, 9999999)}')
+            for i in range(options['drivers'])
+        )
+        Truck.objects.bulk_create(
+            Truck(
+                brand=rng.choice(['ГАЗ', 'Isuzu', 'Hyundai', 'Volvo']),
+                truck_model=rng.choice(['Газель', 'NQR', 'HD78', 'FL']),
+                plate_number=f'А{rng.randint(100, 999)}АА{rng.randint(10, 199)}',
+                pallet_capacity=pallets,
+                max_weight_kg=Decimal(weight),
+                cargo_volume_m3=Decimal(volume),
+            )
+            for pallets, weight, volume in (
+                rng.choice(TRUCK_CAPACITIES) for _ in range(options['trucks'])
+            )
+        )
+        AdditionalService.objects.bulk_create(
+            AdditionalService(
+                name=f'Услуга {i + 1}',
+                service_type=SERVICE_TYPES[i % len(SERVICE_TYPES)],
+                price=Decimal(rng.randrange(200, 3000, 50)),
+                requires_location=SERVICE_TYPES[i % len(SERVICE_TYPES)] == 'pickup',
+            )
+            for i in range(options['services'])
+        )
+        return warehouses
+
+    def build_order(self, rng, number, created_at, warehouse, telegram_user_id, drivers, trucks):
+        cargo_kind = weighted(rng, CARGO_WEIGHTS)
+        status = weighted(rng, STATUS_WEIGHTS)
+        cargo = {"cargo_type": cargo_kind, "dimensions": {}}
+        box_count = pallet_count = 0
+
+        if cargo_kind in ("box", "mixed"):
+            box_count = rng.randint(1, 60)
+            cargo["box_count"] = box_count
+            cargo["box_container_type"] = weighted(rng, BOX_SIZE_WEIGHTS)
+            if cargo["box_container_type"] == "Другой размер":
+                cargo["dimensions"].update(
+                    length=rng.randint(20, 120), width=rng.randint(20, 80), height=rng.randint(20, 80)
+                )
+        if cargo_kind in ("pallet", "mixed"):
+            pallet_count = rng.randint(1, 12)
+            cargo["pallet_count"] = pallet_count
+            cargo["pallet_container_type"] = weighted(rng, PALLET_WEIGHT_WEIGHTS)
+            if cargo["pallet_container_type"] == "Другой вес":
+                cargo["dimensions"]["weight"] = rng.randint(500, 1200)
+
+        dimensions = cargo["dimensions"]
+        client = {
+            "name": f'Клиент {telegram_user_id % 100000}',
+            "phone": f'+79{telegram_user_id % 10**9:09d}',
+            "company": f'ООО Продавец {telegram_user_id % 5000}',
+            "email": f'seller{telegram_user_id % 100000}@example.com',
+            "user_id": telegram_user_id,
+        }
+        assigned = status in ASSIGNED_STATUSES and drivers and trucks
+        updated_at = created_at + datetime.timedelta(minutes=rng.randint(1, 60 * 72))
+        # Заказ в статусе accepted принят при последнем обновлении, остальные — раньше
+        if status == "accepted":
+            accepted_at = updated_at
+        else:
+            accepted_at = created_at + (updated_at - created_at) * rng.uniform(0.1, 0.5)
+
+        return Order(
+            id=uuid.UUID(int=rng.getrandbits(128), version=4),
+            sequence_number=number,
+            status=status,
+            created_at=created_at,
+            updated_at=updated_at,
+            warehouse=warehouse,
+            cargo_type=cargo_kind,
+            container_type=cargo.get("box_container_type") or cargo.get("pallet_container_type"),
+            box_container_type=cargo.get("box_container_type"),
+            pallet_container_type=cargo.get("pallet_container_type"),
+            box_count=box_count,
+            pallet_count=pallet_count,
+            length=dimensions.get("length"),
+            width=dimensions.get("width"),
+            height=dimensions.get("height"),
+            weight=dimensions.get("weight"),
+            client_name=client["name"],
+            phone_number=client["phone"],
+            company=client["company"],
+            email=client["email"],
+            telegram_user_id=telegram_user_id,
+            pickup_address=f'Город, ул. Складская, {rng.randint(1, 300)}' if rng.random() < 0.4 else None,
+            additional_services={
+                "cargo": cargo,
+                "client": client,
+                "delivery": {"warehouse_id": warehouse.id},
+            },
+            driver_id=rng.choice(drivers) if assigned else None,
+            truck_id=rng.choice(trucks) if assigned else None,
+            driver_assigned_at=accepted_at if assigned else None,
+        )
+
+    def build_events(self, order):
+        """
+        Журнал событий, согласованный с итоговым состоянием заказа
+        """
+        events = [OrderEvent(
+            order_id=order.id, warehouse_id=order.warehouse_id, type="created", to_status="new", at=order.created_at
+        )]
+        previous = "new"
+        if order.driver_assigned_at:
+            events.append(OrderEvent(
+                order_id=order.id,
+                warehouse_id=order.warehouse_id,
+                type="driver_assigned",
+                data={"driver_id": order.driver_id, "truck_id": order.truck_id},
+                at=order.driver_assigned_at,
+            ))
+            events.append(OrderEvent(
+                order_id=order.id,
+                warehouse_id=order.warehouse_id,
+                type="status_changed",
+                from_status="new",
+                to_status="accepted",
+                at=order.driver_assigned_at,
+            ))
+            previous = "accepted"
+        if order.status != previous:
+            events.append(OrderEvent(
+                order_id=order.id,
+                warehouse_id=order.warehouse_id,
+                type="status_changed",
+                from_status=previous,
+                to_status=order.status,
+                at=order.updated_at,
+            ))
+        return events
+
+    def cargo_price(self, order):
+        """
+        Стоимость груза по тем же правилам, что и Order.calculate_price,
+        но по заранее загруженным тарифам, без запросов к БД
+        """
+        cargo = order.additional_services["cargo"]
+        total = Decimal("0.00")
+        if order.box_count:
+            size = cargo["box_container_type"]
+            if size == "Другой размер":
+                dims = cargo["dimensions"]
+                size = BoxPricing.calculate_volume(dims["length"], dims["width"], dims["height"])
+            total += Decimal(str(self.box_prices.get(size, 450.00))) * order.box_count
+        if order.pallet_count:
+            category = cargo["pallet_container_type"]
+            if category == "Другой вес":
+                extra_hundreds = (cargo["dimensions"]["weight"] - 500 + 99) // 100
+                price = Decimal("5000.00") + Decimal(max(extra_hundreds, 0) * 1000)
+            else:
+                price = Decimal(str(self.pallet_prices.get(category, 2000.00)))
+            total += price * order.pallet_count
+        return total
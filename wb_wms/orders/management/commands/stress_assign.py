@@ -0,0 +1,99 @@
+import threading
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from orders.benchmarks import summarize
+from orders.models import Driver, Order, OrderEvent, Truck
+
+
+class Command(BaseCommand):
+    help = (
+        'Стресс-тест назначения водителя: параллельные запросы на один заказ, '
+        'проверка, что выигрывает ровно один. Меняет данные — запускать на тестовой базе'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rounds', type=int, default=20, help='Количество заказов (раундов)')
+        parser.add_argument('--concurrency', type=int, default=8, help='Параллельных запросов на заказ')
+        parser.add_argument(
+            '--mode',
+            choices=['version', 'status'],
+            default='version',
+            help='Условие запросов: версия, прочитанная до раунда, или expected_status=new (как у бота)',
+        )
+
+    def handle(self, *args, **options):
+        rounds, concurrency = options['rounds'], options['concurrency']
+        if rounds <= 0 or concurrency < 2:
+            raise CommandError('--rounds должен быть больше 0, --concurrency — не меньше 2')
+
+        orders = list(Order.objects.filter(status='new', driver__isnull=True).order_by('created_at')[:rounds])
+        drivers = list(Driver.objects.filter(is_active=True).order_by('id')[:concurrency])
+        trucks = list(Truck.objects.filter(is_active=True).order_by('id')[:concurrency])
+        if len(orders) < rounds or len(drivers) < concurrency or len(trucks) < concurrency:
+            raise CommandError('Недостаточно новых заказов, водителей или грузовиков, запустите seed_perf_data')
+
+        outcomes = Counter()
+        latencies = []
+        failures = []
+        for order in orders:
+            results = self.run_round(order, drivers, trucks, options['mode'])
+            statuses = Counter(code for code, _, _ in results)
+            outcomes.update(statuses)
+            latencies.extend(elapsed for _, _, elapsed in results)
+
+            winners = [driver.id for code, driver, _ in results if code == 200]
+            order.refresh_from_db()
+            accepted_events = OrderEvent.objects.filter(
+                order_id=order.pk, type='status_changed', to_status='accepted'
+            ).count()
+            if len(winners) != 1:
+                failures.append(f'{order.pk}: успешных назначений {len(winners)}, ответы {dict(statuses)}')
+            elif order.driver_id != winners[0] or accepted_events != 1:
+                failures.append(
+                    f'{order.pk}: водитель {order.driver_id} вместо {winners[0]}, '
+                    f'событий принятия {accepted_events}'
+                )
+
+        self.stdout.write(f'Раундов: {rounds}, запросов на заказ: {concurrency}, режим: {options["mode"]}')
+        self.stdout.write('Ответы: ' + ', '.join(f'{code}: {count}' for code, count in sorted(outcomes.items())))
+        stats = summarize(latencies)
+        self.stdout.write(f'Задержка, мс: p50 {stats["p50"]:.1f}, p95 {stats["p95"]:.1f}, max {stats["max"]:.1f}')
+        if failures:
+            for failure in failures:
+                self.stdout.write(self.style.ERROR(failure))
+            raise CommandError(f'Нарушений: {len(failures)} из {rounds} раундов')
+        self.stdout.write(self.style.SUCCESS('В каждом раунде выиграл ровно один запрос'))
+
+    def run_round(self, order, drivers, trucks, mode):
+        """
+        Одновременно отправляет назначения разных экипажей на заказ.
+        Возвращает [(код ответа, водитель, время в мс)]
+        """
+        url = reverse('orders:assign-driver', kwargs={'order_id': order.pk})
+        condition = {'version': order.version} if mode == 'version' else {'expected_status': 'new'}
+        barrier = threading.Barrier(len(drivers))
+        results = [None] * len(drivers)
+
+        def worker(index):
+            client = Client()
+            payload = {'driver_id': drivers[index].id, 'truck_id': trucks[index].id, **condition}
+            try:
+                barrier.wait()
+                started = time.perf_counter()
+                response = client.post(url, payload, content_type='application/json')
+                results[index] = (response.status_code, drivers[index], (time.perf_counter() - started) * 1000)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(index,)) for index in range(len(drivers))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
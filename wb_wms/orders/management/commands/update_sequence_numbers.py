@@ -23,7 +23,10 @@ class Command(BaseCommand):
             order.sequence_number = last_number
             order.save(update_fields=['sequence_number'])
             count += 1
-            
+
+        # Новые заказы получат номера после проставленных
+        Order.reset_sequence_numbers()
+
         self.stdout.write(
             self.style.SUCCESS(
                 f'Successfully updated sequence numbers for {count} orders'
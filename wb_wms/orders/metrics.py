@@ -0,0 +1,176 @@
+"""
+Метрики производительности запросов.
+
+Для каждого запроса PerformanceMiddleware собирает RequestMetrics: общее время,
+число и время SQL-запросов, время обращений к Telegram-боту и время
+сериализации. Сериализация — это serializer.data (to_representation,
+вычисляемые поля), которая выполняется внутри view и учитывается через
+timed_serialization в сериализаторах orders/serializers.py, и рендеринг
+ответа рендерером DRF после view. Время serializer.data включает
+SQL-запросы, которые выполняются при переборе queryset. Значения агрегируются в гистограммы по
+имени URL и отдаются эндпоинтом /orders/metrics/ в текстовом формате
+Prometheus.
+
+Гистограммы хранятся в памяти процесса: при нескольких воркерах каждый
+отдает свои значения, суммирование выполняет Prometheus.
+"""
+import contextlib
+import contextvars
+import threading
+import time
+
+# Границы корзин гистограмм длительности, в секундах
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+# Границы корзин гистограммы количества SQL-запросов
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+current_metrics = contextvars.ContextVar("current_metrics", default=None)
+
+
+class RequestMetrics:
+    """
+    Метрики одного запроса
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.total = 0.0
+        self.queries = 0
+        self.sql = 0.0
+        self.bot = 0.0
+        self.serialize = 0.0
+        self.render = 0.0
+        self.serializing = False
+
+    def sql_wrapper(self, execute, sql, params, many, context):
+        """
+        Обертка для connection.execute_wrapper: считает запросы и их время
+        """
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql += time.perf_counter() - started
+            self.queries += 1
+
+    def finish(self):
+        self.total = time.perf_counter() - self.started
+
+    def server_timing(self):
+        """
+        Значение заголовка Server-Timing (длительности в миллисекундах)
+        """
+        return ", ".join(
+            [
+                f"total;dur={self.total * 1000:.2f}",
+                f'db;dur={self.sql * 1000:.2f};desc="{self.queries} queries"',
+                f"bot;dur={self.bot * 1000:.2f}",
+                f"serialize;dur={self.serialize * 1000:.2f}",
+                f"render;dur={self.render * 1000:.2f}",
+            ]
+        )
+
+
+def record_bot_call(duration):
+    """
+    Учитывает время обращения к Telegram-боту в метриках текущего запроса
+    """
+    metrics = current_metrics.get()
+    if metrics is not None:
+        metrics.bot += duration
+
+
+@contextlib.contextmanager
+def timed_serialization():
+    """
+    Учитывает время блока (serializer.data) в сериализации текущего запроса.
+    Вложенные блоки не учитываются повторно
+    """
+    metrics = current_metrics.get()
+    if metrics is None or metrics.serializing:
+        yield
+        return
+    metrics.serializing = True
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serialize += time.perf_counter() - started
+        metrics.serializing = False
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class MetricsRegistry:
+    """
+    Гистограммы метрик запросов, сгруппированные по имени URL
+    """
+
+    METRICS = {
+        "wb_request_duration_seconds": ("Общее время обработки запроса", DURATION_BUCKETS),
+        "wb_db_queries": ("Количество SQL-запросов на запрос", QUERY_BUCKETS),
+        "wb_db_duration_seconds": ("Время выполнения SQL-запросов", DURATION_BUCKETS),
+        "wb_bot_duration_seconds": ("Время обращений к Telegram-боту", DURATION_BUCKETS),
+        "wb_serialization_duration_seconds": (
+            "Время сериализации: serializer.data и рендеринг ответа",
+            DURATION_BUCKETS,
+        ),
+        "wb_render_duration_seconds": ("Время рендеринга ответа рендерером DRF", DURATION_BUCKETS),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+
+    def observe(self, url_name, metrics):
+        values = {
+            "wb_request_duration_seconds": metrics.total,
+            "wb_db_queries": metrics.queries,
+            "wb_db_duration_seconds": metrics.sql,
+            "wb_bot_duration_seconds": metrics.bot,
+            "wb_serialization_duration_seconds": metrics.serialize + metrics.render,
+            "wb_render_duration_seconds": metrics.render,
+        }
+        with self._lock:
+            for name, value in values.items():
+                key = (name, url_name)
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    histogram = self._histograms[key] = Histogram(self.METRICS[name][1])
+                histogram.observe(value)
+
+    def render_prometheus(self):
+        """
+        Текстовый формат экспозиции Prometheus (version 0.0.4)
+        """
+        lines = []
+        with self._lock:
+            for name, (description, buckets) in self.METRICS.items():
+                lines.append(f"# HELP {name} {description}")
+                lines.append(f"# TYPE {name} histogram")
+                for (metric, url_name), histogram in sorted(self._histograms.items()):
+                    if metric != name:
+                        continue
+                    label = f'url_name="{url_name}"'
+                    for bound, count in zip(buckets, histogram.counts):
+                        lines.append(f'{name}_bucket{{{label},le="{bound}"}} {count}')
+                    lines.append(f'{name}_bucket{{{label},le="+Inf"}} {histogram.count}')
+                    lines.append(f"{name}_sum{{{label}}} {histogram.sum}")
+                    lines.append(f"{name}_count{{{label}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
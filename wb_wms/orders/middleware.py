@@ -0,0 +1,49 @@
+import time
+
+from django.db import connection
+
+from .metrics import RequestMetrics, current_metrics, registry
+
+
+class PerformanceMiddleware:
+    """
+    Собирает метрики каждого запроса (см. orders/metrics.py), добавляет
+    заголовок Server-Timing и учитывает значения в гистограммах по имени URL.
+
+    Должен стоять первым в MIDDLEWARE, чтобы общее время включало
+    работу остальных middleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            with connection.execute_wrapper(metrics.sql_wrapper):
+                response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        metrics.finish()
+
+        match = getattr(request, "resolver_match", None)
+        url_name = match.url_name if match and match.url_name else "unmatched"
+        registry.observe(url_name, metrics)
+
+        response["Server-Timing"] = metrics.server_timing()
+        return response
+
+    def process_template_response(self, request, response):
+        # Ответы DRF рендерятся сразу после этого хука: время до post-render
+        # колбэка — время рендеринга. serializer.data выполняется раньше,
+        # внутри view, и учитывается отдельно (metrics.timed_serialization)
+        metrics = current_metrics.get()
+        if metrics is not None:
+            started = time.perf_counter()
+
+            def on_rendered(rendered):
+                metrics.render += time.perf_counter() - started
+
+            response.add_post_render_callback(on_rendered)
+        return response
@@ -0,0 +1,37 @@
+# Generated by Django 4.2 on 2026-10-19 04:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0011_alter_truck_options_truck_truck_model_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyWarehouseStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('orders_count', models.IntegerField(default=0, verbose_name='Заказов')),
+                ('canceled_count', models.IntegerField(default=0, verbose_name='Отменено')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Выручка')),
+                ('box_count', models.IntegerField(default=0, verbose_name='Коробок')),
+                ('pallet_count', models.IntegerField(default=0, verbose_name='Паллет')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='orders.warehouse', verbose_name='Склад')),
+            ],
+            options={
+                'verbose_name': 'Статистика склада за день',
+                'verbose_name_plural': 'Статистика складов по дням',
+                'ordering': ['-date', 'warehouse'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailywarehousestats',
+            constraint=models.UniqueConstraint(fields=('date', 'warehouse'), name='daily_stats_date_warehouse'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2 on 2026-10-19 04:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def backfill_created_events(apps, schema_editor):
+    """
+    Событие создания для существующих заказов. Прежние смены статуса
+    не восстанавливаются: их время нигде не сохранялось
+    """
+    Order = apps.get_model("orders", "Order")
+    OrderEvent = apps.get_model("orders", "OrderEvent")
+    batch = []
+    for order_id, created_at in Order.objects.values_list("id", "created_at").iterator(chunk_size=5000):
+        batch.append(OrderEvent(order_id=order_id, type="created", to_status="new", at=created_at))
+        if len(batch) >= 5000:
+            OrderEvent.objects.bulk_create(batch)
+            batch = []
+    OrderEvent.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0012_dailywarehousestats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.CharField(choices=[('created', 'Создан'), ('status_changed', 'Смена статуса'), ('driver_assigned', 'Назначен водитель'), ('deleted', 'Удален')], max_length=30, verbose_name='Тип события')),
+                ('from_status', models.CharField(blank=True, max_length=20, null=True, verbose_name='Прежний статус')),
+                ('to_status', models.CharField(blank=True, max_length=20, null=True, verbose_name='Новый статус')),
+                ('data', models.JSONField(blank=True, default=dict, verbose_name='Данные')),
+                ('at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Время')),
+                ('order', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='events', to='orders.order', verbose_name='Заказ')),
+            ],
+            options={
+                'verbose_name': 'Событие заказа',
+                'verbose_name_plural': 'События заказов',
+                'ordering': ['at', 'id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='orderevent',
+            index=models.Index(fields=['order', 'at'], name='order_event_order_at'),
+        ),
+        migrations.AddIndex(
+            model_name='orderevent',
+            index=models.Index(fields=['type', 'at'], name='order_event_type_at'),
+        ),
+        migrations.RunPython(backfill_created_events, migrations.RunPython.noop),
+    ]
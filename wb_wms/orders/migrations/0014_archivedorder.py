@@ -0,0 +1,85 @@
+# Generated by Django 4.2 on 2026-10-19 04:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+# Первичный ключ секционированной таблицы обязан включать ключ секционирования
+POSTGRES_ARCHIVE_TABLE = """
+CREATE TABLE "orders_archivedorder" (
+    "id" uuid NOT NULL,
+    "sequence_number" integer NOT NULL CHECK ("sequence_number" >= 0),
+    "status" varchar(20) NOT NULL,
+    "created_at" timestamp with time zone NOT NULL,
+    "updated_at" timestamp with time zone NOT NULL,
+    "archived_at" timestamp with time zone NOT NULL,
+    "warehouse_id" bigint NOT NULL,
+    "telegram_user_id" bigint NULL,
+    "total_price" numeric(10, 2) NOT NULL,
+    "box_count" integer NULL CHECK ("box_count" >= 0),
+    "pallet_count" integer NULL CHECK ("pallet_count" >= 0),
+    "payload" jsonb NOT NULL,
+    PRIMARY KEY ("id", "created_at")
+) PARTITION BY RANGE ("created_at");
+CREATE INDEX "orders_archivedorder_sequence_number_idx" ON "orders_archivedorder" ("sequence_number");
+CREATE INDEX "orders_archivedorder_telegram_user_id_idx" ON "orders_archivedorder" ("telegram_user_id");
+CREATE INDEX "orders_archivedorder_warehouse_id_idx" ON "orders_archivedorder" ("warehouse_id");
+"""
+
+
+def create_archive_table(apps, schema_editor):
+    """
+    В PostgreSQL архив секционируется по месяцам created_at,
+    на остальных СУБД создается обычная таблица
+    """
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(POSTGRES_ARCHIVE_TABLE)
+    else:
+        schema_editor.create_model(apps.get_model("orders", "ArchivedOrder"))
+
+
+def drop_archive_table(apps, schema_editor):
+    # Секции в PostgreSQL удаляются вместе с родительской таблицей
+    schema_editor.delete_model(apps.get_model("orders", "ArchivedOrder"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0013_orderevent'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='orderevent',
+            name='type',
+            field=models.CharField(choices=[('created', 'Создан'), ('status_changed', 'Смена статуса'), ('driver_assigned', 'Назначен водитель'), ('deleted', 'Удален'), ('archived', 'Перенесен в архив')], max_length=30, verbose_name='Тип события'),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='ArchivedOrder',
+                    fields=[
+                        ('id', models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                        ('sequence_number', models.PositiveIntegerField(db_index=True, verbose_name='Порядковый номер')),
+                        ('status', models.CharField(max_length=20, verbose_name='Статус заказа')),
+                        ('created_at', models.DateTimeField(verbose_name='Дата создания')),
+                        ('updated_at', models.DateTimeField(verbose_name='Дата обновления')),
+                        ('archived_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата архивации')),
+                        ('telegram_user_id', models.BigIntegerField(blank=True, db_index=True, null=True, verbose_name='ID пользователя Telegram')),
+                        ('total_price', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Общая стоимость')),
+                        ('box_count', models.PositiveIntegerField(blank=True, null=True, verbose_name='Количество коробок')),
+                        ('pallet_count', models.PositiveIntegerField(blank=True, null=True, verbose_name='Количество паллет')),
+                        ('payload', models.JSONField(verbose_name='Данные заказа')),
+                        ('warehouse', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='orders.warehouse', verbose_name='Склад доставки')),
+                    ],
+                    options={
+                        'verbose_name': 'Архивный заказ',
+                        'verbose_name_plural': 'Архивные заказы',
+                        'ordering': ['-created_at'],
+                    },
+                ),
+            ],
+        ),
+        migrations.RunPython(create_archive_table, drop_archive_table),
+    ]
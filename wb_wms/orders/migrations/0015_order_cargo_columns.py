@@ -0,0 +1,39 @@
+# Generated by Django 4.2 on 2026-10-19 04:57
+
+from django.db import migrations, models
+from django.db.models import Value
+from django.db.models.fields.json import KT
+from django.db.models.functions import NullIf
+
+
+def copy_container_types(apps, schema_editor):
+    """
+    Переносит типы контейнеров из additional_services["cargo"] одним UPDATE.
+    Размеры и вес уже хранятся в колонках length/width/height/weight
+    """
+    Order = apps.get_model("orders", "Order")
+    Order.objects.update(
+        box_container_type=NullIf(KT("additional_services__cargo__box_container_type"), Value("")),
+        pallet_container_type=NullIf(KT("additional_services__cargo__pallet_container_type"), Value("")),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0014_archivedorder'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='box_container_type',
+            field=models.CharField(blank=True, db_index=True, max_length=50, null=True, verbose_name='Размер коробок'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='pallet_container_type',
+            field=models.CharField(blank=True, db_index=True, max_length=50, null=True, verbose_name='Весовая категория паллет'),
+        ),
+        migrations.RunPython(copy_container_types, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2 on 2026-10-19 05:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0016_order_updated_at_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='truck',
+            name='cargo_volume_m3',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True, verbose_name='Объем кузова, м³'),
+        ),
+        migrations.AddField(
+            model_name='truck',
+            name='max_weight_kg',
+            field=models.DecimalField(blank=True, decimal_places=1, max_digits=8, null=True, verbose_name='Грузоподъемность, кг'),
+        ),
+        migrations.AddField(
+            model_name='truck',
+            name='pallet_capacity',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Паллетомест'),
+        ),
+    ]
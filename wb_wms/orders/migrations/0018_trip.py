@@ -0,0 +1,41 @@
+# Generated by Django 4.2 on 2026-10-19 05:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0017_truck_capacity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Trip',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата забора')),
+                ('status', models.CharField(choices=[('planned', 'Запланирован'), ('in_progress', 'В пути'), ('completed', 'Завершен'), ('canceled', 'Отменен')], default='planned', max_length=20, verbose_name='Статус рейса')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+                ('driver', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='trips', to='orders.driver', verbose_name='Водитель')),
+                ('truck', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='trips', to='orders.truck', verbose_name='Грузовик')),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='trips', to='orders.warehouse', verbose_name='Склад доставки')),
+            ],
+            options={
+                'verbose_name': 'Рейс',
+                'verbose_name_plural': 'Рейсы',
+                'ordering': ['-date', 'id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='trip',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='orders', to='orders.trip', verbose_name='Рейс'),
+        ),
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(fields=['date', 'warehouse'], name='trip_date_warehouse'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2 on 2026-10-19 05:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0018_trip'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('status__in', ('accepted', 'processing'))), fields=['driver', 'status', 'created_at'], name='order_driver_open'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('status__in', ('accepted', 'processing'))), fields=['truck', 'status', 'created_at'], name='order_truck_open'),
+        ),
+    ]
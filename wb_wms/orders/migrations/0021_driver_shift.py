@@ -0,0 +1,41 @@
+# Generated by Django 4.2 on 2026-10-19 05:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0020_order_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DriverShift',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('starts_at', models.DateTimeField(verbose_name='Начало')),
+                ('ends_at', models.DateTimeField(verbose_name='Окончание')),
+                ('comment', models.CharField(blank=True, default='', max_length=255, verbose_name='Комментарий')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True, verbose_name='Дата обновления')),
+                ('driver', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shifts', to='orders.driver', verbose_name='Водитель')),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='shifts', to='orders.order', verbose_name='Заказ')),
+                ('trip', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='shifts', to='orders.trip', verbose_name='Рейс')),
+            ],
+            options={
+                'verbose_name': 'Смена водителя',
+                'verbose_name_plural': 'Смены водителей',
+                'ordering': ['starts_at', 'id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='drivershift',
+            index=models.Index(fields=['driver', 'starts_at'], name='shift_driver_start'),
+        ),
+        migrations.AddConstraint(
+            model_name='drivershift',
+            constraint=models.CheckConstraint(check=models.Q(('ends_at__gt', models.F('starts_at'))), name='shift_ends_after_start'),
+        ),
+    ]
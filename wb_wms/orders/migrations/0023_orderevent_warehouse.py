@@ -0,0 +1,38 @@
+# Generated by Django 4.2 on 2026-10-19 05:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_warehouse(apps, schema_editor):
+    """
+    Склад для существующих событий — из заказа или архива. У событий
+    заказов, удаленных до этой миграции, склад не восстановить
+    """
+    Order = apps.get_model("orders", "Order")
+    ArchivedOrder = apps.get_model("orders", "ArchivedOrder")
+    OrderEvent = apps.get_model("orders", "OrderEvent")
+    OrderEvent.objects.filter(warehouse__isnull=True).update(
+        warehouse_id=Coalesce(
+            Subquery(Order.objects.filter(pk=OuterRef("order_id")).values("warehouse_id")[:1]),
+            Subquery(ArchivedOrder.objects.filter(pk=OuterRef("order_id")).values("warehouse_id")[:1]),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0022_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderevent',
+            name='warehouse',
+            field=models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='orders.warehouse', verbose_name='Склад'),
+        ),
+        migrations.RunPython(backfill_warehouse, migrations.RunPython.noop),
+    ]
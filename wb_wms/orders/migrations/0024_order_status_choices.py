@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-19 06:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0023_orderevent_warehouse'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='status',
+            field=models.CharField(choices=[('new', 'Новый'), ('accepted', 'Принят'), ('processing', 'В обработке'), ('completed', 'Выполнен'), ('rejected', 'Отклонен'), ('canceled', 'Отменен')], default='new', max_length=20, verbose_name='Статус заказа'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations
+
+
+def backfill_daily_stats(apps, schema_editor):
+    """
+    Заполняет дневную статистику по заказам, созданным до 0012: без этого
+    изменение такого заказа вычитало бы из счетчиков то, что в них не
+    прибавлялось. Тот же пересчет, что в reconcile_daily_stats, —
+    повторный запуск исправляет только расхождения
+    """
+    from orders import stats
+
+    stats.reconcile(
+        stats_model=apps.get_model("orders", "DailyWarehouseStats"),
+        sources=(apps.get_model("orders", "Order"), apps.get_model("orders", "ArchivedOrder")),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0024_order_status_choices'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_daily_stats, migrations.RunPython.noop),
+    ]
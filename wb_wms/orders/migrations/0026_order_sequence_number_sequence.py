@@ -0,0 +1,35 @@
+from django.db import migrations
+
+SEQUENCE_NAME = "orders_order_sequence_number"
+
+
+def create_sequence(apps, schema_editor):
+    """
+    Последовательность номеров заказов (Order.allocate_sequence_numbers),
+    продолжающая наибольший номер среди заказов и архива. Только PostgreSQL
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(f"CREATE SEQUENCE IF NOT EXISTS {SEQUENCE_NAME}")
+    schema_editor.execute(
+        "SELECT setval(%s, GREATEST((SELECT MAX(sequence_number) FROM orders_order), "
+        "(SELECT MAX(sequence_number) FROM orders_archivedorder), 0) + 1, false)",
+        [SEQUENCE_NAME],
+    )
+
+
+def drop_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(f"DROP SEQUENCE IF EXISTS {SEQUENCE_NAME}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0025_backfill_daily_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_sequence, drop_sequence),
+    ]
@@ -4,9 +4,12 @@ import logging
 
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models import F
 from django.utils import timezone
 
+from . import pubsub
+
 logger = logging.getLogger(__name__)
 
 STATUS = [
@@ -225,6 +228,16 @@ class Truck(models.Model):
     brand = models.CharField(max_length=100, verbose_name="Марка")
     truck_model = models.CharField(max_length=100, verbose_name="Модель", default="")
     plate_number = models.CharField(max_length=20, verbose_name="Гос. номер")
+    # Вместимость; пустое значение — ограничение не задано и не проверяется
+    pallet_capacity = models.PositiveIntegerField(
+        blank=True, null=True, verbose_name="Паллетомест"
+    )
+    max_weight_kg = models.DecimalField(
+        max_digits=8, decimal_places=1, blank=True, null=True, verbose_name="Грузоподъемность, кг"
+    )
+    cargo_volume_m3 = models.DecimalField(
+        max_digits=6, decimal_places=2, blank=True, null=True, verbose_name="Объем кузова, м³"
+    )
     is_active = models.BooleanField(default=True, verbose_name="Активен")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -238,11 +251,95 @@ class Truck(models.Model):
         return f"{self.brand} {self.truck_model} - {self.plate_number}"
 
 
+class Trip(models.Model):
+    """
+    Рейс: заказы одного дня забора на один склад, которые везет один
+    экипаж (водитель и грузовик). Планируются в orders/trips.py
+    """
+    STATUS_CHOICES = (
+        ("planned", "Запланирован"),
+        ("in_progress", "В пути"),
+        ("completed", "Завершен"),
+        ("canceled", "Отменен"),
+    )
+
+    warehouse = models.ForeignKey(
+        Warehouse, on_delete=models.PROTECT, related_name="trips", verbose_name="Склад доставки"
+    )
+    date = models.DateField(verbose_name="Дата забора")
+    driver = models.ForeignKey(
+        Driver, on_delete=models.SET_NULL, null=True, blank=True, related_name="trips", verbose_name="Водитель"
+    )
+    truck = models.ForeignKey(
+        Truck, on_delete=models.SET_NULL, null=True, blank=True, related_name="trips", verbose_name="Грузовик"
+    )
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default="planned", verbose_name="Статус рейса"
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+
+    class Meta:
+        verbose_name = "Рейс"
+        verbose_name_plural = "Рейсы"
+        ordering = ["-date", "id"]
+        indexes = [models.Index(fields=["date", "warehouse"], name="trip_date_warehouse")]
+
+    def __str__(self):
+        return f"Рейс №{self.pk} на {self.warehouse} {self.date:%d.%m.%Y}"
+
+
+class DriverShift(models.Model):
+    """
+    Интервал [starts_at, ends_at), на который водитель занят: заказ, рейс
+    или другая работа. Пересечения проверяются календарем orders/schedule.py
+    """
+    driver = models.ForeignKey(
+        Driver, on_delete=models.CASCADE, related_name="shifts", verbose_name="Водитель"
+    )
+    starts_at = models.DateTimeField(verbose_name="Начало")
+    ends_at = models.DateTimeField(verbose_name="Окончание")
+    order = models.ForeignKey(
+        "Order", on_delete=models.SET_NULL, null=True, blank=True, related_name="shifts", verbose_name="Заказ"
+    )
+    trip = models.ForeignKey(
+        Trip, on_delete=models.SET_NULL, null=True, blank=True, related_name="shifts", verbose_name="Рейс"
+    )
+    comment = models.CharField(max_length=255, blank=True, default="", verbose_name="Комментарий")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    # По updated_at календарь дочитывает изменения, см. Calendar.sync
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="Дата обновления")
+
+    class Meta:
+        verbose_name = "Смена водителя"
+        verbose_name_plural = "Смены водителей"
+        ordering = ["starts_at", "id"]
+        indexes = [models.Index(fields=["driver", "starts_at"], name="shift_driver_start")]
+        constraints = [
+            models.CheckConstraint(check=models.Q(ends_at__gt=F("starts_at")), name="shift_ends_after_start"),
+        ]
+
+    def __str__(self):
+        return f"{self.driver}: {self.starts_at:%d.%m.%Y %H:%M} — {self.ends_at:%d.%m.%Y %H:%M}"
+
+
+class OrderConflict(Exception):
+    """
+    Заказ изменен параллельным запросом или находится в неподходящем статусе
+    """
+
+    def __init__(self, message, order=None):
+        super().__init__(message)
+        self.order = order
+
+
 class Order(models.Model):
     STATUS_CHOICES = (
         ("new", "Новый"),
+        ("accepted", "Принят"),
         ("processing", "В обработке"),
         ("completed", "Выполнен"),
+        ("rejected", "Отклонен"),
         ("canceled", "Отменен"),
     )
 
@@ -273,6 +370,12 @@ class Order(models.Model):
     container_type = models.CharField(
         max_length=50, blank=True, null=True, verbose_name="Тип контейнера"
     )
+    box_container_type = models.CharField(
+        max_length=50, blank=True, null=True, db_index=True, verbose_name="Размер коробок"
+    )
+    pallet_container_type = models.CharField(
+        max_length=50, blank=True, null=True, db_index=True, verbose_name="Весовая категория паллет"
+    )
     box_count = models.PositiveIntegerField(
         blank=True, null=True, verbose_name="Количество коробок"
     )
@@ -349,11 +452,36 @@ class Order(models.Model):
         blank=True,
         verbose_name="Дата назначения водителя"
     )
+    trip = models.ForeignKey(
+        Trip,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="orders",
+        verbose_name="Рейс"
+    )
+    # Увеличивается при каждом изменении заказа (см. update_versioned)
+    version = models.PositiveIntegerField(default=0, editable=False, verbose_name="Версия")
 
     class Meta:
         verbose_name = "Заказ"
         verbose_name_plural = "Заказы"
         ordering = ["-created_at"]
+        indexes = [
+            # Курсор синхронизации /orders/changes/ (см. orders/sync.py)
+            models.Index(fields=["updated_at", "id"], name="order_updated_at_id"),
+            # Занятость водителей и грузовиков (см. orders/availability.py)
+            models.Index(
+                fields=["driver", "status", "created_at"],
+                name="order_driver_open",
+                condition=models.Q(status__in=("accepted", "processing")),
+            ),
+            models.Index(
+                fields=["truck", "status", "created_at"],
+                name="order_truck_open",
+                condition=models.Q(status__in=("accepted", "processing")),
+            ),
+        ]
 
     def __str__(self):
         return f"Заказ №{self.sequence_number} - {self.client_name}"
@@ -372,25 +500,20 @@ class Order(models.Model):
 
             if delivery_pricing:
                 total_price += delivery_pricing.base_price
-                logger.info(f"Added delivery price: {delivery_pricing.base_price}")
+                logger.debug("Added delivery price: %s", delivery_pricing.base_price)
 
-        # Получаем данные о грузе из additional_services
-        cargo_data = self.additional_services.get("cargo", {})
-        
         # Расчет стоимости груза в зависимости от типа (коробки или паллеты)
-        if self.box_count > 0:
+        if self.box_count:
             # Получаем тип контейнера для коробок
-            box_container_type = cargo_data.get("box_container_type", "")
+            box_container_type = self.box_container_type or ""
             box_price = None
             
             if box_container_type == "Другой размер":
                 # Для нестандартного размера рассчитываем объем
                 try:
-                    # Получаем размеры из поля dimensions
-                    dimensions = cargo_data.get("dimensions", {})
-                    length = float(dimensions.get("length", 0))
-                    width = float(dimensions.get("width", 0))
-                    height = float(dimensions.get("height", 0))
+                    length = float(self.length or 0)
+                    width = float(self.width or 0)
+                    height = float(self.height or 0)
                     
                     # Проверяем, что все размеры больше 0
                     if length > 0 and width > 0 and height > 0:
@@ -406,12 +529,12 @@ class Order(models.Model):
                         
                         if box_pricing:
                             box_price = box_pricing.price
-                            logger.info(f"Using box price from BoxPricing: {box_price} for volume range {volume_range}")
+                            logger.debug("Using box price from BoxPricing: %s for volume range %s", box_price, volume_range)
                         else:
                             # Если не нашли цену в БД, используем значения по умолчанию
                             default_prices = BoxPricing.get_default_prices()
                             box_price = Decimal(str(default_prices.get(volume_range, "450.00")))
-                            logger.info(f"Using default box price: {box_price} for volume range {volume_range}")
+                            logger.debug("Using default box price: %s for volume range %s", box_price, volume_range)
                     else:
                         # Если какой-то из размеров равен 0, используем минимальную цену
                         box_price = Decimal("450.00")
@@ -419,7 +542,7 @@ class Order(models.Model):
                 except Exception as e:
                     # В случае ошибки используем минимальную цену
                     box_price = Decimal("450.00")
-                    logger.error(f"Error calculating custom box price: {e}")
+                    logger.error("Error calculating custom box price: %s", e)
             else:
                 # Для стандартного размера ищем цену в БД
                 box_pricing = BoxPricing.objects.filter(
@@ -429,33 +552,31 @@ class Order(models.Model):
                 
                 if box_pricing:
                     box_price = box_pricing.price
-                    logger.info(f"Using box price from BoxPricing: {box_price} for size {box_container_type}")
+                    logger.debug("Using box price from BoxPricing: %s for size %s", box_price, box_container_type)
                 else:
                     # Если не нашли цену в БД, используем значения по умолчанию
                     default_prices = BoxPricing.get_default_prices()
                     box_price = Decimal(str(default_prices.get(box_container_type, "450.00")))
-                    logger.info(f"Using default box price: {box_price} for size {box_container_type}")
+                    logger.debug("Using default box price: %s for size %s", box_price, box_container_type)
             
             box_total = box_price * Decimal(self.box_count)
             total_price += box_total
-            logger.info(f"Added box price: {box_total} for {self.box_count} boxes at {box_price} each")
+            logger.debug("Added box price: %s for %s boxes at %s each", box_total, self.box_count, box_price)
 
-        if self.pallet_count > 0:
+        if self.pallet_count:
             # Получаем тип контейнера для паллет
-            pallet_container_type = cargo_data.get("pallet_container_type", "")
+            pallet_container_type = self.pallet_container_type or ""
             pallet_price = None
             
             if pallet_container_type == "Другой вес":
                 try:
-                    # Получаем вес из dimensions
-                    dimensions = cargo_data.get("dimensions", {})
-                    weight = float(dimensions.get("weight", 0))
+                    weight = float(self.weight or 0)
                     
                     if weight > 0:
                         if weight <= 500:
                             # Если вес до 500 кг, используем стандартную цену
                             pallet_price = Decimal("5000.00")
-                            logger.info(f"Using standard pallet price: {pallet_price} for weight {weight}kg")
+                            logger.debug("Using standard pallet price: %s for weight %skg", pallet_price, weight)
                         else:
                             # Для веса больше 500 кг считаем дополнительную стоимость
                             # За каждые 100 кг свыше 500 кг добавляем 1000 рублей
@@ -463,7 +584,7 @@ class Order(models.Model):
                             extra_hundreds = (extra_weight + 99) // 100  # Округляем вверх до сотен
                             extra_cost = extra_hundreds * 1000  # 1000 руб. за каждые 100 кг
                             pallet_price = Decimal("5000.00") + Decimal(str(extra_cost))
-                            logger.info(f"Calculated custom weight price: base 5000 + {extra_cost} for {extra_weight}kg over 500kg")
+                            logger.debug("Calculated custom weight price: base 5000 + %s for %skg over 500kg", extra_cost, extra_weight)
                     else:
                         # Если вес не указан или равен 0, используем минимальную цену
                         pallet_price = Decimal("2000.00")
@@ -471,7 +592,7 @@ class Order(models.Model):
                 except Exception as e:
                     # В случае ошибки используем минимальную цену
                     pallet_price = Decimal("2000.00")
-                    logger.error(f"Error calculating custom pallet price: {e}")
+                    logger.error("Error calculating custom pallet price: %s", e)
             else:
                 # Для стандартных весовых категорий ищем цену в БД
                 pallet_pricing = PalletPricing.objects.filter(
@@ -481,57 +602,576 @@ class Order(models.Model):
                 
                 if pallet_pricing:
                     pallet_price = pallet_pricing.price
-                    logger.info(f"Using pallet price from PalletPricing: {pallet_price} for category {pallet_container_type}")
+                    logger.debug("Using pallet price from PalletPricing: %s for category %s", pallet_price, pallet_container_type)
                 else:
                     # Если не нашли, используем стандартные цены
                     default_prices = PalletPricing.get_default_prices()
                     pallet_price = Decimal(str(default_prices.get(pallet_container_type, "2000.00")))
-                    logger.info(f"Using default pallet price: {pallet_price} for category {pallet_container_type}")
+                    logger.debug("Using default pallet price: %s for category %s", pallet_price, pallet_container_type)
             
             pallet_total = pallet_price * Decimal(self.pallet_count)
             total_price += pallet_total
-            logger.info(f"Added pallet price: {pallet_total} for {self.pallet_count} pallets at {pallet_price} each")
+            logger.debug("Added pallet price: %s for %s pallets at %s each", pallet_total, self.pallet_count, pallet_price)
 
         # Расчет стоимости дополнительных услуг
         services_total = Decimal("0.00")
         for service in self.services.filter(is_active=True):
             services_total += service.price
-            logger.info(f"Added service price: {service.price} for {service.name}")
+            logger.debug("Added service price: %s for %s", service.price, service.name)
         total_price += services_total
-        logger.info(f"Total additional services cost: {services_total}")
+        logger.debug("Total additional services cost: %s", services_total)
 
-        logger.info(f"Final calculated price: {total_price}")
+        logger.debug("Final calculated price: %s", total_price)
         return total_price
 
+    # Статусы, из которых можно назначить водителя и грузовик
+    ASSIGNABLE_STATUSES = ("new", "accepted")
+    # Допустимые ручные смены статуса (/orders/bulk-status/); в accepted
+    # заказ переходит только при назначении водителя
+    STATUS_TRANSITIONS = {
+        "new": ("processing", "rejected", "canceled"),
+        "accepted": ("processing", "completed", "canceled"),
+        "processing": ("completed", "canceled"),
+    }
+
+    # Поля, изменения которых отслеживаются для статистики и журнала событий
+    TRACKED_FIELDS = (
+        "warehouse_id",
+        "created_at",
+        "status",
+        "total_price",
+        "box_count",
+        "pallet_count",
+        "driver_id",
+        "truck_id",
+    )
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._tracked_values = instance.get_tracked_values()
+        return instance
+
+    def get_tracked_values(self):
+        """
+        Значения отслеживаемых полей.
+        None, если часть полей не загружена (only/defer)
+        """
+        if self.get_deferred_fields().intersection(self.TRACKED_FIELDS):
+            return None
+        return {field: getattr(self, field) for field in self.TRACKED_FIELDS}
+
+    def _stored_tracked_values(self):
+        return Order.objects.filter(pk=self.pk).values(*self.TRACKED_FIELDS).first()
+
+    def _previous_tracked_values(self):
+        if self._state.adding:
+            return None
+        values = getattr(self, "_tracked_values", None)
+        if values is None:
+            values = self._stored_tracked_values()
+        return values
+
+    def set_status(self, status, **details):
+        """
+        Меняет статус; details попадут в событие смены статуса при сохранении
+        """
+        self.status = status
+        self._event_details = details
+
+    def _save_tracked(self, *args, **kwargs):
+        """
+        Сохраняет заказ и в той же транзакции обновляет дневную статистику
+        склада и журнал событий — только если отслеживаемые поля изменились
+        """
+        with transaction.atomic():
+            previous = self._previous_tracked_values()
+            if not self._state.adding:
+                self.version += 1
+            super().save(*args, **kwargs)
+            current = self.get_tracked_values() or self._stored_tracked_values()
+            if current != previous:
+                DailyWarehouseStats.apply_order_change(previous, current)
+                OrderEvent.record_order_change(
+                    self.pk, previous, current, getattr(self, "_event_details", None)
+                )
+        self._tracked_values = current
+        self._event_details = None
+
+    # Последовательность номеров заказов в PostgreSQL (миграция 0026)
+    SEQUENCE_NAME = "orders_order_sequence_number"
+
+    @classmethod
+    def allocate_sequence_numbers(cls, count=1):
+        """
+        Номера для count новых заказов. В PostgreSQL — из последовательности
+        одним запросом: без двух MAX по заказам и архиву и без гонки
+        параллельных созданий за один номер (номера откатившихся транзакций
+        пропускаются). На других СУБД — после наибольшего номера среди
+        заказов и архива
+        """
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT nextval(%s) FROM generate_series(1, %s)", [cls.SEQUENCE_NAME, count])
+                return sorted(row[0] for row in cursor.fetchall())
+        last_number = cls.objects.aggregate(models.Max("sequence_number"))["sequence_number__max"]
+        archived_number = ArchivedOrder.objects.aggregate(models.Max("sequence_number"))["sequence_number__max"]
+        start = max(last_number or 0, archived_number or 0) + 1
+        return list(range(start, start + count))
+
+    @classmethod
+    def reset_sequence_numbers(cls):
+        """
+        Продолжает последовательность после наибольшего номера среди заказов
+        и архива — после записи номеров в обход allocate_sequence_numbers
+        """
+        if connection.vendor != "postgresql":
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT setval(%s, GREATEST((SELECT MAX(sequence_number) FROM {cls._meta.db_table}), "
+                f"(SELECT MAX(sequence_number) FROM {ArchivedOrder._meta.db_table}), 0) + 1, false)",
+                [cls.SEQUENCE_NAME],
+            )
+
     def save(self, *args, **kwargs):
         if not self.sequence_number:
-            # Получаем максимальный номер из базы
-            last_number = Order.objects.all().aggregate(models.Max('sequence_number'))['sequence_number__max']
-            # Присваиваем следующий номер
-            self.sequence_number = (last_number or 0) + 1
+            self.sequence_number = Order.allocate_sequence_numbers()[0]
         
         # Пропускаем расчет цены при первом сохранении
         if not self.id:
-            super().save(*args, **kwargs)
+            self._save_tracked(*args, **kwargs)
             return
 
         # Рассчитываем стоимость только при последующих сохранениях
         try:
             self.total_price = self.calculate_price()
         except Exception as e:
-            import traceback
-            print(f"Error calculating price: {e}")
-            print(traceback.format_exc())
+            logger.exception("Error calculating price for order %s: %s", self.id, e)
             self.total_price = 0
 
         try:
-            super().save(*args, **kwargs)
+            self._save_tracked(*args, **kwargs)
         except Exception as e:
-            import traceback
-            print(f"Error saving order: {e}")
-            print(traceback.format_exc())
+            logger.exception("Error saving order %s: %s", self.id, e)
             raise
 
+    @classmethod
+    def bulk_update_tracked(cls, orders, values, details=None):
+        """
+        Обновляет заказы одним UPDATE в обход save (без пересчета стоимости).
+        orders — загруженные заказы, values — новые значения полей.
+        Как и save, выставляет updated_at и обновляет статистику, журнал
+        событий и ленту. Вызывается внутри транзакции
+        """
+        if not orders:
+            return
+        values = {**values, "updated_at": timezone.now()}
+        cls.objects.filter(pk__in=[order.pk for order in orders]).update(**values, version=F("version") + 1)
+        cls._record_updates(orders, values, details)
+
+    @classmethod
+    def _record_updates(cls, orders, values, details=None):
+        """
+        Переносит записанные UPDATE значения в объекты заказов и обновляет
+        статистику и журнал событий
+        """
+        changes = []
+        for order in orders:
+            previous = order._previous_tracked_values()
+            for field, value in values.items():
+                setattr(order, field, value)
+            order.version += 1
+            current = order.get_tracked_values() or order._stored_tracked_values()
+            changes.append((order.pk, previous, current, details))
+            order._tracked_values = current
+        DailyWarehouseStats.apply_order_changes([(previous, current) for _, previous, current, _ in changes])
+        OrderEvent.record_order_changes(changes)
+
+    @classmethod
+    def select_for_bulk(cls, ids, fields=()):
+        """
+        Блокирует заказы до конца транзакции для массового обновления.
+        Загружаются отслеживаемые поля, версия, номер, telegram_user_id
+        и fields. Возвращает (заказы в порядке ids без повторов,
+        [(id, None, причина)] для ненайденных)
+        """
+        orders = {
+            str(order.pk): order
+            for order in cls.objects.filter(pk__in=ids)
+            .select_for_update()
+            .only("id", "sequence_number", "telegram_user_id", "version", *cls.TRACKED_FIELDS, *fields)
+        }
+        found = []
+        missing = []
+        for order_id in dict.fromkeys(str(order_id) for order_id in ids):
+            if order_id in orders:
+                found.append(orders[order_id])
+            else:
+                missing.append((order_id, None, "Заказ не найден"))
+        return found, missing
+
+    @classmethod
+    def bulk_transition(cls, ids, status, details=None):
+        """
+        Переводит заказы в статус status одним UPDATE, переходы проверяются
+        по STATUS_TRANSITIONS. Возвращает (переведенные заказы,
+        [(id, текущий статус или None, причина)])
+        """
+        with transaction.atomic():
+            orders, skipped = cls.select_for_bulk(ids)
+            updated = []
+            for order in orders:
+                if status in cls.STATUS_TRANSITIONS.get(order.status, ()):
+                    updated.append(order)
+                else:
+                    skipped.append((str(order.pk), order.status, f"Переход {order.status} → {status} недопустим"))
+            cls.bulk_update_tracked(updated, {"status": status}, details)
+        return updated, skipped
+
+    def update_versioned(self, values, details=None, statuses=None):
+        """
+        Обновляет заказ сравнением с версией (compare-and-swap):
+        UPDATE ... WHERE version = <прочитанная версия> [AND status IN statuses].
+        Не ждет блокировок: если заказ успел измениться или его статус не
+        из statuses, ничего не пишет и поднимает OrderConflict с актуальным
+        заказом. Стоимость не пересчитывается, статистика, журнал и лента
+        обновляются как в bulk_update_tracked
+        """
+        values = {**values, "updated_at": timezone.now()}
+        with transaction.atomic():
+            orders = Order.objects.filter(pk=self.pk, version=self.version)
+            if statuses is not None:
+                orders = orders.filter(status__in=statuses)
+            if not orders.update(**values, version=F("version") + 1):
+                current = Order.objects.filter(pk=self.pk).only("id", "status", "version").first()
+                if current is None:
+                    raise Order.DoesNotExist("Заказ удален")
+                if statuses is not None and current.status not in statuses:
+                    message = f"Заказ в статусе «{current.get_status_display()}»"
+                else:
+                    message = "Заказ изменен параллельным запросом"
+                raise OrderConflict(message, current)
+            Order._record_updates([self], values, details)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            previous = self._previous_tracked_values()
+            order_id = self.pk
+            result = super().delete(*args, **kwargs)
+            DailyWarehouseStats.apply_order_change(previous, None)
+            OrderEvent.record_order_change(order_id, previous, None)
+        return result
+
+
+class DailyWarehouseStats(models.Model):
+    """
+    Дневная сводка заказов по складу.
+
+    Обновляется инкрементально при каждом сохранении и удалении заказа,
+    поэтому отчет за период читает дни × склады строк, а не все заказы.
+    Массовые операции в обход Order.save должны вызывать apply_order_change
+    сами; расхождения исправляет команда reconcile_daily_stats.
+    """
+
+    # Отмененные заказы учитываются только в canceled_count
+    CANCELED_STATUSES = ("canceled", "rejected")
+    COUNTERS = ("orders_count", "canceled_count", "revenue", "box_count", "pallet_count")
+
+    date = models.DateField(verbose_name="Дата")
+    warehouse = models.ForeignKey(
+        Warehouse, on_delete=models.CASCADE, related_name="daily_stats", verbose_name="Склад"
+    )
+    orders_count = models.IntegerField(default=0, verbose_name="Заказов")
+    canceled_count = models.IntegerField(default=0, verbose_name="Отменено")
+    revenue = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0, verbose_name="Выручка"
+    )
+    box_count = models.IntegerField(default=0, verbose_name="Коробок")
+    pallet_count = models.IntegerField(default=0, verbose_name="Паллет")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+
+    class Meta:
+        verbose_name = "Статистика склада за день"
+        verbose_name_plural = "Статистика складов по дням"
+        ordering = ["-date", "warehouse"]
+        constraints = [
+            models.UniqueConstraint(fields=["date", "warehouse"], name="daily_stats_date_warehouse"),
+        ]
+
+    def __str__(self):
+        return f"{self.warehouse} за {self.date}"
+
+    @classmethod
+    def contribution(cls, values):
+        """
+        Вклад заказа в статистику: ключ (дата, склад) и значения счетчиков
+        """
+        canceled = values["status"] in cls.CANCELED_STATUSES
+        key = (timezone.localdate(values["created_at"]), values["warehouse_id"])
+        return key, {
+            "orders_count": 1,
+            "canceled_count": 1 if canceled else 0,
+            "revenue": Decimal("0.00") if canceled else Decimal(str(values["total_price"] or 0)),
+            "box_count": 0 if canceled else values["box_count"] or 0,
+            "pallet_count": 0 if canceled else values["pallet_count"] or 0,
+        }
+
+    @classmethod
+    def apply_order_change(cls, previous, current):
+        """
+        Применяет разницу между прежними и новыми значениями заказа
+        (Order.TRACKED_FIELDS).
+        previous=None для нового заказа, current=None для удаленного
+        """
+        cls.apply_order_changes([(previous, current)])
+
+    @classmethod
+    def apply_order_changes(cls, changes):
+        """
+        То же для пар (previous, current) многих заказов: разницы суммируются,
+        и каждая строка (дата, склад) обновляется одним запросом
+        """
+        deltas = {}
+        for previous, current in changes:
+            for values, sign in ((previous, -1), (current, 1)):
+                if values is None:
+                    continue
+                key, counters = cls.contribution(values)
+                row = deltas.setdefault(key, dict.fromkeys(cls.COUNTERS, 0))
+                for field, value in counters.items():
+                    row[field] += sign * value
+
+        for (date, warehouse_id), row in deltas.items():
+            changes = {field: F(field) + value for field, value in row.items() if value}
+            if not changes:
+                continue
+            # Строка дня обычно уже есть: один UPDATE, вставка — только для
+            # первого заказа склада за день
+            rows = cls.objects.filter(date=date, warehouse_id=warehouse_id)
+            if rows.update(updated_at=timezone.now(), **changes):
+                continue
+            try:
+                with transaction.atomic():
+                    cls.objects.create(date=date, warehouse_id=warehouse_id, **row)
+            except IntegrityError:
+                # Строку вставил параллельный запрос
+                rows.update(updated_at=timezone.now(), **changes)
+
+
+class OrderEvent(models.Model):
+    """
+    Журнал событий заказа: создание, смены статуса, назначение водителя,
+    удаление и перенос в архив. Записи только добавляются и пишутся в той же транзакции,
+    что и изменение заказа.
+
+    Связь с заказом без внешнего ключа в БД: история переживает удаление
+    и архивацию заказа.
+    """
+
+    TYPES = (
+        ("created", "Создан"),
+        ("status_changed", "Смена статуса"),
+        ("driver_assigned", "Назначен водитель"),
+        ("deleted", "Удален"),
+        ("archived", "Перенесен в архив"),
+    )
+
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        related_name="events",
+        verbose_name="Заказ",
+    )
+    # Склад заказа на момент события: по нему лента (orders/stream.py)
+    # фильтрует события, в том числе удаленных и архивных заказов
+    warehouse = models.ForeignKey(
+        Warehouse,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        null=True,
+        blank=True,
+        related_name="+",
+        verbose_name="Склад",
+    )
+    type = models.CharField(max_length=30, choices=TYPES, verbose_name="Тип события")
+    from_status = models.CharField(max_length=20, blank=True, null=True, verbose_name="Прежний статус")
+    to_status = models.CharField(max_length=20, blank=True, null=True, verbose_name="Новый статус")
+    data = models.JSONField(default=dict, blank=True, verbose_name="Данные")
+    at = models.DateTimeField(default=timezone.now, verbose_name="Время")
+
+    class Meta:
+        verbose_name = "Событие заказа"
+        verbose_name_plural = "События заказов"
+        ordering = ["at", "id"]
+        indexes = [
+            models.Index(fields=["order", "at"], name="order_event_order_at"),
+            models.Index(fields=["type", "at"], name="order_event_type_at"),
+        ]
+
+    def __str__(self):
+        return f"{self.get_type_display()} {self.order_id} в {self.at}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("События заказа нельзя изменять")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("События заказа нельзя удалять")
+
+    @classmethod
+    def build_for_change(cls, order_id, previous, current, details=None):
+        """
+        События для перехода заказа от previous к current (Order.TRACKED_FIELDS).
+        previous=None для нового заказа, current=None для удаленного
+        """
+        details = details or {}
+        now = timezone.now()
+        warehouse_id = (current or previous)["warehouse_id"]
+        if previous is None:
+            return [cls(
+                order_id=order_id,
+                warehouse_id=warehouse_id,
+                type="created",
+                to_status=current["status"],
+                data=details,
+                at=now,
+            )]
+        if current is None:
+            return [cls(
+                order_id=order_id,
+                warehouse_id=warehouse_id,
+                type="deleted",
+                from_status=previous["status"],
+                data=details,
+                at=now,
+            )]
+
+        events = []
+        if current["driver_id"] and (
+            current["driver_id"] != previous["driver_id"] or current["truck_id"] != previous["truck_id"]
+        ):
+            events.append(cls(
+                order_id=order_id,
+                warehouse_id=warehouse_id,
+                type="driver_assigned",
+                data={"driver_id": current["driver_id"], "truck_id": current["truck_id"]},
+                at=now,
+            ))
+        if current["status"] != previous["status"]:
+            events.append(cls(
+                order_id=order_id,
+                warehouse_id=warehouse_id,
+                type="status_changed",
+                from_status=previous["status"],
+                to_status=current["status"],
+                data=details,
+                at=now,
+            ))
+        return events
+
+    @classmethod
+    def record_order_change(cls, order_id, previous, current, details=None):
+        return cls.record_order_changes([(order_id, previous, current, details)])
+
+    @classmethod
+    def record_order_changes(cls, changes):
+        """
+        Записывает события для изменений (order_id, previous, current, details)
+        одним INSERT и публикует их в живую ленту
+        """
+        events = []
+        for order_id, previous, current, details in changes:
+            events.extend(cls.build_for_change(order_id, previous, current, details))
+        if events:
+            cls.objects.bulk_create(events)
+            # Живая лента получит события после фиксации транзакции
+            pubsub.publish(events)
+        return events
+
+
+class ArchivedOrder(models.Model):
+    """
+    Закрытый заказ, перенесенный из основной таблицы командой archive_orders.
+
+    Основная таблица остается небольшой: списки, поиск ботом и расчет
+    sequence_number работают только с активными заказами. В PostgreSQL
+    архив секционирован по месяцам created_at (секции создаются командой
+    по мере надобности), на других СУБД это обычная таблица.
+    payload хранит представление OrderSerializer на момент архивации;
+    крупные значения jsonb PostgreSQL сжимает автоматически (TOAST).
+    """
+
+    CLOSED_STATUSES = ("completed", "canceled", "rejected")
+
+    id = models.UUIDField(primary_key=True, editable=False)
+    sequence_number = models.PositiveIntegerField(db_index=True, verbose_name="Порядковый номер")
+    status = models.CharField(max_length=20, verbose_name="Статус заказа")
+    created_at = models.DateTimeField(verbose_name="Дата создания")
+    updated_at = models.DateTimeField(verbose_name="Дата обновления")
+    archived_at = models.DateTimeField(default=timezone.now, verbose_name="Дата архивации")
+    warehouse = models.ForeignKey(
+        Warehouse,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="+",
+        verbose_name="Склад доставки",
+    )
+    telegram_user_id = models.BigIntegerField(
+        blank=True, null=True, db_index=True, verbose_name="ID пользователя Telegram"
+    )
+    total_price = models.DecimalField(
+        max_digits=10, decimal_places=2, default=0, verbose_name="Общая стоимость"
+    )
+    box_count = models.PositiveIntegerField(blank=True, null=True, verbose_name="Количество коробок")
+    pallet_count = models.PositiveIntegerField(blank=True, null=True, verbose_name="Количество паллет")
+    payload = models.JSONField(verbose_name="Данные заказа")
+
+    class Meta:
+        verbose_name = "Архивный заказ"
+        verbose_name_plural = "Архивные заказы"
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"Архивный заказ №{self.sequence_number}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Ключ Idempotency-Key запроса на создание заказа (/api/order/) и ответ
+    на него. Повтор запроса с тем же ключом получает сохраненный ответ
+    вместо нового заказа, см. orders/idempotency.py
+    """
+
+    key = models.CharField(max_length=255, unique=True, verbose_name="Ключ")
+    # sha256 тела запроса: тот же ключ с другим телом — ошибка клиента
+    fingerprint = models.CharField(max_length=64, verbose_name="Отпечаток запроса")
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name="Код ответа")
+    response = models.JSONField(null=True, blank=True, verbose_name="Ответ")
+    # Без внешнего ключа в базе: заказ может уйти в архив, ответ остается
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        null=True,
+        blank=True,
+        related_name="+",
+        verbose_name="Заказ",
+    )
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="Дата создания")
+
+    class Meta:
+        verbose_name = "Ключ идемпотентности"
+        verbose_name_plural = "Ключи идемпотентности"
+
+    def __str__(self):
+        return self.key
+
 
 class Pricing(models.Model):
     PRICING_TYPES = (
@@ -697,15 +1337,21 @@ class BoxPricing(models.Model):
                 
         return defaults
     
+    @staticmethod
+    def box_volume(length, width, height):
+        """
+        Объем коробки в кубических метрах по размерам в сантиметрах
+        """
+        return (length * width * height) / 1_000_000
+
     @staticmethod
     def calculate_volume(length, width, height):
         """
         Рассчитывает объем коробки в кубических метрах
         и возвращает соответствующий диапазон объема
         """
-        # Переводим сантиметры в метры и вычисляем объем
-        volume = (length * width * height) / 1_000_000
-        
+        volume = BoxPricing.box_volume(length, width, height)
+
         if volume <= 0.1:
             return "V ≤ 0.1"
         elif volume <= 0.2:
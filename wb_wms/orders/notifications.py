@@ -0,0 +1,68 @@
+"""
+Отправка уведомлений в Telegram-бота
+"""
+import logging
+import time
+
+import requests
+from django.conf import settings
+
+from .metrics import record_bot_call
+
+logger = logging.getLogger(__name__)
+
+# Таймаут обращения к боту, чтобы недоступный бот не блокировал запрос
+BOT_TIMEOUT = 10
+
+
+def post_to_bot(path, payload):
+    """
+    Отправляет POST-запрос к API бота и учитывает его время в метриках запроса
+    """
+    started = time.perf_counter()
+    try:
+        return requests.post(
+            f"{settings.TELEGRAM_BOT_URL}{path}", json=payload, timeout=BOT_TIMEOUT
+        )
+    finally:
+        record_bot_call(time.perf_counter() - started)
+
+
+def notify_assignment(order, driver, truck):
+    """
+    Уведомления о назначении водителя и грузовика на заказ: администраторам
+    и клиенту, если у заказа есть telegram_user_id. Ошибки бота
+    записываются в лог и не прерывают назначение
+    """
+    telegram_admin_data = {
+        "order_id": str(order.id),
+        "sequence_number": order.sequence_number,
+        "driver_name": driver.full_name,
+        "truck_info": f"{truck.brand} - {truck.plate_number}",
+        "notification_type": "driver_assigned"
+    }
+
+    try:
+        response = post_to_bot("/api/send_notification", telegram_admin_data)
+        logger.info("Telegram admin notification sent: status %s", response.status_code)
+    except Exception as e:
+        logger.error("Error sending Telegram admin notification: %s", e)
+
+    if not order.telegram_user_id:
+        logger.warning("Order %s has no telegram_user_id, skipping user notification", order.id)
+        return
+    logger.info("Sending notification to user with telegram_user_id: %s", order.telegram_user_id)
+    telegram_user_data = {
+        "telegram_user_id": order.telegram_user_id,
+        "notification_type": "order_accepted",
+        "driver_name": driver.full_name,
+        "driver_phone": driver.phone,
+        "truck_info": f"{truck.brand} {truck.plate_number}",
+        "sequence_number": order.sequence_number
+    }
+
+    try:
+        response = post_to_bot("/api/send_user_notification", telegram_user_data)
+        logger.info("Telegram user notification sent: status %s", response.status_code)
+    except Exception as e:
+        logger.error("Error sending Telegram user notification: %s", e)
@@ -0,0 +1,199 @@
+"""
+Публикация событий заказов для живой ленты /orders/stream/ (см. orders/stream.py).
+
+События журнала OrderEvent (создание, смена статуса, назначение водителя,
+удаление и перенос в архив) после фиксации транзакции раздаются
+подписчикам в памяти процесса.
+Подписчик — соединение SSE со своей очередью в цикле событий ASGI.
+
+На PostgreSQL события отправляются через NOTIFY в той же транзакции, что
+и запись в журнал: сервер доставляет их только после COMMIT, причем всем
+процессам. Каждый процесс с подписчиками слушает канал (LISTEN) в фоновом
+потоке и раздает события своим подписчикам. На других СУБД события
+раздаются только внутри процесса, записавшего их.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+
+from django.db import connection, connections, transaction
+from rest_framework.utils.encoders import JSONEncoder
+
+logger = logging.getLogger(__name__)
+
+# Типы событий журнала, которые попадают в ленту
+STREAM_TYPES = ("created", "status_changed", "driver_assigned", "deleted", "archived")
+
+CHANNEL = "orders_events"
+# Ограничение PostgreSQL на размер payload NOTIFY — 8000 байт
+MAX_NOTIFY_PAYLOAD = 7900
+# Необработанных событий на подписчика; при переполнении соединение
+# закрывается, и клиент дочитывает пропущенное через Last-Event-ID
+QUEUE_SIZE = 1000
+LISTEN_RECONNECT_DELAY = 5
+
+
+def event_message(event):
+    """
+    Сообщение ленты для события журнала
+    """
+    return {
+        "id": event.pk,
+        "type": event.type,
+        "order_id": str(event.order_id),
+        "warehouse_id": event.warehouse_id,
+        "from_status": event.from_status,
+        "to_status": event.to_status,
+        "data": event.data,
+        "at": event.at,
+    }
+
+
+def dumps(message):
+    return json.dumps(message, cls=JSONEncoder, ensure_ascii=False)
+
+
+def publish(events):
+    """
+    Публикует записанные события журнала после фиксации текущей транзакции
+    """
+    messages = [event_message(event) for event in events if event.type in STREAM_TYPES]
+    if not messages:
+        return
+    if connection.vendor == "postgresql":
+        payloads = []
+        for message in messages:
+            payload = dumps(message)
+            if len(payload.encode()) > MAX_NOTIFY_PAYLOAD:
+                payload = dumps({**message, "data": {}})
+            payloads.append(payload)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_notify(%s, payload) FROM unnest(%s::text[]) AS payload",
+                [CHANNEL, payloads],
+            )
+    else:
+        transaction.on_commit(lambda: broker.publish(messages))
+
+
+class Subscription:
+    """
+    Подписка одного соединения: очередь в цикле событий соединения
+    и фильтр по складам
+    """
+
+    def __init__(self, loop, warehouse_ids=None):
+        self.loop = loop
+        self.warehouse_ids = set(warehouse_ids) if warehouse_ids else None
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+        self.overflowed = False
+
+    def accepts(self, message):
+        return self.warehouse_ids is None or message.get("warehouse_id") in self.warehouse_ids
+
+    def put(self, message):
+        # Вызывается в цикле событий подписчика
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+class Broker:
+    """
+    Pub/sub в памяти процесса. publish можно вызывать из любого потока
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = set()
+        self._listener = None
+
+    def subscribe(self, warehouse_ids=None):
+        subscription = Subscription(asyncio.get_running_loop(), warehouse_ids)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        if connection.vendor == "postgresql":
+            self._ensure_listener()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, messages):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            for message in messages:
+                if not subscription.accepts(message):
+                    continue
+                try:
+                    subscription.loop.call_soon_threadsafe(subscription.put, message)
+                except RuntimeError:
+                    # Цикл событий уже закрыт
+                    self.unsubscribe(subscription)
+                    break
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscriptions)
+
+    def render_prometheus(self):
+        return (
+            "# HELP wb_stream_subscribers Открытых соединений ленты заказов\n"
+            "# TYPE wb_stream_subscribers gauge\n"
+            f"wb_stream_subscribers {self.subscriber_count()}\n"
+        )
+
+    def _ensure_listener(self):
+        with self._lock:
+            if self._listener is not None and self._listener.is_alive():
+                return
+            self._listener = threading.Thread(target=self._listen, name="orders-events-listener", daemon=True)
+            self._listener.start()
+
+    def _listen(self):
+        """
+        Слушает канал NOTIFY на отдельном соединении (psycopg2) и раздает
+        полученные события подписчикам процесса
+        """
+        import psycopg2
+
+        params = connections["default"].get_connection_params()
+        while True:
+            listen_connection = None
+            try:
+                listen_connection = psycopg2.connect(**params)
+                listen_connection.autocommit = True
+                with listen_connection.cursor() as cursor:
+                    cursor.execute(f"LISTEN {CHANNEL}")
+                logger.info("Подписка на канал %s", CHANNEL)
+                while True:
+                    if select.select([listen_connection], [], [], 5.0) == ([], [], []):
+                        with self._lock:
+                            # Подписчиков не осталось: соединение закрывается,
+                            # следующая подписка запустит поток заново
+                            if not self._subscriptions:
+                                self._listener = None
+                                return
+                        continue
+                    listen_connection.poll()
+                    messages = []
+                    while listen_connection.notifies:
+                        messages.append(json.loads(listen_connection.notifies.pop(0).payload))
+                    if messages:
+                        self.publish(messages)
+            except Exception as e:
+                # События за время переподключения клиенты дочитают по Last-Event-ID
+                logger.error("Ошибка подписки на канал %s: %s", CHANNEL, e)
+                time.sleep(LISTEN_RECONNECT_DELAY)
+            finally:
+                if listen_connection is not None:
+                    listen_connection.close()
+
+
+broker = Broker()
@@ -0,0 +1,110 @@
+"""
+Быстрые JSON-рендерер и парсер для DRF.
+
+При установленном orjson ответы кодируются и запросы разбираются им,
+иначе используются стандартные JSONRenderer/JSONParser на модуле json.
+Формат ответа совпадает со стандартным рендерером: Decimal — число,
+UUID — строка, datetime — isoformat() с микросекундами (если они есть)
+и "Z" для UTC. Даты orjson кодирует сам в том же формате; Decimal он не
+поддерживает, и тот остается на default — float(obj), как в JSONEncoder,
+чтобы вывод совпадал байт в байт. Смещения с секундами (исторические
+LMT-пояса) orjson округляет до минут, но из базы при USE_TZ даты
+приходят в UTC.
+Отступы (indent в Accept, Browsable API) и нестандартные UNICODE_JSON,
+COMPACT_JSON, STRICT_JSON обрабатываются стандартной реализацией.
+"""
+import codecs
+
+from django.conf import settings
+from rest_framework import renderers
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    # UTC пишется как "Z", как в JSONEncoder DRF; наивные даты, как и там,
+    # без смещения. Нестроковые ключи словарей приводятся к строкам, как в json
+    DUMPS_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+    LOADS_ERROR = orjson.JSONDecodeError
+
+# Разделители строк, которые JSON допускает, а JavaScript — нет
+LINE_SEPARATORS = ((b"\xe2\x80\xa8", b"\\u2028"), (b"\xe2\x80\xa9", b"\\u2029"))
+
+_encoder = JSONEncoder()
+
+
+def available():
+    """
+    True, если установлен orjson и настройки DRF совместимы с ним:
+    компактный вывод без экранирования не-ASCII и строгий JSON
+    """
+    return (
+        orjson is not None
+        and api_settings.UNICODE_JSON
+        and api_settings.COMPACT_JSON
+        and api_settings.STRICT_JSON
+    )
+
+
+def encode_default(obj):
+    """
+    Типы, которые orjson не кодирует сам: Decimal, ленивые строки,
+    QuerySet и т.п. Приводятся так же, как в JSONEncoder DRF
+    """
+    return _encoder.default(obj)
+
+
+def dumps(data):
+    """
+    Кодирует данные в JSON (bytes) с форматом JSONEncoder DRF
+    """
+    if not available():
+        return renderers.JSONRenderer().render(data)
+    ret = orjson.dumps(data, default=encode_default, option=DUMPS_OPTIONS)
+    for separator, escaped in LINE_SEPARATORS:
+        if separator in ret:
+            ret = ret.replace(separator, escaped)
+    return ret
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    """
+    JSONRenderer на orjson с откатом на стандартную реализацию
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if (
+            not available()
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+
+class FastJSONParser(JSONParser):
+    """
+    JSONParser на orjson с откатом на стандартную реализацию
+    """
+
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        if not available() or codecs.lookup(encoding).name != "utf-8":
+            return super().parse(stream, media_type, parser_context)
+        try:
+            # orjson, как и strict-режим JSONParser, не принимает NaN и Infinity
+            return orjson.loads(stream.read())
+        except LOADS_ERROR as exc:
+            raise ParseError(f"JSON parse error - {exc}")
+
+
@@ -0,0 +1,359 @@
+"""
+Календарь водителей: смены DriverShift — интервалы времени, на которые
+водитель занят, — и проверка пересечений.
+
+Смены каждого водителя хранятся в памяти процесса в дереве интервалов
+(AVL-дерево по началу смены, в узле — наибольшее окончание в поддереве):
+«пересекается ли интервал со сменами водителя» — O(log n), список
+пересекающихся смен — O(log n + k), «кто свободен между T1 и T2» —
+O(водителей · log n) без запросов к сменам в базе.
+
+Перед ответом календарь сверяется с базой одним агрегирующим запросом
+(число смен, сумма id, последнее updated_at). Если что-то изменилось,
+дочитываются только смены с updated_at не раньше прошлой сверки; если
+после этого число или сумма id не сходятся (смены удалены или
+зафиксированы с опозданием), деревья строятся заново. Кроме того, они
+перестраиваются не реже раза в REBUILD_INTERVAL секунд. Смены, измененные
+QuerySet.update без updated_at, и изменения, зафиксированные с опозданием
+с updated_at раньше последнего, календарь не увидит до перестройки.
+
+Поэтому календарь отвечает только на чтение: /orders/schedule/, фильтр
+?available=true для водителей (orders/availability.py), автоназначение
+(orders/dispatch.py) и планировщик рейсов (orders/trips.py). Перед записью
+смены пересечения проверяются запросом к сменам водителя под блокировкой
+его строки (check), без сверки календаря.
+"""
+import datetime
+import threading
+import time
+from collections import defaultdict
+
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+
+from . import loading
+from .models import Driver, DriverShift
+
+REBUILD_INTERVAL = 300
+
+
+class ScheduleConflict(Exception):
+    """
+    Смена пересекается с другими сменами водителя
+    """
+
+    def __init__(self, message, shifts=()):
+        super().__init__(message)
+        self.shifts = list(shifts)
+
+
+class _Node:
+    __slots__ = ("key", "max_end", "height", "left", "right")
+
+    def __init__(self, key):
+        # (начало, окончание, id смены)
+        self.key = key
+        self.max_end = key[1]
+        self.height = 1
+        self.left = None
+        self.right = None
+
+
+def _height(node):
+    return node.height if node else 0
+
+
+def _update(node):
+    node.height = 1 + max(_height(node.left), _height(node.right))
+    node.max_end = node.key[1]
+    if node.left and node.left.max_end > node.max_end:
+        node.max_end = node.left.max_end
+    if node.right and node.right.max_end > node.max_end:
+        node.max_end = node.right.max_end
+
+
+def _rotate_right(node):
+    pivot = node.left
+    node.left = pivot.right
+    pivot.right = node
+    _update(node)
+    _update(pivot)
+    return pivot
+
+
+def _rotate_left(node):
+    pivot = node.right
+    node.right = pivot.left
+    pivot.left = node
+    _update(node)
+    _update(pivot)
+    return pivot
+
+
+def _balance(node):
+    _update(node)
+    diff = _height(node.left) - _height(node.right)
+    if diff > 1:
+        if _height(node.left.left) < _height(node.left.right):
+            node.left = _rotate_left(node.left)
+        return _rotate_right(node)
+    if diff < -1:
+        if _height(node.right.right) < _height(node.right.left):
+            node.right = _rotate_right(node.right)
+        return _rotate_left(node)
+    return node
+
+
+def _insert(node, key):
+    if node is None:
+        return _Node(key)
+    if key < node.key:
+        node.left = _insert(node.left, key)
+    else:
+        node.right = _insert(node.right, key)
+    return _balance(node)
+
+
+def _remove(node, key):
+    if node is None:
+        raise KeyError(key)
+    if key < node.key:
+        node.left = _remove(node.left, key)
+    elif key > node.key:
+        node.right = _remove(node.right, key)
+    else:
+        if node.left is None:
+            return node.right
+        if node.right is None:
+            return node.left
+        successor = node.right
+        while successor.left:
+            successor = successor.left
+        node.right = _remove(node.right, successor.key)
+        node.key = successor.key
+    return _balance(node)
+
+
+class IntervalTree:
+    """
+    Полуоткрытые интервалы [начало, окончание) с идентификаторами
+    """
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def add(self, start, end, ident):
+        self.root = _insert(self.root, (start, end, ident))
+        self.size += 1
+
+    def remove(self, start, end, ident):
+        self.root = _remove(self.root, (start, end, ident))
+        self.size -= 1
+
+    def first_overlap(self, start, end):
+        """
+        Какой-нибудь интервал, пересекающий [start, end), или None. Если
+        в левом поддереве есть интервал, кончающийся после start, но не
+        пересекающий запрос, то он начинается не раньше end, и правое
+        поддерево можно не смотреть — спуск идет по одной ветке
+        """
+        node = self.root
+        while node:
+            if node.key[0] < end and start < node.key[1]:
+                return node.key
+            if node.left and node.left.max_end > start:
+                node = node.left
+            else:
+                node = node.right
+        return None
+
+    def overlaps(self, start, end):
+        """
+        Все интервалы, пересекающие [start, end), по началу
+        """
+        result = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            if node.max_end <= start:
+                continue
+            if node.left:
+                stack.append(node.left)
+            if node.key[0] < end:
+                if start < node.key[1]:
+                    result.append(node.key)
+                if node.right:
+                    stack.append(node.right)
+        result.sort()
+        return result
+
+
+class Calendar:
+    """
+    Деревья смен по водителям в памяти процесса
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._trees = defaultdict(IntervalTree)
+        # id смены -> (водитель, начало, окончание)
+        self._shifts = {}
+        self._id_sum = 0
+        self._stamp = None
+        self._built_at = 0.0
+
+    def _put(self, shift_id, driver_id, start, end):
+        # В деревьях — метки времени: сравнение чисел быстрее, чем datetime
+        start, end = start.timestamp(), end.timestamp()
+        old = self._shifts.get(shift_id)
+        if old == (driver_id, start, end):
+            return
+        if old is not None:
+            self._drop(shift_id)
+        self._trees[driver_id].add(start, end, shift_id)
+        self._shifts[shift_id] = (driver_id, start, end)
+        self._id_sum += shift_id
+
+    def _drop(self, shift_id):
+        driver_id, start, end = self._shifts.pop(shift_id)
+        self._trees[driver_id].remove(start, end, shift_id)
+        self._id_sum -= shift_id
+
+    def _rebuild(self):
+        self._trees = defaultdict(IntervalTree)
+        self._shifts = {}
+        self._id_sum = 0
+        for row in DriverShift.objects.values_list("id", "driver_id", "starts_at", "ends_at"):
+            self._put(*row)
+        self._built_at = time.monotonic()
+
+    def sync(self):
+        """
+        Сверяет деревья с базой и дочитывает изменения
+        """
+        stamp = DriverShift.objects.aggregate(count=Count("id"), ids=Sum("id"), last=Max("updated_at"))
+        stamp = (stamp["count"], stamp["ids"] or 0, stamp["last"])
+        with self._lock:
+            if self._stamp is None or time.monotonic() - self._built_at > REBUILD_INTERVAL:
+                self._rebuild()
+            elif stamp != self._stamp:
+                changed = DriverShift.objects.all()
+                if self._stamp[2] is not None:
+                    changed = changed.filter(updated_at__gte=self._stamp[2])
+                for row in changed.values_list("id", "driver_id", "starts_at", "ends_at"):
+                    self._put(*row)
+                if (len(self._shifts), self._id_sum) != stamp[:2]:
+                    self._rebuild()
+            self._stamp = stamp
+
+    def overlapping(self, driver_id, start, end, exclude_id=None):
+        """
+        id смен водителя, пересекающих [start, end)
+        """
+        with self._lock:
+            tree = self._trees.get(driver_id)
+            if tree is None:
+                return []
+            return [
+                ident for _, _, ident in tree.overlaps(start.timestamp(), end.timestamp()) if ident != exclude_id
+            ]
+
+    def busy(self, start, end):
+        """
+        Водители, у которых есть смена, пересекающая [start, end)
+        """
+        start, end = start.timestamp(), end.timestamp()
+        with self._lock:
+            return {
+                driver_id
+                for driver_id, tree in self._trees.items()
+                if tree.first_overlap(start, end) is not None
+            }
+
+
+calendar = Calendar()
+
+
+def parse_moment(value):
+    """
+    Момент времени из ISO 8601; дата (YYYY-MM-DD) — начало дня
+    """
+    if len(value) == 10:
+        value = datetime.datetime.combine(datetime.date.fromisoformat(value), datetime.time.min)
+    else:
+        value = datetime.datetime.fromisoformat(value)
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
+
+
+def parse_window(start, end):
+    """
+    Интервал из параметров from и to. ValueError при ошибке
+    """
+    if not start or not end:
+        raise ValueError("нужны параметры from и to")
+    start, end = parse_moment(start), parse_moment(end)
+    if end <= start:
+        raise ValueError("to должен быть позже from")
+    return start, end
+
+
+def busy_drivers(start, end):
+    calendar.sync()
+    return calendar.busy(start, end)
+
+
+def busy_by_day(days):
+    """
+    Водители со сменами по дням: {день: водители}; календарь сверяется один раз
+    """
+    calendar.sync()
+    return {day: calendar.busy(*loading.day_bounds(day)) for day in days}
+
+
+def free_drivers(start, end):
+    """
+    Активные водители без смен в интервале [start, end)
+    """
+    return Driver.objects.filter(is_active=True).exclude(pk__in=busy_drivers(start, end)).order_by("id")
+
+
+def conflicts(driver_id, start, end, exclude_id=None):
+    """
+    Смены водителя, пересекающие [start, end)
+    """
+    calendar.sync()
+    ids = calendar.overlapping(driver_id, start, end, exclude_id)
+    if not ids:
+        return []
+    return list(DriverShift.objects.filter(pk__in=ids).select_related("driver"))
+
+
+def check(driver, start, end, exclude_id=None):
+    """
+    Проверяет, что водитель свободен в [start, end), перед записью смены.
+    Строка водителя блокируется до конца транзакции, поэтому параллельные
+    записи смен одного водителя проверяются по очереди; смены читаются из
+    базы под блокировкой (индекс shift_driver_start), а не из календаря.
+    ScheduleConflict, если занят. Вызывается внутри транзакции
+    """
+    list(Driver.objects.select_for_update().filter(pk=driver.pk).values_list("pk", flat=True))
+    shifts = DriverShift.objects.filter(driver_id=driver.pk, starts_at__lt=end, ends_at__gt=start)
+    if exclude_id is not None:
+        shifts = shifts.exclude(pk=exclude_id)
+    shifts = list(shifts.select_related("driver"))
+    if shifts:
+        raise ScheduleConflict(
+            f"Водитель {driver.full_name} занят: "
+            + ", ".join(
+                f"{timezone.localtime(shift.starts_at):%d.%m.%Y %H:%M}–{timezone.localtime(shift.ends_at):%d.%m.%Y %H:%M}"
+                for shift in shifts
+            ),
+            shifts,
+        )
+
@@ -1,5 +1,6 @@
 import datetime
 import json
+import logging
 import uuid
 from decimal import Decimal
 
@@ -8,32 +9,59 @@ from django.utils import timezone
 from rest_framework import serializers, status
 from rest_framework.response import Response
 
+from .metrics import timed_serialization
 from .models import (
     AdditionalService,
     City,
     Container,
     Marketplace,
     Order,
+    OrderEvent,
     Pricing,
     User,
     Warehouse,
     Driver,
+    DriverShift,
+    Trip,
     Truck,
 )
 
+logger = logging.getLogger(__name__)
 
-class MarketplaceSerializer(serializers.ModelSerializer):
+
+class TimedSerializerMixin:
+    """
+    Учитывает время serializer.data в метриках запроса (orders/metrics.py):
+    to_representation и вычисляемые поля выполняются внутри view, до
+    рендеринга ответа
+    """
+
+    @property
+    def data(self):
+        with timed_serialization():
+            return super().data
+
+
+class TimedListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    """
+    То же для many=True (Meta.list_serializer_class)
+    """
+
+
+class MarketplaceSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Marketplace
+        list_serializer_class = TimedListSerializer
         fields = "__all__"
 
 
-class WarehouseSerializer(serializers.ModelSerializer):
+class WarehouseSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     city_name = serializers.CharField(source="city.name", read_only=True)
     marketplace_name = serializers.CharField(source="marketplace.name", read_only=True)
 
     class Meta:
         model = Warehouse
+        list_serializer_class = TimedListSerializer
         fields = ["id", "name", "marketplace", "marketplace_name", "city", "city_name"]
 
     def list(self, request):
@@ -42,19 +70,63 @@ class WarehouseSerializer(serializers.ModelSerializer):
         return Response(serializer.data)
 
 
-class DriverSerializer(serializers.ModelSerializer):
+class DriverSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Driver
+        list_serializer_class = TimedListSerializer
         fields = ['id', 'full_name', 'phone', 'is_active']
 
 
-class TruckSerializer(serializers.ModelSerializer):
+class TruckSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Truck
-        fields = ['id', 'brand', 'truck_model', 'plate_number', 'is_active']
+        list_serializer_class = TimedListSerializer
+        fields = [
+            'id', 'brand', 'truck_model', 'plate_number',
+            'pallet_capacity', 'max_weight_kg', 'cargo_volume_m3', 'is_active',
+        ]
+
+
+class TripSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    driver = DriverSerializer(read_only=True)
+    truck = TruckSerializer(read_only=True)
+    orders = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+
+    class Meta:
+        model = Trip
+        list_serializer_class = TimedListSerializer
+        fields = ['id', 'warehouse', 'date', 'driver', 'truck', 'status', 'orders', 'created_at']
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class DriverShiftSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    driver_name = serializers.CharField(source="driver.full_name", read_only=True)
+
+    class Meta:
+        model = DriverShift
+        list_serializer_class = TimedListSerializer
+        fields = [
+            'id', 'driver', 'driver_name', 'starts_at', 'ends_at', 'order', 'trip', 'comment',
+            'created_at', 'updated_at',
+        ]
+
+    def validate(self, attrs):
+        starts_at = attrs.get("starts_at", getattr(self.instance, "starts_at", None))
+        ends_at = attrs.get("ends_at", getattr(self.instance, "ends_at", None))
+        if starts_at and ends_at and ends_at <= starts_at:
+            raise serializers.ValidationError({"ends_at": "Окончание смены должно быть позже начала"})
+        return attrs
+
+
+class OrderEventSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    type_display = serializers.CharField(source="get_type_display", read_only=True)
+
+    class Meta:
+        model = OrderEvent
+        list_serializer_class = TimedListSerializer
+        fields = ["id", "type", "type_display", "from_status", "to_status", "data", "at"]
+
+
+class OrderSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     containers_info = serializers.SerializerMethodField()
     client_info = serializers.SerializerMethodField()
     driver = DriverSerializer(read_only=True)
@@ -62,9 +134,50 @@ class OrderSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Order
+        list_serializer_class = TimedListSerializer
         fields = "__all__"
         read_only_fields = ("created_at",)
 
+    # Колонки заказа, которые читают вычисляемые поля
+    METHOD_FIELD_COLUMNS = {
+        "containers_info": ("cargo_type", "container_type", "box_count", "pallet_count"),
+        "client_info": ("company", "client_name", "email", "phone_number"),
+    }
+
+    def __init__(self, *args, fields=None, **kwargs):
+        """
+        fields — необязательный список полей ответа (?fields=).
+        Остальные поля удаляются до сериализации, поэтому их
+        SerializerMethodField не вызываются
+        """
+        super().__init__(*args, **kwargs)
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    @classmethod
+    def setup_queryset(cls, queryset, fields=None):
+        """
+        Загружает только колонки и связи, нужные для выбранных полей.
+        Без fields — все колонки и связи, которые выводит сериализатор
+        """
+        if not fields:
+            return queryset.select_related("driver", "truck").prefetch_related("services")
+
+        concrete = {field.name for field in Order._meta.concrete_fields}
+        columns = {"id"}
+        for name in fields:
+            if name in concrete:
+                columns.add(name)
+            columns.update(cls.METHOD_FIELD_COLUMNS.get(name, ()))
+        queryset = queryset.only(*columns)
+        related = [name for name in ("driver", "truck") if name in fields]
+        if related:
+            queryset = queryset.select_related(*related)
+        if "services" in fields:
+            queryset = queryset.prefetch_related("services")
+        return queryset
+
     def get_containers_info(self, obj):
         if isinstance(obj, Order):
             try:
@@ -289,6 +402,9 @@ class OrderSerializer(serializers.ModelSerializer):
                         else None
                     )
 
+            box_sizes = cargo_type_data.get("selectedBoxSizes") or [None]
+            pallet_weights = cargo_type_data.get("selectedPalletWeights") or [None]
+
             # Заполняем количество коробок и паллет
             if "quantities" in cargo_type_data:
                 if "Коробка" in cargo_type_data["quantities"]:
@@ -306,6 +422,8 @@ class OrderSerializer(serializers.ModelSerializer):
                 warehouse=warehouse,
                 cargo_type=cargo_type,
                 container_type=container_type,
+                box_container_type=box_sizes[0] if box_count else None,
+                pallet_container_type=pallet_weights[0] if pallet_count else None,
                 box_count=box_count,
                 pallet_count=pallet_count,
                 client_name=client_data.get("name", ""),
@@ -317,7 +435,7 @@ class OrderSerializer(serializers.ModelSerializer):
             )
             
             # Логируем данные для отладки
-            print(f"Creating order with telegram_user_id: {order.telegram_user_id}, from client data: {client_data}")
+            logger.debug("Creating order with telegram_user_id: %s", order.telegram_user_id)
 
             # 6. Добавляем дополнительные услуги, если они есть
             if additional_services:
@@ -326,19 +444,15 @@ class OrderSerializer(serializers.ModelSerializer):
                         service = AdditionalService.objects.get(id=service_id)
                         order.services.add(service)
                     except Exception as e:
-                        print(
-                            f"Error adding service {service_id} to order {order.id}: {e}"
+                        logger.error(
+                            "Error adding service %s to order %s: %s", service_id, order.id, e
                         )
 
             # 7. Возвращаем созданный заказ
             return order
 
         except Exception as e:
-            import traceback
-
-            print(f"Error creating order: {e}")
-            print(traceback.format_exc())
-            print(f"Validated data: {validated_data}")
+            logger.exception("Error creating order: %s", e)
             raise serializers.ValidationError(f"Failed to create order: {e}")
 
     def update(self, instance, validated_data):
@@ -368,9 +482,10 @@ class OrderSerializer(serializers.ModelSerializer):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class ContainerSerializer(serializers.ModelSerializer):
+class ContainerSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Container
+        list_serializer_class = TimedListSerializer
         fields = "__all__"
 
     def list(self, request):
@@ -379,11 +494,12 @@ class ContainerSerializer(serializers.ModelSerializer):
         return Response(serializer.data)
 
 
-class PricingSerializer(serializers.ModelSerializer):
+class PricingSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     warehouse_name = serializers.CharField(source="warehouse.name", read_only=True)
 
     class Meta:
         model = Pricing
+        list_serializer_class = TimedListSerializer
         fields = [
             "id",
             "name",
@@ -400,7 +516,7 @@ class PricingSerializer(serializers.ModelSerializer):
         read_only_fields = ("created_at", "updated_at")
 
 
-class AdditionalServiceSerializer(serializers.ModelSerializer):
+class AdditionalServiceSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Сериализатор для дополнительных услуг"""
 
     service_type_display = serializers.CharField(
@@ -409,6 +525,7 @@ class AdditionalServiceSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = AdditionalService
+        list_serializer_class = TimedListSerializer
         fields = [
             "id",
             "name",
@@ -0,0 +1,247 @@
+"""
+Дневная статистика заказов по складам.
+
+Основной источник отчета — таблица DailyWarehouseStats, которую
+инкрементально поддерживает Order.save. Здесь собраны полный пересчет из
+таблиц активных и архивных заказов (для заполнения и сверки), чтение
+отчета за период и время этапов по журналу событий.
+"""
+import datetime
+import itertools
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, DecimalField, IntegerField, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import ArchivedOrder, DailyWarehouseStats, Order, OrderEvent
+
+# Этапы, между которыми считается время выполнения заказа
+LEAD_TIME_STAGES = ("new", "accepted", "completed")
+
+# Разница двух меток времени в секундах для поддерживаемых СУБД
+_SECONDS_BETWEEN = {
+    "postgresql": "EXTRACT(EPOCH FROM (at - prev_at))",
+    "sqlite": "(julianday(at) - julianday(prev_at)) * 86400.0",
+}
+
+LEAD_TIMES_SQL = """
+WITH reached AS (
+    -- Первое попадание заказа в каждый этап
+    SELECT order_id, to_status, at,
+           ROW_NUMBER() OVER (PARTITION BY order_id, to_status ORDER BY at, id) AS n
+    FROM {events}
+    WHERE type IN ('created', 'status_changed')
+      AND to_status IN ({stages})
+      AND order_id IN (
+          SELECT order_id FROM {events}
+          WHERE type = 'created' AND at >= %s AND at < %s
+      )
+),
+stages AS (
+    SELECT order_id, to_status, at,
+           LAG(to_status) OVER (PARTITION BY order_id ORDER BY at) AS prev_status,
+           LAG(at) OVER (PARTITION BY order_id ORDER BY at) AS prev_at
+    FROM reached
+    WHERE n = 1
+),
+durations AS (
+    SELECT prev_status, to_status, {seconds} AS seconds
+    FROM stages
+    WHERE prev_status IS NOT NULL
+)
+SELECT prev_status, to_status, COUNT(*), AVG(seconds), MIN(seconds), MAX(seconds)
+FROM durations
+GROUP BY prev_status, to_status
+"""
+
+
+def _aggregate(queryset, date_from, date_to):
+    if date_from:
+        queryset = queryset.filter(created_at__date__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(created_at__date__lte=date_to)
+
+    active = ~Q(status__in=DailyWarehouseStats.CANCELED_STATUSES)
+    return (
+        queryset.annotate(date=TruncDate("created_at"))
+        .values("date", "warehouse_id")
+        .annotate(
+            orders_count=Count("id"),
+            canceled_count=Count("id", filter=~active),
+            revenue=Coalesce(
+                Sum("total_price", filter=active),
+                Value(Decimal("0.00")),
+                output_field=DecimalField(max_digits=14, decimal_places=2),
+            ),
+            box_count=Coalesce(Sum("box_count", filter=active), Value(0), output_field=IntegerField()),
+            pallet_count=Coalesce(Sum("pallet_count", filter=active), Value(0), output_field=IntegerField()),
+        )
+        .order_by()
+    )
+
+
+def aggregate_orders(date_from=None, date_to=None, sources=None):
+    """
+    Считает статистику напрямую по таблицам активных и архивных заказов
+    (sources — модели заказов, по умолчанию Order и ArchivedOrder).
+    Возвращает {(дата, склад): {счетчик: значение}}
+    """
+    result = {}
+    for model in sources or (Order, ArchivedOrder):
+        for row in _aggregate(model.objects.all(), date_from, date_to):
+            key = (row["date"], row["warehouse_id"])
+            counters = result.setdefault(key, dict.fromkeys(DailyWarehouseStats.COUNTERS, 0))
+            for field in DailyWarehouseStats.COUNTERS:
+                counters[field] += row[field]
+    return result
+
+
+def reconcile(date_from=None, date_to=None, dry_run=False, stats_model=DailyWarehouseStats, sources=None):
+    """
+    Сверяет DailyWarehouseStats с таблицей заказов и исправляет расхождения.
+    На пустой таблице статистики работает как полное заполнение.
+    stats_model и sources — модели статистики и заказов (в миграции —
+    исторические). Возвращает список расхождений (дата, склад, ожидалось, было)
+    """
+    expected = aggregate_orders(date_from, date_to, sources)
+    stored = stats_model.objects.all()
+    if date_from:
+        stored = stored.filter(date__gte=date_from)
+    if date_to:
+        stored = stored.filter(date__lte=date_to)
+    actual = {
+        (row["date"], row["warehouse_id"]): {field: row[field] for field in DailyWarehouseStats.COUNTERS}
+        for row in stored.values("date", "warehouse_id", *DailyWarehouseStats.COUNTERS)
+    }
+
+    # Строка из одних нулей (все заказы дня удалены) равнозначна отсутствующей
+    empty = dict.fromkeys(DailyWarehouseStats.COUNTERS, 0)
+    mismatches = []
+    for key in sorted(expected.keys() | actual.keys()):
+        if (expected.get(key) or empty) != (actual.get(key) or empty):
+            mismatches.append((key[0], key[1], expected.get(key), actual.get(key)))
+
+    if dry_run or not mismatches:
+        return mismatches
+
+    with transaction.atomic():
+        missing = []
+        for date, warehouse_id, counters, stored_counters in mismatches:
+            if counters is None:
+                stats_model.objects.filter(date=date, warehouse_id=warehouse_id).delete()
+            elif stored_counters is None:
+                missing.append(stats_model(date=date, warehouse_id=warehouse_id, **counters))
+            else:
+                stats_model.objects.filter(date=date, warehouse_id=warehouse_id).update(**counters)
+        stats_model.objects.bulk_create(missing, batch_size=1000)
+    return mismatches
+
+
+def report(date_from, date_to, warehouse_id=None):
+    """
+    Отчет за период по таблице статистики: строки по дням и складам и итоги
+    """
+    rows = DailyWarehouseStats.objects.filter(date__gte=date_from, date__lte=date_to)
+    if warehouse_id:
+        rows = rows.filter(warehouse_id=warehouse_id)
+    rows = rows.select_related("warehouse").order_by("date", "warehouse_id")
+
+    days = []
+    totals = dict.fromkeys(DailyWarehouseStats.COUNTERS, 0)
+    totals["revenue"] = Decimal("0.00")
+    for row in rows:
+        days.append({
+            "date": row.date,
+            "warehouse_id": row.warehouse_id,
+            "warehouse": row.warehouse.name,
+            **{field: getattr(row, field) for field in DailyWarehouseStats.COUNTERS},
+        })
+        for field in DailyWarehouseStats.COUNTERS:
+            totals[field] += getattr(row, field)
+    return {"date_from": date_from, "date_to": date_to, "totals": totals, "days": days}
+
+
+def parse_period(params, default_days=30):
+    """
+    Период из параметров date_from/date_to (YYYY-MM-DD).
+    По умолчанию — последние default_days дней. ValueError при ошибке формата
+    """
+    date_to = params.get("date_to")
+    date_to = datetime.date.fromisoformat(date_to) if date_to else timezone.localdate()
+    date_from = params.get("date_from")
+    date_from = (
+        datetime.date.fromisoformat(date_from)
+        if date_from
+        else date_to - datetime.timedelta(days=default_days - 1)
+    )
+    if date_from > date_to:
+        raise ValueError("date_from позже date_to")
+    return date_from, date_to
+
+
+def _lead_time_rows(start, end, stages):
+    """
+    То же, что LEAD_TIMES_SQL, на Python — для СУБД без разницы меток
+    времени в _SECONDS_BETWEEN. События заказов периода читаются одним
+    запросом по порядку (заказ, время)
+    """
+    created = OrderEvent.objects.filter(type="created", at__gte=start, at__lt=end).values("order_id")
+    events = (
+        OrderEvent.objects.filter(
+            type__in=("created", "status_changed"), to_status__in=stages, order_id__in=created
+        )
+        .order_by("order_id", "at", "id")
+        .values_list("order_id", "to_status", "at")
+    )
+    durations = defaultdict(list)
+    for _, order_events in itertools.groupby(events.iterator(), key=lambda event: event[0]):
+        reached = {}
+        for _, to_status, at in order_events:
+            reached.setdefault(to_status, at)
+        ordered = sorted(reached.items(), key=lambda item: item[1])
+        for (prev_status, prev_at), (to_status, at) in zip(ordered, ordered[1:]):
+            durations[(prev_status, to_status)].append((at - prev_at).total_seconds())
+    return [
+        (prev_status, to_status, len(values), sum(values) / len(values), min(values), max(values))
+        for (prev_status, to_status), values in durations.items()
+    ]
+
+
+def lead_times(date_from, date_to, stages=LEAD_TIME_STAGES):
+    """
+    Время между этапами (new→accepted, accepted→completed) для заказов,
+    созданных в периоде. Первое попадание в этап и предыдущий этап
+    вычисляются оконными функциями в БД по журналу OrderEvent, на других
+    СУБД — на Python (_lead_time_rows)
+    """
+    start = timezone.make_aware(datetime.datetime.combine(date_from, datetime.time.min))
+    end = timezone.make_aware(datetime.datetime.combine(date_to + datetime.timedelta(days=1), datetime.time.min))
+    seconds = _SECONDS_BETWEEN.get(connection.vendor)
+    if seconds is None:
+        rows = _lead_time_rows(start, end, stages)
+    else:
+        sql = LEAD_TIMES_SQL.format(
+            events=connection.ops.quote_name(OrderEvent._meta.db_table),
+            stages=", ".join(["%s"] * len(stages)),
+            seconds=seconds,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [*stages, start, end])
+            rows = cursor.fetchall()
+
+    order = {stage: i for i, stage in enumerate(stages)}
+    rows.sort(key=lambda row: (order[row[0]], order[row[1]]))
+    return [
+        {
+            "from": from_status,
+            "to": to_status,
+            "orders": count,
+            "avg_seconds": round(float(avg), 1),
+            "min_seconds": round(float(minimum), 1),
+            "max_seconds": round(float(maximum), 1),
+        }
+        for from_status, to_status, count, avg, minimum, maximum in rows
+    ]
@@ -0,0 +1,174 @@
+"""
+Живая лента заказов: GET /orders/stream/ (Server-Sent Events).
+
+Отдельное ASGI-приложение, которое wb_wms/asgi.py подключает перед Django:
+открытое соединение не проходит middleware и не занимает поток, а только
+ждет событий в цикле событий. Под WSGI (runserver) лента недоступна.
+
+Параметры:
+    warehouse_id — только события складов (через запятую или несколько раз);
+    last_event_id — то же, что заголовок Last-Event-ID.
+
+События (event: created / status_changed / driver_assigned / deleted /
+archived) берутся из orders.pubsub. id события — id записи журнала
+OrderEvent, поэтому при переподключении с Last-Event-ID пропущенное
+дочитывается из журнала — по складу, записанному в событии, без
+обращения к заказу: события удаленных и архивных заказов тоже
+дочитываются.
+Если пропущено больше RESUME_LIMIT событий, отправляется event: reset —
+клиенту нужно заново загрузить список (например, через /orders/changes/),
+после чего лента продолжается с текущего момента.
+"""
+import asyncio
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from .models import OrderEvent
+from .pubsub import STREAM_TYPES, broker, dumps, event_message
+
+HEARTBEAT_SECONDS = 15
+RESUME_LIMIT = 1000
+RETRY_MILLISECONDS = 3000
+
+
+def format_event(message):
+    return f"id: {message['id']}\nevent: {message['type']}\ndata: {dumps(message)}\n\n".encode()
+
+
+def load_missed(last_event_id, warehouse_ids):
+    """
+    События журнала после last_event_id (не больше RESUME_LIMIT + 1)
+    """
+    events = OrderEvent.objects.filter(pk__gt=last_event_id, type__in=STREAM_TYPES).order_by("pk")
+    if warehouse_ids:
+        events = events.filter(warehouse_id__in=warehouse_ids)
+    return [event_message(event) for event in events[: RESUME_LIMIT + 1]]
+
+
+def latest_event_id():
+    return OrderEvent.objects.order_by("-pk").values_list("pk", flat=True).first() or 0
+
+
+def run_query(func, *args):
+    """
+    Запрос из ленты. Лента обходит обработчик Django, и сигналы начала и
+    конца запроса, закрывающие устаревшие соединения (CONN_MAX_AGE), не
+    приходят — соединение потока проверяется здесь, вне транзакций
+    """
+    close_old_connections()
+    try:
+        return func(*args)
+    finally:
+        close_old_connections()
+
+
+def parse_params(scope):
+    """
+    (склады, last_event_id) из строки запроса и заголовков.
+    ValueError при некорректных значениях
+    """
+    query = parse_qs(scope.get("query_string", b"").decode())
+    warehouse_ids = {
+        int(value)
+        for raw in query.get("warehouse_id", [])
+        for value in raw.split(",")
+        if value.strip()
+    }
+    headers = dict(scope.get("headers", []))
+    last_event_id = headers.get(b"last-event-id", b"").decode() or query.get("last_event_id", [""])[0]
+    return warehouse_ids, int(last_event_id) if last_event_id else None
+
+
+def response_headers(scope):
+    headers = [
+        (b"content-type", b"text/event-stream; charset=utf-8"),
+        (b"cache-control", b"no-cache"),
+        # Отключает буферизацию ответа в nginx
+        (b"x-accel-buffering", b"no"),
+    ]
+    origin = dict(scope.get("headers", [])).get(b"origin")
+    if origin and getattr(settings, "CORS_ALLOW_ALL_ORIGINS", False):
+        headers.append((b"access-control-allow-origin", origin))
+        if getattr(settings, "CORS_ALLOW_CREDENTIALS", False):
+            headers.append((b"access-control-allow-credentials", b"true"))
+    return headers
+
+
+async def send_error(send, status, text):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"text/plain; charset=utf-8")],
+    })
+    await send({"type": "http.response.body", "body": text.encode()})
+
+
+async def wait_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+class OrderStreamApp:
+    """
+    ASGI-приложение ленты заказов
+    """
+
+    async def __call__(self, scope, receive, send):
+        if scope["method"] != "GET":
+            await send_error(send, 405, "Метод не поддерживается")
+            return
+        try:
+            warehouse_ids, last_event_id = parse_params(scope)
+        except ValueError:
+            await send_error(send, 400, "Некорректные параметры warehouse_id или Last-Event-ID")
+            return
+
+        # Подписка до чтения журнала: события, зафиксированные во время
+        # чтения, не потеряются, а повторы отбрасываются по id
+        subscription = broker.subscribe(warehouse_ids)
+        disconnected = asyncio.ensure_future(wait_disconnect(receive))
+        try:
+            await send({"type": "http.response.start", "status": 200, "headers": response_headers(scope)})
+            await self.send_chunk(send, f"retry: {RETRY_MILLISECONDS}\n\n".encode())
+
+            resumed = set()
+            if last_event_id is not None:
+                missed = await sync_to_async(run_query)(load_missed, last_event_id, warehouse_ids)
+                if len(missed) > RESUME_LIMIT:
+                    # id последнего события в журнале: после перезагрузки
+                    # клиент продолжит с него, а не получит reset снова
+                    latest = await sync_to_async(run_query)(latest_event_id)
+                    await self.send_chunk(send, f"id: {latest}\nevent: reset\ndata: {{}}\n\n".encode())
+                    missed = []
+                for message in missed:
+                    resumed.add(message["id"])
+                    await self.send_chunk(send, format_event(message))
+
+            while not subscription.overflowed:
+                message = asyncio.ensure_future(subscription.queue.get())
+                done, _ = await asyncio.wait(
+                    {message, disconnected},
+                    timeout=HEARTBEAT_SECONDS,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if disconnected in done:
+                    message.cancel()
+                    return
+                if message in done:
+                    if message.result()["id"] not in resumed:
+                        await self.send_chunk(send, format_event(message.result()))
+                else:
+                    message.cancel()
+                    await self.send_chunk(send, b": ping\n\n")
+        finally:
+            broker.unsubscribe(subscription)
+            client_gone = disconnected.done()
+            disconnected.cancel()
+            if not client_gone:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def send_chunk(self, send, chunk):
+        await send({"type": "http.response.body", "body": chunk, "more_body": True})
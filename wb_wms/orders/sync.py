@@ -0,0 +1,122 @@
+"""
+Инкрементальная синхронизация списка заказов (GET /orders/changes/).
+
+Клиент хранит локальную копию заказов и передает курсор из предыдущего
+ответа. В ответ приходят заказы, сохраненные после курсора (по индексу
+(updated_at, id)), и «надгробия» удаленных и архивированных заказов из
+журнала OrderEvent (события deleted/archived, индекс (type, at)).
+
+Курсор — позиция в обоих потоках: (updated_at, id) последнего отданного
+заказа и (at, id) последнего надгробия. Метки времени выставляются до
+фиксации транзакции, поэтому запись может стать видимой уже после того,
+как курсор ушел вперед. Когда клиент догнал поток, курсор отодвигается
+на SYNC_LAG назад: последние секунды отдаются повторно, и клиент
+применяет их идемпотентно (upsert/удаление по id).
+"""
+import base64
+import datetime
+import json
+import uuid
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Order, OrderEvent
+
+# Запас на транзакции, зафиксированные позже своих меток времени
+SYNC_LAG = datetime.timedelta(seconds=5)
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 5000
+
+TOMBSTONE_TYPES = ("deleted", "archived")
+
+
+def encode_cursor(orders_position, tombstones_position):
+    def position(value):
+        at, pk = value
+        return [at.isoformat() if at else None, str(pk) if pk else None]
+
+    raw = json.dumps({"o": position(orders_position), "t": position(tombstones_position)})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    Позиции (updated_at, id заказа) и (at, id события) из курсора.
+    Пустой курсор — все заказы с начала и надгробия с текущего момента:
+    удаления до первой загрузки клиенту не нужны.
+    ValueError при некорректном курсоре
+    """
+    if not cursor:
+        return (None, None), (timezone.now() - SYNC_LAG, None)
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        (order_at, order_id), (event_at, event_id) = raw["o"], raw["t"]
+        return (
+            (_parse_time(order_at), uuid.UUID(order_id) if order_id else None),
+            (_parse_time(event_at), int(event_id) if event_id else None),
+        )
+    except (TypeError, KeyError, ValueError) as e:
+        raise ValueError(f"Некорректный курсор: {e}")
+
+
+def _parse_time(value):
+    if value is None:
+        return None
+    value = datetime.datetime.fromisoformat(value)
+    if timezone.is_naive(value):
+        raise ValueError("время без часового пояса")
+    return value
+
+
+def _after(queryset, time_field, position):
+    at, pk = position
+    if at is None:
+        return queryset
+    condition = Q(**{f"{time_field}__gt": at})
+    if pk is not None:
+        condition |= Q(**{time_field: at, "pk__gt": pk})
+    return queryset.filter(condition)
+
+
+def _page(queryset, time_field, position, limit):
+    """
+    Следующая страница потока и новая позиция в нем
+    """
+    rows = list(_after(queryset, time_field, position).order_by(time_field, "pk")[: limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if rows:
+        last = rows[-1]
+        position = (getattr(last, time_field), last.pk)
+    if not has_more:
+        # Поток догнан: курсор не опережает now - SYNC_LAG
+        horizon = timezone.now() - SYNC_LAG
+        if position[0] is None or position[0] > horizon:
+            position = (horizon, None)
+    return rows, position, has_more
+
+
+def changes(cursor, limit=DEFAULT_LIMIT, queryset=None):
+    """
+    Изменения после курсора: (заказы, надгробия, новый курсор, есть ли еще).
+    queryset — подготовленный набор заказов (only/select_related)
+    """
+    orders_position, tombstones_position = decode_cursor(cursor)
+    orders, orders_position, orders_more = _page(
+        queryset if queryset is not None else Order.objects.all(), "updated_at", orders_position, limit
+    )
+    tombstones, tombstones_position, tombstones_more = _page(
+        OrderEvent.objects.filter(type__in=TOMBSTONE_TYPES).only("id", "order_id", "type", "at"),
+        "at",
+        tombstones_position,
+        limit,
+    )
+    deleted = [{"id": event.order_id, "type": event.type, "at": event.at} for event in tombstones]
+    return (
+        orders,
+        deleted,
+        encode_cursor(orders_position, tombstones_position),
+        orders_more or tombstones_more,
+    )
@@ -0,0 +1,102 @@
+"""
+Снимок тарифов для массового расчета стоимости.
+
+Order.calculate_price делает несколько запросов на каждый заказ. Снимок
+читает тарифы доставки, цены коробок и паллет и дополнительные услуги
+один раз и считает стоимость в памяти по тем же правилам, что
+Order.calculate_price: одинаковые заказы получают одинаковую цену.
+Используется при импорте заказов (orders/imports.py).
+"""
+from decimal import Decimal
+
+from .models import AdditionalService, BoxPricing, PalletPricing, Pricing
+
+CUSTOM_BOX_SIZE = "Другой размер"
+CUSTOM_PALLET_WEIGHT = "Другой вес"
+
+MIN_BOX_PRICE = Decimal("450.00")
+MIN_PALLET_PRICE = Decimal("2000.00")
+STANDARD_PALLET_PRICE = Decimal("5000.00")
+
+
+class TariffSnapshot:
+    """
+    Тарифы на момент создания снимка
+    """
+
+    def __init__(self):
+        # Как .first() в Order.calculate_price: первая запись в порядке модели
+        self.delivery = {}
+        for warehouse_id, price in (
+            Pricing.objects.filter(pricing_type="delivery", warehouse__isnull=False)
+            .order_by("pk")
+            .values_list("warehouse_id", "base_price")
+        ):
+            self.delivery.setdefault(warehouse_id, price)
+
+        self.boxes = {}
+        self.custom_boxes = {}
+        for size, volume_range, price in BoxPricing.objects.filter(is_active=True).values_list(
+            "size_category", "volume_range", "price"
+        ):
+            self.boxes.setdefault(size, price)
+            if size == CUSTOM_BOX_SIZE:
+                self.custom_boxes.setdefault(volume_range, price)
+
+        self.pallets = {}
+        for category, price in PalletPricing.objects.filter(is_active=True).values_list("weight_category", "price"):
+            self.pallets.setdefault(category, price)
+
+        self.services = dict(AdditionalService.objects.filter(is_active=True).values_list("id", "price"))
+        self.box_defaults = BoxPricing.get_default_prices()
+        self.pallet_defaults = PalletPricing.get_default_prices()
+
+    def box_price(self, size, length, width, height):
+        if size == CUSTOM_BOX_SIZE:
+            try:
+                length, width, height = float(length or 0), float(width or 0), float(height or 0)
+            except (TypeError, ValueError):
+                return MIN_BOX_PRICE
+            if length <= 0 or width <= 0 or height <= 0:
+                return MIN_BOX_PRICE
+            volume_range = BoxPricing.calculate_volume(length, width, height)
+            if volume_range in self.custom_boxes:
+                return self.custom_boxes[volume_range]
+            return Decimal(str(self.box_defaults.get(volume_range, "450.00")))
+        if size in self.boxes:
+            return self.boxes[size]
+        return Decimal(str(self.box_defaults.get(size, "450.00")))
+
+    def pallet_price(self, category, weight):
+        if category == CUSTOM_PALLET_WEIGHT:
+            try:
+                weight = float(weight or 0)
+            except (TypeError, ValueError):
+                return MIN_PALLET_PRICE
+            if weight <= 0:
+                return MIN_PALLET_PRICE
+            if weight <= 500:
+                return STANDARD_PALLET_PRICE
+            # 1000 рублей за каждые начатые 100 кг свыше 500 кг
+            extra_hundreds = (weight - 500 + 99) // 100
+            return STANDARD_PALLET_PRICE + Decimal(str(extra_hundreds * 1000))
+        if category in self.pallets:
+            return self.pallets[category]
+        return Decimal(str(self.pallet_defaults.get(category, "2000.00")))
+
+    def price(self, order, service_ids=()):
+        """
+        Стоимость несохраненного заказа с дополнительными услугами service_ids
+        """
+        total = Decimal("0.00")
+        if order.warehouse_id in self.delivery:
+            total += self.delivery[order.warehouse_id]
+        if order.box_count:
+            price = self.box_price(order.box_container_type or "", order.length, order.width, order.height)
+            total += price * Decimal(order.box_count)
+        if order.pallet_count:
+            price = self.pallet_price(order.pallet_container_type or "", order.weight)
+            total += price * Decimal(order.pallet_count)
+        for service_id in service_ids:
+            total += self.services.get(service_id, Decimal("0.00"))
+        return total
@@ -0,0 +1,1125 @@
+import asyncio
+import datetime
+import io
+import json
+import threading
+import uuid
+from decimal import Decimal
+from unittest import mock, skipUnless
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import Client, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from . import archive, dispatch, imports, loading, notifications, pubsub, renderers, schedule, stats, stream, trips, views
+from .models import (
+    City,
+    DailyWarehouseStats,
+    Driver,
+    DriverShift,
+    Marketplace,
+    Order,
+    OrderConflict,
+    OrderEvent,
+    Trip,
+    Truck,
+    Warehouse,
+)
+
+
+def create_order(warehouse=None, **values):
+    if warehouse is None:
+        marketplace = Marketplace.objects.create(name="Wildberries")
+        city = City.objects.create(name="Москва")
+        warehouse = Warehouse.objects.create(name="Коледино", marketplace=marketplace, city=city)
+    values = {
+        "cargo_type": "box",
+        "box_count": 2,
+        "client_name": "Клиент",
+        "phone_number": "+79990000000",
+        **values,
+    }
+    return Order.objects.create(warehouse=warehouse, **values)
+
+
+def create_crews(count):
+    drivers = [Driver.objects.create(full_name=f"Водитель {index}") for index in range(count)]
+    trucks = [Truck.objects.create(brand="ГАЗ", plate_number=f"А{index:03}АА77") for index in range(count)]
+    return drivers, trucks
+
+
+def stats_rows():
+    return list(DailyWarehouseStats.objects.order_by("date", "warehouse_id").values(*DailyWarehouseStats.COUNTERS))
+
+
+class AssignDriverConcurrencyTests(TransactionTestCase):
+    """
+    Из одновременных назначений водителя на один заказ проходит ровно одно
+    """
+
+    concurrency = 8
+
+    def setUp(self):
+        # Назначение ждет блокировки строки грузовика; SQLite вместо
+        # ожидания отвечает «database is locked»
+        if not connection.features.has_select_for_update:
+            self.skipTest("нужна база с блокировками строк (PostgreSQL)")
+
+    def assign_concurrently(self, order, drivers, trucks, condition):
+        url = reverse("orders:assign-driver", kwargs={"order_id": order.pk})
+        barrier = threading.Barrier(len(drivers))
+        results = [None] * len(drivers)
+
+        def worker(index):
+            try:
+                payload = {"driver_id": drivers[index].id, "truck_id": trucks[index].id, **condition}
+                barrier.wait()
+                response = Client().post(url, payload, content_type="application/json")
+                results[index] = (response.status_code, drivers[index].id)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(index,)) for index in range(len(drivers))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def check_single_winner(self, condition=None):
+        order = create_order()
+        version = order.version
+        drivers, trucks = create_crews(self.concurrency)
+        stats_before = stats_rows()
+
+        results = self.assign_concurrently(order, drivers, trucks, condition or {"version": version})
+
+        codes = sorted(code for code, _ in results)
+        self.assertEqual(codes, [200] + [409] * (self.concurrency - 1))
+        winner = next(driver_id for code, driver_id in results if code == 200)
+        order.refresh_from_db()
+        self.assertEqual(order.driver_id, winner)
+        self.assertEqual(order.status, "accepted")
+        self.assertEqual(order.version, version + 1)
+        self.assertEqual(
+            OrderEvent.objects.filter(order_id=order.pk, type="status_changed", to_status="accepted").count(), 1
+        )
+        self.assertEqual(OrderEvent.objects.filter(order_id=order.pk, type="driver_assigned").count(), 1)
+        # new → accepted не меняет счетчики: статистика та же и сходится с заказами
+        self.assertEqual(stats_rows(), stats_before)
+        self.assertEqual(stats.reconcile(dry_run=True), [])
+
+    def test_version_condition(self):
+        self.check_single_winner()
+
+    def test_expected_status_condition(self):
+        self.check_single_winner({"expected_status": "new"})
+
+
+class VersionedUpdateTests(TestCase):
+    def setUp(self):
+        self.order = create_order()
+        self.drivers, self.trucks = create_crews(2)
+
+    def assign(self, index, **condition):
+        return self.client.post(
+            reverse("orders:assign-driver", kwargs={"order_id": self.order.pk}),
+            {"driver_id": self.drivers[index].id, "truck_id": self.trucks[index].id, **condition},
+            content_type="application/json",
+        )
+
+    def test_stale_version_conflict(self):
+        version = self.order.version
+        self.assertEqual(self.assign(0, version=version).status_code, 200)
+
+        response = self.assign(1, version=version)
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["status"], "accepted")
+        self.assertEqual(response.json()["version"], version + 1)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.driver_id, self.drivers[0].id)
+
+    def test_stale_object_raises_conflict(self):
+        stale = Order.objects.get(pk=self.order.pk)
+        self.order.update_versioned({"status": "processing"})
+
+        with self.assertRaises(OrderConflict) as raised:
+            stale.update_versioned({"status": "canceled"})
+
+        self.assertEqual(raised.exception.order.version, stale.version + 1)
+        self.assertEqual(Order.objects.get(pk=self.order.pk).status, "processing")
+        self.assertFalse(OrderEvent.objects.filter(order_id=self.order.pk, to_status="canceled").exists())
+
+    def test_expected_status_conflict(self):
+        self.assertEqual(self.assign(0).status_code, 200)
+
+        response = self.assign(1, expected_status="new")
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["status"], "accepted")
+
+    def test_reassign_requires_version(self):
+        self.assertEqual(self.assign(0).status_code, 200)
+
+        response = self.assign(1)
+
+        self.assertEqual(response.status_code, 409)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.driver_id, self.drivers[0].id)
+        self.assertEqual(self.assign(1, version=self.order.version).status_code, 200)
+
+    def test_viewset_reassign_requires_version(self):
+        # Действие не подключено в urls.py, вызывается напрямую
+        view = views.OrderViewSet.as_view({"post": "assign_driver"})
+        self.assertEqual(self.assign(0).status_code, 200)
+
+        request = APIRequestFactory().post(
+            "/", {"driver_id": self.drivers[1].id, "truck_id": self.trucks[1].id}, format="json"
+        )
+        response = view(request, pk=self.order.pk)
+
+        self.assertEqual(response.status_code, 409)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.driver_id, self.drivers[0].id)
+
+
+class TruckCapacityTests(TestCase):
+    def test_assignment_over_capacity(self):
+        first = create_order(pallet_count=2)
+        second = Order.objects.create(
+            warehouse=first.warehouse, cargo_type="pallet", pallet_count=2, client_name="Клиент", phone_number="+7"
+        )
+        drivers, trucks = create_crews(2)
+        Truck.objects.filter(pk=trucks[0].pk).update(pallet_capacity=3)
+
+        def assign(order, index):
+            return self.client.post(
+                reverse("orders:assign-driver", kwargs={"order_id": order.pk}),
+                {"driver_id": drivers[index].id, "truck_id": trucks[0].id},
+                content_type="application/json",
+            )
+
+        self.assertEqual(assign(first, 0).status_code, 200)
+        response = assign(second, 1)
+
+        self.assertEqual(response.status_code, 400)
+        second.refresh_from_db()
+        self.assertEqual(second.status, "new")
+        self.assertIsNone(second.truck_id)
+
+    def test_weight_is_per_pallet(self):
+        order = create_order(
+            cargo_type="pallet", box_count=0, pallet_count=2, pallet_container_type="Другой вес", weight=800
+        )
+        drivers, trucks = create_crews(1)
+        Truck.objects.filter(pk=trucks[0].pk).update(max_weight_kg=1500)
+
+        self.assertEqual(loading.order_load(order)[1], 1600)
+        response = self.client.post(
+            reverse("orders:assign-driver", kwargs={"order_id": order.pk}),
+            {"driver_id": drivers[0].id, "truck_id": trucks[0].id},
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("грузоподъемность", response.json()["error"])
+
+
+class LoadPlannerTests(TestCase):
+    def setUp(self):
+        self.drivers, self.trucks = create_crews(3)
+        Truck.objects.filter(pk=self.trucks[0].pk).update(pallet_capacity=3)
+        Truck.objects.filter(pk=self.trucks[1].pk).update(pallet_capacity=2)
+        # Третий грузовик без заданной вместимости в раскладке не участвует
+        self.today = timezone.localdate().isoformat()
+
+    def pallets(self, count, **values):
+        return create_order(cargo_type="pallet", box_count=0, pallet_count=count, **values)
+
+    def test_fleet_load(self):
+        self.pallets(2, status="accepted", driver=self.drivers[0], truck=self.trucks[0])
+        self.pallets(1)
+
+        response = self.client.get(reverse("orders:truck-loads"), {"date": self.today})
+
+        trucks = {item["truck"]["id"]: item for item in response.json()["trucks"]}
+        self.assertEqual(trucks[self.trucks[0].id]["load"]["pallets"], 2)
+        self.assertEqual(trucks[self.trucks[0].id]["utilization"]["pallets"], 66.7)
+        self.assertFalse(trucks[self.trucks[0].id]["overloaded"])
+        self.assertEqual(trucks[self.trucks[1].id]["load"]["pallets"], 0)
+
+    def test_pack_largest_first_around_current_load(self):
+        self.pallets(1, status="accepted", driver=self.drivers[1], truck=self.trucks[1])
+        large = self.pallets(2)
+        other_large = self.pallets(2)
+        small = self.pallets(1)
+
+        response = self.client.post(
+            reverse("orders:truck-load-plan"), {"date": self.today}, content_type="application/json"
+        )
+
+        data = response.json()
+        placed = {item["truck"]["id"]: set(item["orders"]) for item in data["trucks"]}
+        self.assertEqual(set(placed), {self.trucks[0].id, self.trucks[1].id})
+        self.assertEqual(len(placed[self.trucks[0].id]), 2)
+        self.assertIn(str(small.pk), placed[self.trucks[0].id])
+        self.assertEqual(placed[self.trucks[1].id], set())
+        self.assertEqual(len(data["unplaced"]), 1)
+        self.assertIn(data["unplaced"][0], {str(large.pk), str(other_large.pk)})
+        self.assertFalse(Order.objects.filter(status="new", truck__isnull=False).exists())
+
+    def test_invalid_date(self):
+        response = self.client.get(reverse("orders:truck-loads"), {"date": "01.03.2024"})
+
+        self.assertEqual(response.status_code, 400)
+
+
+class TripPlanTests(TestCase):
+    def setUp(self):
+        self.drivers, self.trucks = create_crews(3)
+
+    def pallets(self, count, **values):
+        return create_order(cargo_type="pallet", box_count=0, pallet_count=count, **values)
+
+    def test_carried_load_is_subtracted(self):
+        Truck.objects.filter(pk=self.trucks[0].pk).update(pallet_capacity=4)
+        Truck.objects.filter(pk__in=[self.trucks[1].pk, self.trucks[2].pk]).update(pallet_capacity=1)
+        # Грузовик уже везет 3 паллеты заказа вне рейса
+        self.pallets(3, status="processing", driver=self.drivers[0], truck=self.trucks[0])
+        order = self.pallets(2, status="accepted")
+
+        trips_planned, unplanned = trips.make_plan()
+
+        self.assertEqual(trips_planned, [])
+        self.assertEqual([item.pk for item in unplanned], [order.pk])
+
+    def test_apply_does_not_overbook(self):
+        Truck.objects.filter(pk=self.trucks[0].pk).update(pallet_capacity=4)
+        Truck.objects.filter(pk__in=[self.trucks[1].pk, self.trucks[2].pk]).update(is_active=False)
+        self.pallets(3, status="accepted", driver=self.drivers[0], truck=self.trucks[0])
+        # Грузовик уже везет 3 паллеты: apply сверяет план с загрузкой под блокировкой
+        self.pallets(3, status="processing", driver=self.drivers[0], truck=self.trucks[0])
+
+        result = trips.apply()
+
+        self.assertEqual(result["trips"], [])
+        self.assertEqual(len(result["unplanned"]), 1)
+        self.assertFalse(Trip.objects.exists())
+
+    def test_engaged_driver_keeps_truck(self):
+        Truck.objects.filter(pk=self.trucks[1].pk).update(is_active=False)
+        Driver.objects.filter(pk=self.drivers[2].pk).update(is_active=False)
+        # Водитель 1 в этот день уже возит заказ на грузовике 0
+        self.pallets(1, status="processing", driver=self.drivers[1], truck=self.trucks[0])
+        self.pallets(1, status="accepted")
+        self.pallets(1, status="accepted")
+
+        trips_planned, unplanned = trips.make_plan()
+
+        self.assertEqual(unplanned, [])
+        crews = {trip.truck.id: trip.driver.id for trip in trips_planned}
+        self.assertEqual(crews, {self.trucks[0].id: self.drivers[1].id, self.trucks[2].id: self.drivers[0].id})
+        loads = {item["truck"]["id"]: item["load"]["pallets"] for item in trips.describe(trips_planned, [])["trips"]}
+        self.assertEqual(loads, {self.trucks[0].id: 2, self.trucks[2].id: 1})
+
+    def test_plan_and_apply_endpoints(self):
+        first = self.pallets(1, status="accepted", telegram_user_id=101)
+        second = self.pallets(1, status="accepted", warehouse=first.warehouse, telegram_user_id=101)
+
+        response = self.client.post(reverse("orders:trips-plan"), {}, content_type="application/json")
+        self.assertEqual(response.json()["trips_count"], 1)
+        self.assertFalse(Trip.objects.exists())
+
+        with mock.patch.object(trips, "post_to_bot") as post, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("orders:trips-apply"), {}, content_type="application/json")
+
+        trip = Trip.objects.get()
+        self.assertEqual(response.json()["trips"][0]["id"], trip.id)
+        self.assertEqual(set(Order.objects.values_list("trip_id", flat=True)), {trip.id})
+        payloads = [call.args for call in post.call_args_list]
+        self.assertEqual([path for path, _ in payloads], ["/api/send_notification", "/api/send_user_notification"])
+        self.assertEqual(payloads[0][1]["notification_type"], "trip_planned")
+        self.assertEqual(
+            sorted(payloads[1][1]["sequence_numbers"]), sorted([first.sequence_number, second.sequence_number])
+        )
+
+
+class DispatchTests(TestCase):
+    def setUp(self):
+        self.drivers, self.trucks = create_crews(1)
+
+    def test_plan_does_not_write(self):
+        first = create_order()
+        create_order(warehouse=first.warehouse)
+
+        response = self.client.post(reverse("orders:dispatch-plan"), {}, content_type="application/json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["assigned_count"], 2)
+        self.assertFalse(Order.objects.exclude(status="new").exists())
+
+    def test_max_orders_per_crew(self):
+        first = create_order()
+        for _ in range(2):
+            create_order(warehouse=first.warehouse)
+
+        result = dispatch.apply(max_orders=2)
+
+        self.assertEqual(result["assigned_count"], 2)
+        self.assertEqual(len(result["unassigned"]), 1)
+        self.assertEqual(Order.objects.filter(status="accepted", driver=self.drivers[0]).count(), 2)
+
+    def test_apply_notifies_each_order(self):
+        first = create_order(telegram_user_id=101)
+        second = create_order(warehouse=first.warehouse, telegram_user_id=102)
+        create_order(warehouse=first.warehouse)
+
+        with mock.patch.object(notifications, "post_to_bot") as post, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("orders:dispatch-apply"), {}, content_type="application/json")
+
+        self.assertEqual(response.json()["assigned_count"], 3)
+        payloads = {}
+        for (path, payload), _ in post.call_args_list:
+            payloads.setdefault(path, []).append(payload)
+        self.assertEqual(
+            sorted(payload["order_id"] for payload in payloads["/api/send_notification"]),
+            sorted(str(order.pk) for order in Order.objects.all()),
+        )
+        self.assertEqual(
+            sorted((payload["telegram_user_id"], payload["sequence_number"])
+                   for payload in payloads["/api/send_user_notification"]),
+            [(101, first.sequence_number), (102, second.sequence_number)],
+        )
+        self.assertEqual(payloads["/api/send_user_notification"][0]["notification_type"], "order_accepted")
+
+
+class SparseFieldsTests(TestCase):
+    def setUp(self):
+        self.drivers, self.trucks = create_crews(1)
+        self.order = create_order(driver=self.drivers[0], truck=self.trucks[0], status="accepted")
+
+    def list_queries(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("orders:order-list"), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), [query["sql"] for query in queries.captured_queries]
+
+    def test_fields_limit_response_and_columns(self):
+        data, queries = self.list_queries(fields="id,status,client_info")
+
+        self.assertEqual(data, [{
+            "id": str(self.order.pk),
+            "status": "accepted",
+            "client_info": {
+                "company_name": "", "client_name": "Клиент", "email": "", "phone": "+79990000000",
+            },
+        }])
+        self.assertFalse(any('"pickup_address"' in sql for sql in queries))
+        self.assertFalse(any('"orders_driver"' in sql for sql in queries))
+
+    def test_list_queries_do_not_grow_with_rows(self):
+        _, queries = self.list_queries()
+        for _ in range(3):
+            create_order(warehouse=self.order.warehouse, driver=self.drivers[0], truck=self.trucks[0])
+
+        data, more_queries = self.list_queries()
+
+        self.assertEqual(len(data), 4)
+        self.assertEqual(len(more_queries), len(queries))
+        self.assertEqual(data[0]["driver"]["id"], self.drivers[0].id)
+
+    def test_retrieve_fields(self):
+        response = self.client.get(
+            reverse("orders:order-detail", kwargs={"pk": self.order.pk}), {"fields": "id,driver"}
+        )
+
+        self.assertEqual(set(response.json()), {"id", "driver"})
+        self.assertEqual(response.json()["driver"]["full_name"], self.drivers[0].full_name)
+
+
+@skipUnless(renderers.orjson, "orjson не установлен")
+class FastJSONTests(TestCase):
+    payload = {
+        "id": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+        "price": Decimal("1250.50"),
+        "at": datetime.datetime(2024, 3, 1, 9, 30, tzinfo=datetime.timezone.utc),
+        "precise": datetime.datetime(2024, 3, 1, 9, 30, 5, 120000, tzinfo=datetime.timezone.utc),
+        "naive": datetime.datetime(2024, 3, 1, 9, 30),
+        "moscow": datetime.datetime(2024, 3, 1, 12, 30, tzinfo=datetime.timezone(datetime.timedelta(hours=3))),
+        "day": datetime.date(2024, 3, 1),
+        "time": datetime.time(9, 30, 5),
+        "text": "Коледино\u2028склад",
+        1: None,
+    }
+
+    def test_output_matches_json_renderer(self):
+        self.assertEqual(renderers.FastJSONRenderer().render(self.payload), JSONRenderer().render(self.payload))
+
+    def test_order_list_matches_json_renderer(self):
+        drivers, trucks = create_crews(1)
+        create_order(driver=drivers[0], truck=trucks[0], status="accepted", total_price=Decimal("990.00"))
+
+        response = self.client.get(reverse("orders:order-list"))
+
+        self.assertEqual(response.content, JSONRenderer().render(response.data))
+
+    def test_fallback_without_orjson(self):
+        with mock.patch.object(renderers, "orjson", None):
+            body = renderers.FastJSONRenderer().render(self.payload)
+            parsed = renderers.FastJSONParser().parse(io.BytesIO(b'{"a": [1, 2.5]}'))
+
+        self.assertEqual(body, JSONRenderer().render(self.payload))
+        self.assertEqual(parsed, {"a": [1, 2.5]})
+
+    def test_parser(self):
+        parser = renderers.FastJSONParser()
+
+        self.assertEqual(parser.parse(io.BytesIO('{"name": "Клиент"}'.encode())), {"name": "Клиент"})
+        for body in (b"{", b'{"a": NaN}'):
+            with self.assertRaises(ParseError):
+                parser.parse(io.BytesIO(body))
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.order = create_order()
+        self.detail_url = reverse("orders:order-detail", kwargs={"pk": self.order.pk})
+        self.list_url = reverse("orders:order-list")
+
+    def revalidate(self, url, etag, **params):
+        return self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+
+    def test_detail_not_modified_until_changed(self):
+        etag = self.client.get(self.detail_url)["ETag"]
+
+        response = self.revalidate(self.detail_url, etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+        self.order.update_versioned({"status": "processing"})
+        response = self.revalidate(self.detail_url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.json()["status"], "processing")
+
+    def test_fields_are_part_of_etag(self):
+        etag = self.client.get(self.detail_url)["ETag"]
+
+        self.assertEqual(self.revalidate(self.detail_url, etag, fields="id").status_code, 200)
+
+    def test_list_changes_on_create_and_delete(self):
+        etag = self.client.get(self.list_url)["ETag"]
+        self.assertEqual(self.revalidate(self.list_url, etag).status_code, 304)
+
+        create_order(warehouse=self.order.warehouse)
+        response = self.revalidate(self.list_url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 2)
+
+        # Удаление старого заказа не меняет max(updated_at), но меняет число заказов
+        etag = response["ETag"]
+        Order.objects.filter(pk=self.order.pk).delete()
+        self.assertEqual(self.revalidate(self.list_url, etag).status_code, 200)
+
+    def test_reference_list_not_modified(self):
+        url = reverse("orders:warehouse-list")
+        etag = self.client.get(url)["ETag"]
+
+        self.assertEqual(self.revalidate(url, etag).status_code, 304)
+
+
+class OrderChangesTests(TestCase):
+    def setUp(self):
+        self.order = create_order()
+        self.others = [create_order(warehouse=self.order.warehouse) for _ in range(2)]
+        # Заказы сохранены давно: курсор после них не откатывается на SYNC_LAG
+        Order.objects.update(updated_at=timezone.now() - datetime.timedelta(hours=1))
+
+    def changes(self, **params):
+        response = self.client.get(reverse("orders:order-changes"), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_pages_and_updates_after_cursor(self):
+        first = self.changes(limit=2)
+        self.assertEqual(len(first["changes"]), 2)
+        self.assertTrue(first["has_more"])
+
+        second = self.changes(since=first["cursor"], limit=2)
+        self.assertFalse(second["has_more"])
+        ids = {item["id"] for item in first["changes"] + second["changes"]}
+        self.assertEqual(ids, {str(order.pk) for order in [self.order, *self.others]})
+
+        self.assertEqual(self.changes(since=second["cursor"])["changes"], [])
+        self.order.update_versioned({"status": "processing"})
+        third = self.changes(since=second["cursor"], fields="id,status")
+        self.assertEqual(third["changes"], [{"id": str(self.order.pk), "status": "processing"}])
+
+    def test_tombstones(self):
+        cursor = self.changes()["cursor"]
+        deleted_id = str(self.others[0].pk)
+        self.others[0].delete()
+        Order.objects.filter(pk=self.order.pk).update(status="completed")
+        archive.archive_batch(timezone.now() + datetime.timedelta(days=1), 10)
+
+        result = self.changes(since=cursor)
+
+        self.assertEqual(result["changes"], [])
+        self.assertEqual(
+            sorted((item["id"], item["type"]) for item in result["deleted"]),
+            sorted([(deleted_id, "deleted"), (str(self.order.pk), "archived")]),
+        )
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse("orders:order-changes"), {"since": "not-a-cursor"})
+
+        self.assertEqual(response.status_code, 400)
+
+
+class BulkStatusTests(TestCase):
+    def post(self, body):
+        with mock.patch("orders.views.post_to_bot") as post, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("orders:bulk-status"), body, content_type="application/json")
+        return response, post
+
+    def test_allowed_transitions_applied_others_skipped(self):
+        new = create_order()
+        processing = create_order(warehouse=new.warehouse, status="processing")
+        completed = create_order(warehouse=new.warehouse, status="completed")
+        missing = uuid.uuid4()
+        ids = [new.pk, processing.pk, completed.pk, missing, new.pk]
+
+        response, post = self.post({"ids": [str(pk) for pk in ids], "status": "canceled", "reason": "Дубль"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["updated"], [str(new.pk), str(processing.pk)])
+        self.assertEqual(
+            [(item["id"], item["status"]) for item in response.json()["skipped"]],
+            [(str(missing), None), (str(completed.pk), "completed")],
+        )
+        statuses = dict(Order.objects.values_list("pk", "status"))
+        self.assertEqual(statuses, {new.pk: "canceled", processing.pk: "canceled", completed.pk: "completed"})
+        self.assertEqual(Order.objects.get(pk=new.pk).version, new.version + 1)
+        events = OrderEvent.objects.filter(type="status_changed", to_status="canceled")
+        self.assertEqual(sorted(event.data["reason"] for event in events), ["Дубль", "Дубль"])
+        self.assertEqual(stats.reconcile(dry_run=True), [])
+        post.assert_called_once()
+        self.assertEqual(
+            post.call_args.args[1]["sequence_numbers"], sorted([new.sequence_number, processing.sequence_number])
+        )
+
+    def test_invalid_request(self):
+        order = create_order()
+
+        for body in ({"ids": [str(order.pk)], "status": "new"}, {"ids": [], "status": "canceled"}):
+            response, post = self.post(body)
+            self.assertEqual(response.status_code, 400)
+            post.assert_not_called()
+        self.assertEqual(Order.objects.get(pk=order.pk).status, "new")
+
+
+class BulkAssignTests(TestCase):
+    def setUp(self):
+        self.drivers, self.trucks = create_crews(2)
+
+    def post(self, orders, **values):
+        body = {
+            "ids": [str(order.pk) for order in orders],
+            "driver_id": self.drivers[0].id,
+            "truck_id": self.trucks[0].id,
+            **values,
+        }
+        with mock.patch("orders.views.post_to_bot") as post, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("orders:bulk-assign"), body, content_type="application/json")
+        return response, post
+
+    def test_assigns_and_notifies_once_per_user(self):
+        first = create_order(telegram_user_id=101)
+        second = create_order(warehouse=first.warehouse, telegram_user_id=101)
+        accepted = create_order(warehouse=first.warehouse, status="accepted", driver=self.drivers[1])
+        processing = create_order(warehouse=first.warehouse, status="processing")
+
+        response, post = self.post([first, second, accepted, processing])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["updated"], [str(first.pk), str(second.pk), str(accepted.pk)])
+        self.assertEqual([item["id"] for item in response.json()["skipped"]], [str(processing.pk)])
+        assigned = Order.objects.filter(driver=self.drivers[0], truck=self.trucks[0], status="accepted")
+        self.assertEqual(assigned.count(), 3)
+        calls = [call.args for call in post.call_args_list]
+        self.assertEqual([path for path, _ in calls], ["/api/send_notification", "/api/send_user_notification"])
+        self.assertEqual(calls[0][1]["notification_type"], "orders_assigned")
+        self.assertEqual(calls[1][1]["sequence_numbers"], sorted([first.sequence_number, second.sequence_number]))
+
+    def test_expected_status(self):
+        new = create_order()
+        accepted = create_order(warehouse=new.warehouse, status="accepted", driver=self.drivers[1])
+
+        response, _ = self.post([new, accepted], expected_status="new")
+
+        self.assertEqual(response.json()["updated"], [str(new.pk)])
+        self.assertEqual(Order.objects.get(pk=accepted.pk).driver_id, self.drivers[1].id)
+
+    def test_capacity_is_checked_for_all_orders(self):
+        Truck.objects.filter(pk=self.trucks[0].pk).update(pallet_capacity=3)
+        orders = [create_order(cargo_type="pallet", box_count=0, pallet_count=2) for _ in range(2)]
+
+        response, post = self.post(orders)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.filter(truck__isnull=False).exists())
+        post.assert_not_called()
+
+
+class ImportTests(TestCase):
+    def setUp(self):
+        self.warehouse = create_order().warehouse
+        self.url = reverse("orders:order-import")
+
+    def test_csv_body(self):
+        body = (
+            "warehouse_id;client_name;phone_number;box_count;pallet_count\n"
+            f"{self.warehouse.id};ООО Ромашка;+79990000001;3;\n"
+            f"{self.warehouse.id};Иванов;;1;\n"
+            f"{self.warehouse.id};Петров;+79990000002;;2\n"
+        ).encode("cp1251")
+        last_number = Order.objects.get().sequence_number
+
+        # Пачки по одной строке: номера выделяются на каждую пачку
+        with mock.patch.object(imports, "CHUNK_SIZE", 1):
+            response = self.client.post(self.url, body, content_type="text/csv")
+
+        result = response.json()
+        self.assertEqual((result["total"], result["created"], result["failed"]), (3, 2, 1))
+        self.assertEqual([row["row"] for row in result["rows"]], [2, 3, 4])
+        self.assertEqual(result["rows"][1]["errors"], {"phone_number": "Обязательное поле"})
+        created_ids = [result["rows"][0]["id"], result["rows"][2]["id"]]
+        created = Order.objects.filter(pk__in=created_ids).order_by("sequence_number")
+        self.assertEqual([order.client_name for order in created], ["ООО Ромашка", "Петров"])
+        self.assertEqual([order.sequence_number for order in created], [last_number + 1, last_number + 2])
+        self.assertEqual([order.cargo_type for order in created], ["box", "pallet"])
+        for order in created:
+            self.assertEqual(order.total_price, order.calculate_price())
+        self.assertEqual(OrderEvent.objects.filter(type="created", data__import=True).count(), 2)
+        self.assertEqual(stats.reconcile(dry_run=True), [])
+
+    def test_ndjson_file_dry_run(self):
+        lines = [
+            {"warehouse_id": self.warehouse.id, "client_name": "Клиент", "phone_number": "+7", "box_count": 1},
+            "{broken",
+            {"warehouse_id": 999999, "client_name": "Клиент", "phone_number": "+7", "box_count": 1},
+        ]
+        content = "\n".join(line if isinstance(line, str) else json.dumps(line) for line in lines)
+        upload = SimpleUploadedFile("orders.ndjson", content.encode(), content_type="application/octet-stream")
+
+        response = self.client.post(f"{self.url}?dry_run=true", {"file": upload})
+
+        result = response.json()
+        self.assertEqual([row["status"] for row in result["rows"]], ["valid", "error", "error"])
+        self.assertIn("row", result["rows"][1]["errors"])
+        self.assertEqual(result["rows"][2]["errors"], {"warehouse_id": "Склад не найден"})
+        self.assertEqual(result["created"], 0)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_unknown_format(self):
+        upload = SimpleUploadedFile("orders.xlsx", b"", content_type="application/vnd.ms-excel")
+
+        response = self.client.post(self.url, {"file": upload})
+
+        self.assertEqual(response.status_code, 400)
+
+
+class IdempotencyKeyTests(TestCase):
+    def setUp(self):
+        self.warehouse = create_order().warehouse
+        Order.objects.all().delete()
+        patcher = mock.patch("orders.views.notify_order_created")
+        self.notify = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def body(self, box_count=2):
+        return {
+            "delivery": {"warehouse_id": self.warehouse.id},
+            "cargo": {"cargo_type": "box", "box_count": box_count},
+            "client": {"name": "Клиент", "phone": "+79990000000"},
+        }
+
+    def create(self, body, key=None):
+        headers = {"HTTP_IDEMPOTENCY_KEY": key} if key is not None else {}
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse("api_order"), body, content_type="application/json", **headers)
+
+    def test_replay_returns_first_response(self):
+        first = self.create(self.body(), key="order-1")
+        second = self.create(self.body(), key="order-1")
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.assertNotIn("Idempotent-Replayed", first)
+        self.assertEqual(Order.objects.count(), 1)
+        self.notify.assert_called_once()
+
+    def test_same_key_with_other_body(self):
+        self.create(self.body(), key="order-1")
+
+        response = self.create(self.body(box_count=5), key="order-1")
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(Order.objects.get().box_count, 2)
+
+    def test_client_error_is_replayed(self):
+        body = {**self.body(), "delivery": {"warehouse_id": 999999}}
+
+        self.assertEqual(self.create(body, key="order-2").status_code, 400)
+        response = self.create(body, key="order-2")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response["Idempotent-Replayed"], "true")
+
+    def test_without_key_and_invalid_key(self):
+        self.create(self.body())
+        self.create(self.body())
+        self.assertEqual(Order.objects.count(), 2)
+
+        response = self.create(self.body(), key="x" * 300)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Order.objects.count(), 2)
+
+
+class OrderListFilterTests(TestCase):
+    def test_status_filter_accepts_every_status(self):
+        accepted = create_order(status="accepted")
+        create_order(status="rejected")
+        url = reverse("orders:order-list")
+
+        for value, _ in Order.STATUS_CHOICES:
+            self.assertEqual(self.client.get(url, {"status": value}).status_code, 200, value)
+        response = self.client.get(url, {"status": "accepted", "fields": "id,status"})
+
+        self.assertEqual(response.json(), [{"id": str(accepted.pk), "status": "accepted"}])
+
+    def test_invalid_filters(self):
+        url = reverse("orders:order-list")
+
+        self.assertEqual(self.client.get(url, {"status": "unknown"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"warehouse_id": "abc"}).status_code, 400)
+
+
+class ShiftOverlapTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(schedule, "calendar", schedule.Calendar())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.drivers, _ = create_crews(2)
+        self.day = timezone.make_aware(datetime.datetime(2030, 5, 6))
+
+    def at(self, hour):
+        return self.day + datetime.timedelta(hours=hour)
+
+    def create_shift(self, driver, start, end):
+        return self.client.post(
+            reverse("orders:drivershift-list"),
+            {"driver": driver.id, "starts_at": self.at(start).isoformat(), "ends_at": self.at(end).isoformat()},
+            content_type="application/json",
+        )
+
+    def test_overlap_is_rejected(self):
+        self.assertEqual(self.create_shift(self.drivers[0], 10, 12).status_code, 201)
+
+        response = self.create_shift(self.drivers[0], 11, 13)
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.create_shift(self.drivers[0], 12, 13).status_code, 201)
+        self.assertEqual(self.create_shift(self.drivers[1], 11, 13).status_code, 201)
+
+    def test_check_ignores_stale_calendar(self):
+        moved = DriverShift.objects.create(driver=self.drivers[0], starts_at=self.at(8), ends_at=self.at(9))
+        DriverShift.objects.create(driver=self.drivers[1], starts_at=self.at(8), ends_at=self.at(9))
+        schedule.calendar.sync()
+        # Изменение зафиксировано с опозданием: updated_at раньше последнего,
+        # сверка календаря его не замечает
+        DriverShift.objects.filter(pk=moved.pk).update(
+            starts_at=self.at(14), ends_at=self.at(16), updated_at=moved.updated_at
+        )
+        self.assertNotIn(self.drivers[0].id, schedule.busy_drivers(self.at(14), self.at(15)))
+
+        response = self.create_shift(self.drivers[0], 14, 15)
+
+        self.assertEqual(response.status_code, 409)
+
+    def test_moving_shift_checks_other_shifts_only(self):
+        shift_id = self.create_shift(self.drivers[0], 10, 12).json()["id"]
+        self.create_shift(self.drivers[0], 14, 16)
+        url = reverse("orders:drivershift-detail", kwargs={"pk": shift_id})
+
+        def move(start, end):
+            return self.client.patch(
+                url,
+                {"starts_at": self.at(start).isoformat(), "ends_at": self.at(end).isoformat()},
+                content_type="application/json",
+            )
+
+        self.assertEqual(move(11, 13).status_code, 200)
+        self.assertEqual(move(13, 15).status_code, 409)
+        self.assertEqual(DriverShift.objects.get(pk=shift_id).ends_at, self.at(13))
+
+
+class AvailabilityTests(TestCase):
+    def available_ids(self, name, **params):
+        response = self.client.get(reverse(name), {"available": "true", **params})
+        self.assertEqual(response.status_code, 200)
+        return {item["id"] for item in response.json()}
+
+    def test_open_orders_of_earlier_days_keep_crew_busy(self):
+        drivers, trucks = create_crews(4)
+        now = timezone.now()
+        stale = create_order(status="accepted", driver=drivers[0], truck=trucks[0])
+        done = create_order(status="completed", driver=drivers[1], truck=trucks[1])
+        later = create_order(status="processing", driver=drivers[2], truck=trucks[2])
+        Order.objects.filter(pk__in=[stale.pk, done.pk]).update(created_at=now - datetime.timedelta(days=2))
+        Order.objects.filter(pk=later.pk).update(created_at=now + datetime.timedelta(days=2))
+
+        self.assertEqual(self.available_ids("orders:driver-list"), {driver.id for driver in drivers[1:]})
+        self.assertEqual(self.available_ids("orders:truck-list"), {truck.id for truck in trucks[1:]})
+        future = (now + datetime.timedelta(days=2)).date().isoformat()
+        self.assertEqual(self.available_ids("orders:driver-list", at=future), {drivers[1].id, drivers[3].id})
+
+    def test_trip_and_shift_make_driver_busy(self):
+        drivers, trucks = create_crews(3)
+        order = create_order()
+        today = timezone.localdate()
+        Trip.objects.create(warehouse=order.warehouse, date=today, driver=drivers[0], truck=trucks[0])
+        start = loading.day_bounds(today)[0]
+        hours = datetime.timedelta(hours=1)
+        DriverShift.objects.create(driver=drivers[1], starts_at=start + 9 * hours, ends_at=start + 12 * hours)
+
+        with mock.patch.object(schedule, "calendar", schedule.Calendar()):
+            self.assertEqual(self.available_ids("orders:driver-list"), {drivers[2].id})
+            window = {
+                "from": (start + 13 * hours).isoformat(),
+                "to": (start + 15 * hours).isoformat(),
+            }
+            self.assertEqual(self.available_ids("orders:driver-list", **window), {drivers[1].id, drivers[2].id})
+        self.assertEqual(self.available_ids("orders:truck-list"), {trucks[1].id, trucks[2].id})
+
+    def test_invalid_day(self):
+        response = self.client.get(reverse("orders:driver-list"), {"available": "true", "at": "завтра"})
+
+        self.assertEqual(response.status_code, 400)
+
+
+class OrderSaveTests(TestCase):
+    def test_unchanged_save_skips_stats_and_events(self):
+        order = Order.objects.get(pk=create_order().pk)
+
+        with CaptureQueriesContext(connection) as queries:
+            order.save()
+
+        tables = (DailyWarehouseStats._meta.db_table, OrderEvent._meta.db_table)
+        self.assertFalse([query["sql"] for query in queries if any(table in query["sql"] for table in tables)])
+
+    def test_stats_row_is_created_once_per_day(self):
+        first = create_order()
+        second = create_order(warehouse=first.warehouse, box_count=3)
+
+        row = DailyWarehouseStats.objects.get(warehouse=first.warehouse)
+        self.assertEqual((row.orders_count, row.box_count), (2, 5))
+        second.set_status("canceled")
+        second.save()
+        row.refresh_from_db()
+        self.assertEqual((row.orders_count, row.canceled_count, row.box_count), (2, 1, 2))
+        self.assertEqual(stats.reconcile(dry_run=True), [])
+
+    def test_sequence_number_continues_after_archive(self):
+        first = create_order(status="completed")
+        archive.archive_batch(timezone.now() + datetime.timedelta(days=1), 10)
+
+        second = create_order(warehouse=first.warehouse)
+
+        self.assertGreater(second.sequence_number, first.sequence_number)
+
+
+class LeadTimeTests(TestCase):
+    def setUp(self):
+        start = timezone.now().replace(microsecond=0) - datetime.timedelta(hours=1)
+        for accepted_after, completed_after in ((60, 360), (120, None)):
+            order = create_order()
+            order.update_versioned({"status": "accepted"})
+            if completed_after:
+                order.update_versioned({"status": "completed"})
+            events = OrderEvent.objects.filter(order_id=order.pk)
+            events.filter(type="created").update(at=start)
+            events.filter(to_status="accepted").update(at=start + datetime.timedelta(seconds=accepted_after))
+            if completed_after:
+                events.filter(to_status="completed").update(at=start + datetime.timedelta(seconds=completed_after))
+
+    def get_stages(self):
+        response = self.client.get(reverse("orders:order-lead-times"))
+        self.assertEqual(response.status_code, 200)
+        return response.json()["stages"]
+
+    def test_lead_times(self):
+        seconds = ("avg_seconds", "min_seconds", "max_seconds")
+        expected = [
+            {"from": "new", "to": "accepted", "orders": 2, **dict(zip(seconds, (90.0, 60.0, 120.0)))},
+            {"from": "accepted", "to": "completed", "orders": 1, **dict(zip(seconds, (300.0, 300.0, 300.0)))},
+        ]
+
+        self.assertEqual(self.get_stages(), expected)
+        # СУБД без SQL-расчета считает то же на Python
+        with mock.patch.dict(stats._SECONDS_BETWEEN, clear=True):
+            self.assertEqual(self.get_stages(), expected)
+
+
+class RejectOrderTests(TestCase):
+    def reject(self, order, **data):
+        return self.client.post(
+            reverse("orders:reject-order", kwargs={"order_id": order.pk}), data, content_type="application/json"
+        )
+
+    def test_reject_new_order(self):
+        order = create_order()
+
+        response = self.reject(order, reason="Нет машин")
+
+        self.assertEqual(response.status_code, 200)
+        order.refresh_from_db()
+        self.assertEqual(order.status, "rejected")
+        event = OrderEvent.objects.get(order_id=order.pk, type="status_changed", to_status="rejected")
+        self.assertEqual(event.data.get("reason"), "Нет машин")
+
+    def test_reject_only_new_order(self):
+        order = create_order(status="accepted")
+
+        response = self.reject(order)
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["status"], "accepted")
+        order.refresh_from_db()
+        self.assertEqual(order.status, "accepted")
+        self.assertFalse(OrderEvent.objects.filter(order_id=order.pk, to_status="rejected").exists())
+
+
+class StreamResumeTests(TestCase):
+    def setUp(self):
+        self.order = create_order()
+        self.other = create_order()
+        self.last_event_id = OrderEvent.objects.order_by("-pk").values_list("pk", flat=True).first()
+
+    def test_missed_tombstones_are_replayed(self):
+        warehouse_id = self.order.warehouse_id
+        self.order.update_versioned({"status": "completed"})
+        self.order.refresh_from_db()
+        archive.archive_batch(timezone.now() + datetime.timedelta(days=1), 10)
+        self.other.delete()
+
+        missed = stream.load_missed(self.last_event_id, {warehouse_id})
+
+        self.assertEqual([message["type"] for message in missed], ["status_changed", "archived"])
+        self.assertTrue(all(message["warehouse_id"] == warehouse_id for message in missed))
+        deleted = stream.load_missed(self.last_event_id, {self.other.warehouse_id})
+        self.assertEqual([message["type"] for message in deleted], ["deleted"])
+
+    def test_deleted_event_is_published(self):
+        warehouse_id = self.order.warehouse_id
+        with mock.patch.object(pubsub.broker, "publish") as publish, self.captureOnCommitCallbacks(execute=True):
+            self.order.delete()
+
+        (messages,), _ = publish.call_args
+        self.assertEqual([message["type"] for message in messages], ["deleted"])
+        self.assertEqual(messages[0]["warehouse_id"], warehouse_id)
+
+
+class StreamAppTests(TransactionTestCase):
+    """
+    Лента по Last-Event-ID дочитывает пропущенное из журнала
+    """
+
+    def test_resume_from_last_event_id(self):
+        order = create_order()
+        last_event_id = OrderEvent.objects.order_by("-pk").values_list("pk", flat=True).first()
+        order.update_versioned({"status": "processing"})
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "query_string": f"warehouse_id={order.warehouse_id}".encode(),
+            "headers": [(b"last-event-id", str(last_event_id).encode())],
+        }
+
+        async def run():
+            chunks = []
+            received = asyncio.Event()
+
+            async def receive():
+                await received.wait()
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                chunks.append(message.get("body", b""))
+                if b"event: status_changed" in chunks[-1]:
+                    received.set()
+
+            await asyncio.wait_for(stream.OrderStreamApp()(scope, receive, send), timeout=10)
+            return b"".join(chunks)
+
+        body = asyncio.run(run())
+
+        self.assertIn(b"event: status_changed", body)
+        self.assertNotIn(f"id: {last_event_id}\n".encode(), body)
+
+
+class StreamListenTests(TransactionTestCase):
+    """
+    События от других процессов приходят через NOTIFY и поток LISTEN
+    """
+
+    def setUp(self):
+        if connection.vendor != "postgresql":
+            self.skipTest("LISTEN/NOTIFY есть только в PostgreSQL")
+
+    def test_notify_reaches_subscriber(self):
+        order = create_order()
+
+        def change_status():
+            try:
+                Order.objects.get(pk=order.pk).update_versioned({"status": "processing"})
+            finally:
+                connection.close()
+
+        async def receive():
+            subscription = pubsub.broker.subscribe({order.warehouse_id})
+            try:
+                # Поток LISTEN подключается не сразу: событие, отправленное
+                # до LISTEN, не дойдет, поэтому статус меняется, пока оно не придет
+                for _ in range(20):
+                    await asyncio.to_thread(change_status)
+                    try:
+                        return await asyncio.wait_for(subscription.queue.get(), timeout=0.5)
+                    except asyncio.TimeoutError:
+                        continue
+                return None
+            finally:
+                pubsub.broker.unsubscribe(subscription)
+
+        message = asyncio.run(receive())
+
+        self.assertIsNotNone(message)
+        self.assertEqual(message["type"], "status_changed")
+        self.assertEqual(message["order_id"], str(order.pk))
+        self.assertEqual(message["warehouse_id"], order.warehouse_id)
+        # Без подписчиков поток закрывает соединение с базой
+        listener = pubsub.broker._listener
+        if listener is not None:
+            listener.join(timeout=15)
+            self.assertFalse(listener.is_alive())
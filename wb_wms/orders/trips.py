@@ -0,0 +1,408 @@
+"""
+Планирование рейсов: принятые заказы без рейса объединяются в рейсы
+по складу назначения и дню забора.
+
+Заказы одного склада и дня раскладываются по рейсам методом First Fit
+Decreasing: по убыванию нагрузки (см. orders/loading.py) каждый заказ
+кладется в первый рейс, где помещается, а если такого нет — открывается
+новый рейс на самом вместительном свободном грузовике. После раскладки
+каждый рейс пересаживается на самый маленький свободный грузовик, в который
+он помещается, — крупные грузовики остаются следующим группам. Группы
+обрабатываются по убыванию общей нагрузки.
+
+Экипаж рейса — один водитель и один грузовик; за день экипаж делает один
+рейс; водители со сменами в календаре (orders/schedule.py) в этот день
+не планируются. Водителем рейса становится водитель, за которым уже числится
+больше всего его заказов, если он свободен. Уведомления отправляются
+на рейс: одно администраторам и одно каждому клиенту рейса.
+
+Заказы в работе вне плана (принятые и в обработке с грузовиком, но без
+рейса или вне выборки) остаются на своих грузовиках: их нагрузка за день
+вычитается из вместимости грузовика, а рейс на таком грузовике достается
+одному из его водителей — на другие грузовики они в этот день не садятся.
+apply читает эту нагрузку после блокировки парка (см. orders/loading.py),
+поэтому параллельное назначение не перегрузит грузовик.
+"""
+import logging
+import math
+import time
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import loading, schedule
+from .models import Driver, Order, Trip, Truck
+from .notifications import post_to_bot
+
+logger = logging.getLogger(__name__)
+
+# Рейсы, которые занимают экипаж на день
+BUSY_STATUSES = ("planned", "in_progress")
+
+ORDER_FIELDS = (
+    "id",
+    "sequence_number",
+    "telegram_user_id",
+    *Order.TRACKED_FIELDS,
+    *loading.LOAD_FIELDS,
+)
+
+
+class Vehicle:
+    """
+    Грузовик на день: вместимость, нагрузка заказами вне плана, остаток
+    вместимости и ключ сортировки по нему, посчитанные один раз
+    """
+
+    def __init__(self, truck, carried=loading.EMPTY):
+        self.truck = truck
+        self.capacity = loading.capacity(truck)
+        self.carried = carried
+        self.limits = tuple(
+            None if limit is None else max(limit - value, 0) for limit, value in zip(self.capacity, carried)
+        )
+        # Без ограничения — больше всех
+        self.size = tuple(math.inf if limit is None else limit for limit in self.limits)
+
+
+class PlannedTrip:
+    """
+    Рейс в плане: склад, день, экипаж, заказы и их суммарная нагрузка
+    """
+
+    def __init__(self, warehouse_id, day, vehicle):
+        self.warehouse_id = warehouse_id
+        self.day = day
+        self.vehicle = vehicle
+        self.driver = None
+        # id записи Trip после сохранения плана
+        self.id = None
+        self.orders = []
+        self.load = loading.EMPTY
+
+    @property
+    def truck(self):
+        return self.vehicle.truck
+
+    @property
+    def truck_load(self):
+        """
+        Нагрузка грузовика за день вместе с заказами вне плана
+        """
+        return loading.add(self.vehicle.carried, self.load)
+
+    def add(self, order, load):
+        self.orders.append(order)
+        self.load = loading.add(self.load, load)
+
+
+def candidate_orders(day=None):
+    orders = Order.objects.filter(status="accepted", trip__isnull=True)
+    if day is not None:
+        start, end = loading.day_bounds(day)
+        orders = orders.filter(created_at__gte=start, created_at__lt=end)
+    return orders.only(*ORDER_FIELDS)
+
+
+def busy_crews(days):
+    """
+    Водители и грузовики, занятые рейсами в эти дни: {день: (водители, грузовики)}
+    """
+    busy = defaultdict(lambda: (set(), set()))
+    trips = Trip.objects.filter(date__in=days, status__in=BUSY_STATUSES).values_list(
+        "date", "driver_id", "truck_id"
+    )
+    for day, driver_id, truck_id in trips:
+        busy[day][0].add(driver_id)
+        busy[day][1].add(truck_id)
+    return busy
+
+
+def carried_orders(days, exclude_ids):
+    """
+    Заказы в работе на грузовиках в эти дни, кроме планируемых:
+    нагрузка {день: {truck_id: нагрузка}} и водители {день: {truck_id: Counter(driver_id)}}
+    """
+    loads = defaultdict(lambda: defaultdict(lambda: loading.EMPTY))
+    crews = defaultdict(lambda: defaultdict(Counter))
+    start = loading.day_bounds(min(days))[0]
+    end = loading.day_bounds(max(days))[1]
+    orders = Order.objects.filter(
+        status__in=loading.ACTIVE_STATUSES, truck__isnull=False, created_at__gte=start, created_at__lt=end
+    ).exclude(pk__in=exclude_ids)
+    rows = orders.values_list("truck_id", "driver_id", "created_at", *loading.LOAD_FIELDS)
+    for truck_id, driver_id, created_at, *values in rows:
+        day = timezone.localdate(created_at)
+        if day not in days:
+            continue
+        loads[day][truck_id] = loading.add(loads[day][truck_id], loading.row_load(*values))
+        if driver_id is not None:
+            crews[day][truck_id][driver_id] += 1
+    return loads, crews
+
+
+def pack_group(warehouse_id, day, orders, free_vehicles):
+    """
+    Раскладывает заказы группы по рейсам. free_vehicles — свободные грузовики
+    по убыванию вместимости; занятые рейсами удаляются из списка.
+    Возвращает (рейсы, заказы, которые не поместились ни в один грузовик)
+    """
+    loads = {order.pk: loading.order_load(order) for order in orders}
+    # Нормировка измерений по самому вместительному свободному грузовику
+    scale = [
+        next((vehicle.limits[i] for vehicle in free_vehicles if vehicle.limits[i]), None) or 1
+        for i in range(len(loading.DIMENSIONS))
+    ]
+    orders = sorted(orders, key=lambda order: max(v / s for v, s in zip(loads[order.pk], scale)), reverse=True)
+
+    trips = []
+    unplanned = []
+    for order in orders:
+        load = loads[order.pk]
+        for trip in trips:
+            if loading.fits(trip.load, trip.vehicle.limits, load):
+                trip.add(order, load)
+                break
+        else:
+            vehicle = next((vehicle for vehicle in free_vehicles if loading.fits(load, vehicle.limits)), None)
+            if vehicle is None:
+                unplanned.append(order)
+                continue
+            free_vehicles.remove(vehicle)
+            trip = PlannedTrip(warehouse_id, day, vehicle)
+            trip.add(order, load)
+            trips.append(trip)
+
+    # Рейс пересаживается на самый маленький подходящий грузовик
+    for trip in trips:
+        vehicle = next(
+            (
+                vehicle
+                for vehicle in reversed(free_vehicles)
+                if vehicle.size < trip.vehicle.size and loading.fits(trip.load, vehicle.limits)
+            ),
+            None,
+        )
+        if vehicle is not None:
+            free_vehicles.remove(vehicle)
+            free_vehicles.append(trip.vehicle)
+            free_vehicles.sort(key=lambda vehicle: vehicle.size, reverse=True)
+            trip.vehicle = vehicle
+    return trips, unplanned
+
+
+def assign_drivers(trips, free_drivers, engaged=None):
+    """
+    Назначает водителей рейсам. free_drivers — {id: водитель}, назначенные
+    удаляются. engaged — {truck_id: Counter(driver_id)}: водители, которые
+    в этот день уже возят заказы на грузовике; рейс на таком грузовике
+    достается одному из них, на другие грузовики они не назначаются.
+    Возвращает рейсы, которым не хватило водителя
+    """
+    engaged = engaged or {}
+    pinned = {driver_id for drivers in engaged.values() for driver_id in drivers}
+    left = []
+    for trip in trips:
+        crew = engaged.get(trip.truck.id)
+        if crew:
+            driver_id = next((driver_id for driver_id, _ in crew.most_common() if driver_id in free_drivers), None)
+        else:
+            current = Counter(
+                order.driver_id
+                for order in trip.orders
+                if order.driver_id in free_drivers and order.driver_id not in pinned
+            )
+            if current:
+                driver_id = current.most_common(1)[0][0]
+            else:
+                driver_id = next((driver_id for driver_id in free_drivers if driver_id not in pinned), None)
+        if driver_id is None:
+            left.append(trip)
+            continue
+        trip.driver = free_drivers.pop(driver_id)
+    return left
+
+
+def make_plan(orders=None):
+    """
+    План рейсов: (рейсы, незапланированные заказы)
+    """
+    orders = list(candidate_orders() if orders is None else orders)
+    groups = defaultdict(list)
+    for order in orders:
+        groups[(timezone.localdate(order.created_at), order.warehouse_id)].append(order)
+    if not groups:
+        return [], []
+
+    days = {day for day, _ in groups}
+    busy = busy_crews(days)
+    booked = schedule.busy_by_day(days)
+    carried, engaged = carried_orders(days, [order.pk for order in orders])
+    trucks = list(Truck.objects.filter(is_active=True))
+    drivers = list(Driver.objects.filter(is_active=True).order_by("id"))
+
+    planned = []
+    unplanned = []
+    by_day = defaultdict(list)
+    for (day, warehouse_id), group_orders in groups.items():
+        by_day[day].append((warehouse_id, group_orders))
+    for day, day_groups in sorted(by_day.items()):
+        busy_drivers, busy_trucks = busy[day]
+        busy_drivers = busy_drivers | booked[day]
+        free_drivers = {driver.id: driver for driver in drivers if driver.id not in busy_drivers}
+        # Грузовик с заказами вне плана едет только с одним из своих водителей
+        free_vehicles = sorted(
+            (
+                Vehicle(truck, carried[day][truck.id])
+                for truck in trucks
+                if truck.id not in busy_trucks
+                and (
+                    truck.id not in engaged[day]
+                    or any(driver_id in free_drivers for driver_id in engaged[day][truck.id])
+                )
+            ),
+            key=lambda vehicle: vehicle.size,
+            reverse=True,
+        )
+
+        day_trips = []
+        # Крупные группы первыми получают крупные грузовики
+        day_groups.sort(
+            key=lambda group: loading.add(*(loading.order_load(order) for order in group[1])),
+            reverse=True,
+        )
+        for warehouse_id, group_orders in day_groups:
+            trips, rest = pack_group(warehouse_id, day, group_orders, free_vehicles)
+            day_trips.extend(trips)
+            unplanned.extend(rest)
+        for trip in assign_drivers(day_trips, free_drivers, engaged[day]):
+            day_trips.remove(trip)
+            unplanned.extend(trip.orders)
+        planned.extend(day_trips)
+    return planned, unplanned
+
+
+def describe(trips, unplanned):
+    """
+    Представление плана для API
+    """
+    return {
+        "trips": [
+            {
+                "id": trip.id,
+                "warehouse_id": trip.warehouse_id,
+                "date": trip.day,
+                "driver": {"id": trip.driver.id, "full_name": trip.driver.full_name},
+                "truck": {"id": trip.truck.id, "plate_number": trip.truck.plate_number},
+                "orders": [order.id for order in trip.orders],
+                **loading.describe_load(trip.truck_load, trip.vehicle.capacity),
+            }
+            for trip in trips
+        ],
+        "unplanned": [order.id for order in unplanned],
+        "trips_count": len(trips),
+        "orders_count": sum(len(trip.orders) for trip in trips) + len(unplanned),
+    }
+
+
+def plan(day=None):
+    """
+    Пробный план рейсов без записи в БД
+    """
+    started = time.perf_counter()
+    trips, unplanned = make_plan(candidate_orders(day))
+    result = describe(trips, unplanned)
+    result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+def apply(day=None):
+    """
+    Строит план по заблокированным заказам и записывает его в одной
+    транзакции: рейсы создаются одним INSERT, заказы каждого рейса
+    обновляются пачкой. Уведомления отправляются после фиксации.
+    Грузовики блокируются до чтения заказов и их загрузки: make_plan
+    проверяет вместимость по нагрузке, прочитанной под блокировкой
+    (см. orders/loading.py)
+    """
+    started = time.perf_counter()
+    with transaction.atomic():
+        loading.lock_fleet()
+        orders = list(candidate_orders(day).select_for_update(skip_locked=True))
+        trips, unplanned = make_plan(orders)
+        created = Trip.objects.bulk_create(
+            Trip(warehouse_id=trip.warehouse_id, date=trip.day, driver=trip.driver, truck=trip.truck)
+            for trip in trips
+        )
+        now = timezone.now()
+        for trip, record in zip(trips, created):
+            trip.id = record.id
+            crew = (trip.driver.id, trip.truck.id)
+            kept = [order for order in trip.orders if (order.driver_id, order.truck_id) == crew]
+            reassigned = [order for order in trip.orders if (order.driver_id, order.truck_id) != crew]
+            Order.bulk_update_tracked(kept, {"trip_id": trip.id})
+            Order.bulk_update_tracked(
+                reassigned,
+                {
+                    "trip_id": trip.id,
+                    "driver_id": trip.driver.id,
+                    "truck_id": trip.truck.id,
+                    "driver_assigned_at": now,
+                },
+                details={"trip_id": trip.id},
+            )
+        transaction.on_commit(lambda: notify(trips))
+    result = describe(trips, unplanned)
+    result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+def notify(trips):
+    """
+    Уведомления о рейсах: одно администраторам на рейс и одно каждому
+    клиенту рейса со списком его заказов
+    """
+    warehouses = dict(
+        Trip.objects.filter(pk__in=[trip.id for trip in trips]).values_list("id", "warehouse__name")
+    )
+    for trip in trips:
+        driver, truck = trip.driver, trip.truck
+        common = {
+            "trip_id": trip.id,
+            "warehouse_name": warehouses.get(trip.id, ""),
+            "date": trip.day.strftime("%d.%m.%Y"),
+            "driver_name": driver.full_name,
+            "driver_phone": driver.phone,
+            "truck_info": f"{truck.brand} {truck.plate_number}",
+        }
+        try:
+            post_to_bot(
+                "/api/send_notification",
+                {
+                    **common,
+                    "notification_type": "trip_planned",
+                    "sequence_numbers": [order.sequence_number for order in trip.orders],
+                    "utilization": loading.utilization(trip.truck_load, trip.vehicle.capacity)["max"],
+                },
+            )
+        except Exception as e:
+            logger.error("Error sending trip %s admin notification: %s", trip.id, e)
+
+        by_user = defaultdict(list)
+        for order in trip.orders:
+            if order.telegram_user_id:
+                by_user[order.telegram_user_id].append(order.sequence_number)
+        for telegram_user_id, sequence_numbers in by_user.items():
+            try:
+                post_to_bot(
+                    "/api/send_user_notification",
+                    {
+                        **common,
+                        "notification_type": "trip_assigned",
+                        "telegram_user_id": telegram_user_id,
+                        "sequence_numbers": sequence_numbers,
+                    },
+                )
+            except Exception as e:
+                logger.error("Error sending trip %s notification to %s: %s", trip.id, telegram_user_id, e)
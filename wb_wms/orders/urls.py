@@ -7,7 +7,9 @@ from .views import (
     test_pricing,
     OrderViewSet,
     DriverViewSet,
+    DriverShiftViewSet,
     TruckViewSet,
+    TripViewSet,
     assign_driver,
     reject_order,
     get_service_names,
@@ -19,6 +21,8 @@ app_name = "orders"
 driver_router = DefaultRouter()
 driver_router.register(r'drivers', DriverViewSet)
 driver_router.register(r'trucks', TruckViewSet)
+driver_router.register(r'trips', TripViewSet)
+driver_router.register(r'shifts', DriverShiftViewSet)
 
 urlpatterns = [
     # Основные маршруты для заказов
@@ -39,10 +43,16 @@ urlpatterns = [
         ),
         name="order-detail",
     ),
+    path(
+        "changes/",
+        views.OrderViewSet.as_view({"get": "changes"}),
+        name="order-changes",
+    ),
     # Маршруты для водителей и грузовиков в отдельном пространстве
     path('transport/', include(driver_router.urls)),
     path('<uuid:order_id>/assign_driver/', assign_driver, name='assign-driver'),
     path('<uuid:order_id>/reject/', reject_order, name='reject-order'),
+    path('<uuid:order_id>/timeline/', views.order_timeline, name='order-timeline'),
     path(
         "warehouses/",
         views.WarehouseViewSet.as_view({"get": "list"}),
@@ -98,6 +108,19 @@ urlpatterns = [
         name="service-detail",
     ),
     path("services/names/", get_service_names, name="service-names"),
+    path("stats/", views.order_stats, name="order-stats"),
+    path("stats/lead-times/", views.order_lead_times, name="order-lead-times"),
+    path("bulk-status/", views.bulk_status, name="bulk-status"),
+    path("bulk-assign/", views.bulk_assign, name="bulk-assign"),
+    path("import/", views.import_orders, name="order-import"),
+    path("dispatch/plan/", views.dispatch_plan, name="dispatch-plan"),
+    path("dispatch/apply/", views.dispatch_apply, name="dispatch-apply"),
+    path("trucks/load/", views.truck_loads, name="truck-loads"),
+    path("trucks/load/plan/", views.truck_load_plan, name="truck-load-plan"),
+    path("trips/plan/", views.trips_plan, name="trips-plan"),
+    path("trips/apply/", views.trips_apply, name="trips-apply"),
+    path("schedule/free/", views.schedule_free, name="schedule-free"),
+    path("schedule/check/", views.schedule_check, name="schedule-check"),
     path("test-pricing/", test_pricing, name="test-pricing"),
     path(
         "send-telegram-notification/",
@@ -105,4 +128,5 @@ urlpatterns = [
         name="send-telegram-notification",
     ),
     path("health/", views.health_check, name="health-check"),
+    path("metrics/", views.metrics, name="metrics"),
 ]
@@ -1,48 +1,88 @@
 import datetime
 import json
 import logging
-import os
-import traceback
 import uuid
+from collections import defaultdict
 from decimal import Decimal
 from django.utils import timezone
 
-import requests
-from django.db import connection
+from django.db import DatabaseError, connection, transaction
 from django.db.models import DecimalField, ExpressionWrapper, F, Prefetch, Sum
-from django.http import JsonResponse
-from django.shortcuts import render
+from django.http import Http404, HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404, render
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_http_methods
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import conditional_page, require_http_methods
 from rest_framework import status, viewsets, permissions
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 
 from .models import (
     AdditionalService, 
+    ArchivedOrder,
     Container, 
     Marketplace, 
     Order, 
+    OrderEvent,
     Pricing, 
     Warehouse, 
     PalletPricing, 
     BoxPricing,
     Driver,
+    DriverShift,
+    OrderConflict,
+    Trip,
     Truck
 )
+from . import archive, availability, conditional, dispatch, idempotency, imports, loading, pubsub, schedule, stats, sync, trips
+from .metrics import registry as metrics_registry
+from .notifications import notify_assignment, post_to_bot
 from .serializers import (
     AdditionalServiceSerializer,
     MarketplaceSerializer,
+    OrderEventSerializer,
     OrderSerializer,
     PricingSerializer,
     WarehouseSerializer,
     DriverSerializer,
+    DriverShiftSerializer,
+    TripSerializer,
     TruckSerializer,
 )
 
 logger = logging.getLogger(__name__)
 
-TELEGRAM_BOT_URL = os.getenv('TELEGRAM_BOT_URL')
+
+def assign_preconditions(request, order):
+    """
+    Условия назначения из запроса. version — версия заказа, которую видел
+    клиент, expected_status — статус, в котором заказ должен быть.
+    Без version заказ назначается только из статуса new (expected_status
+    по умолчанию): иначе второй параллельный запрос молча переназначил бы
+    заказ, только что принятый первым. Переназначить принятый заказ можно,
+    передав его version.
+    Возвращает допустимые статусы; ValueError при некорректных значениях
+    """
+    version = request.data.get("version")
+    if version is not None:
+        order.version = int(version)
+    expected_status = request.data.get("expected_status")
+    if not expected_status and version is None:
+        expected_status = "new"
+    if expected_status:
+        return tuple(value for value in Order.ASSIGNABLE_STATUSES if value == expected_status)
+    return Order.ASSIGNABLE_STATUSES
+
+
+def conflict_response(e):
+    """
+    Ответ 409 с актуальными статусом и версией заказа
+    """
+    return Response(
+        {"error": str(e), "status": e.order.status, "version": e.order.version},
+        status=status.HTTP_409_CONFLICT,
+    )
+
 
 class MarketplaceViewSet(viewsets.ModelViewSet):
     queryset = Marketplace.objects.all()
@@ -89,6 +129,8 @@ class ContainerTypesViewSet(viewsets.ViewSet):
         return Response(data)
 
 
+# Справочники: ETag по содержимому ответа, If-None-Match отвечается 304
+@method_decorator(conditional_page, name="list")
 class WarehouseViewSet(viewsets.ModelViewSet):
     queryset = Warehouse.objects.all()
     serializer_class = WarehouseSerializer
@@ -102,6 +144,8 @@ class WarehouseViewSet(viewsets.ModelViewSet):
 class OrderViewSet(viewsets.ModelViewSet):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
+    # Параметры запроса, по которым фильтруется список (индексированные колонки)
+    list_filter_params = ("status", "warehouse_id", "box_container_type", "pallet_container_type")
 
     def create(self, request, *args, **kwargs):
         try:
@@ -127,6 +171,8 @@ class OrderViewSet(viewsets.ModelViewSet):
                 warehouse=warehouse,
                 cargo_type=cargo_data.get("cargo_type", ""),
                 container_type=cargo_data.get("container_type", ""),
+                box_container_type=cargo_data.get("box_container_type") or None,
+                pallet_container_type=cargo_data.get("pallet_container_type") or None,
                 box_count=cargo_data.get("box_count", 0),
                 pallet_count=cargo_data.get("pallet_count", 0),
                 client_name=client_data.get("name", ""),
@@ -210,13 +256,10 @@ class OrderViewSet(viewsets.ModelViewSet):
 
             # Отправляем уведомление в Telegram
             try:
-                response = requests.post(
-                    f"{TELEGRAM_BOT_URL}/api/send_notification",
-                    json=telegram_data
-                )
-                logger.info(f"Telegram notification sent: {response.json()}")
+                response = post_to_bot("/api/send_notification", telegram_data)
+                logger.info("Telegram notification sent: status %s", response.status_code)
             except Exception as e:
-                logger.error(f"Error sending Telegram notification: {str(e)}")
+                logger.error("Error sending Telegram notification: %s", e)
 
             # Формируем ответ
             return Response(
@@ -264,7 +307,7 @@ class OrderViewSet(viewsets.ModelViewSet):
             )
 
         except Exception as e:
-            logger.error(f"Error creating order: {str(e)}")
+            logger.error("Error creating order: %s", e)
             return Response(
                 {"error": str(e)},
                 status=status.HTTP_400_BAD_REQUEST
@@ -299,15 +342,130 @@ class OrderViewSet(viewsets.ModelViewSet):
     def perform_destroy(self, instance):
         instance.delete()
 
+    def requested_fields(self):
+        """
+        Поля из параметра ?fields=id,status,... или None, если не указан
+        """
+        fields = self.request.query_params.get("fields")
+        if not fields:
+            return None
+        return [name.strip() for name in fields.split(",") if name.strip()]
+
+    def get_queryset(self):
+        if self.action in ("list", "retrieve"):
+            return OrderSerializer.setup_queryset(Order.objects.all(), self.requested_fields())
+        return super().get_queryset()
+
+    def list_filters(self):
+        """
+        Фильтры списка из параметров запроса. ValueError при ошибке
+        """
+        params = self.request.query_params
+        filters = {}
+        for field in self.list_filter_params:
+            value = params.get(field)
+            if not value:
+                continue
+            if field == "status":
+                if value not in dict(Order.STATUS_CHOICES):
+                    raise ValueError(f"неизвестный статус {value}")
+            elif field == "warehouse_id":
+                if not value.isdigit():
+                    raise ValueError("warehouse_id должен быть числом")
+                value = int(value)
+            elif len(value) > Order._meta.get_field(field).max_length:
+                raise ValueError(f"{field} слишком длинный")
+            filters[field] = value
+        return filters
+
     def list(self, request):
-        orders = Order.objects.all()
-        serializer = self.serializer_class(orders, many=True)
-        return Response(serializer.data)
+        try:
+            filters = self.list_filters()
+            with_archived = archive.include_archived(request.query_params)
+            if with_archived:
+                archived_limit, archived_offset = archive.archived_page(request.query_params)
+        except ValueError as e:
+            return Response(
+                {"error": f"Некорректные параметры: {e}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        archived_orders = archive.archived_queryset(filters) if with_archived else None
+
+        # Версия списка считается до сериализации: при совпадении — 304
+        count, last_modified = conditional.list_version(Order.objects.filter(**filters))
+        version = [count, last_modified]
+        if archived_orders is not None:
+            archived_count, archived_at = conditional.list_version(archived_orders, "archived_at")
+            version += [archived_count, archived_at]
+            if archived_at and (not last_modified or archived_at > last_modified):
+                last_modified = archived_at
+        etag = conditional.make_etag(request, "orders", *version)
+        response = conditional.not_modified(request, etag, last_modified)
+        if response is not None:
+            return conditional.set_validators(response, etag, last_modified)
+
+        orders = self.get_queryset().filter(**filters)
+        fields = self.requested_fields()
+        serializer = self.serializer_class(orders, many=True, fields=fields)
+        data = serializer.data
+        # Архивные заказы старше активных, поэтому идут в конце списка —
+        # страницей archived_limit/archived_offset, всего — в X-Archived-Count
+        if archived_orders is not None:
+            page = archived_orders.order_by("-created_at", "pk")[archived_offset:archived_offset + archived_limit]
+            data = list(data) + [archive.archived_payload(archived, fields) for archived in page]
+        response = Response(data)
+        if archived_orders is not None:
+            response["X-Archived-Count"] = archived_count
+        return conditional.set_validators(response, etag, last_modified)
 
     def retrieve(self, request, pk=None):
-        order = self.get_object()
-        serializer = self.serializer_class(order)
-        return Response(serializer.data)
+        fields = self.requested_fields()
+        updated_at = Order.objects.filter(pk=pk).values_list("updated_at", flat=True).first()
+        archived = None
+        if updated_at is None and archive.include_archived(request.query_params):
+            archived = get_object_or_404(ArchivedOrder, pk=pk)
+            updated_at = archived.archived_at
+        if updated_at is None:
+            raise Http404
+
+        etag = conditional.make_etag(request, pk, updated_at)
+        response = conditional.not_modified(request, etag, updated_at)
+        if response is None:
+            if archived is not None:
+                response = Response(archive.archived_payload(archived, fields))
+            else:
+                response = Response(self.serializer_class(self.get_object(), fields=fields).data)
+        return conditional.set_validators(response, etag, updated_at)
+
+    @action(detail=False, methods=["get"])
+    def changes(self, request):
+        """
+        Заказы, измененные после курсора ?since=, и надгробия удаленных
+        и архивированных заказов (см. orders/sync.py). Без since — все
+        заказы постранично. Параметры: limit, fields
+        """
+        try:
+            limit = min(int(request.query_params.get("limit", sync.DEFAULT_LIMIT)), sync.MAX_LIMIT)
+            if limit <= 0:
+                raise ValueError("limit должен быть больше 0")
+            fields = self.requested_fields()
+            # updated_at нужен для курсора, даже если клиент его не запросил
+            queryset = OrderSerializer.setup_queryset(Order.objects.all(), fields and [*fields, "updated_at"])
+            orders, deleted, cursor, has_more = sync.changes(
+                request.query_params.get("since"), limit, queryset
+            )
+        except ValueError as e:
+            return Response(
+                {"error": f"Некорректные параметры: {e}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return Response({
+            "changes": self.serializer_class(orders, many=True, fields=fields).data,
+            "deleted": deleted,
+            "cursor": cursor,
+            "has_more": has_more,
+        })
 
     @action(detail=True, methods=['post'])
     def assign_driver(self, request, pk=None):
@@ -333,53 +491,33 @@ class OrderViewSet(viewsets.ModelViewSet):
                     {'error': 'Водитель или грузовик не найден'},
                     status=status.HTTP_404_NOT_FOUND
                 )
-                
-            order.driver = driver
-            order.truck = truck
-            order.driver_assigned_at = timezone.now()
-            order.status = 'accepted'
-            order.save()
-            
-            # Отправляем уведомление в Telegram для админов
-            telegram_admin_data = {
-                "order_id": str(order.id),
-                "sequence_number": order.sequence_number,
-                "driver_name": driver.full_name,
-                "truck_info": f"{truck.brand} - {truck.plate_number}",
-                "notification_type": "driver_assigned"
-            }
-            
+
             try:
-                response = requests.post(
-                    f"{TELEGRAM_BOT_URL}/api/send_notification",
-                    json=telegram_admin_data
-                )
-                logger.info(f"Telegram admin notification sent: {response.json()}")
-            except Exception as e:
-                logger.error(f"Error sending Telegram admin notification: {str(e)}")
-                
-            # Отправляем уведомление клиенту если у заказа есть telegram_user_id
-            if order.telegram_user_id:
-                logger.info(f"Sending notification to user with telegram_user_id: {order.telegram_user_id}")
-                telegram_user_data = {
-                    "telegram_user_id": order.telegram_user_id,
-                    "notification_type": "order_accepted",
-                    "driver_name": driver.full_name,
-                    "driver_phone": driver.phone,
-                    "truck_info": f"{truck.brand} {truck.plate_number}",
-                    "sequence_number": order.sequence_number
-                }
-                
-                try:
-                    response = requests.post(
-                        f"{TELEGRAM_BOT_URL}/api/send_user_notification",
-                        json=telegram_user_data
+                statuses = assign_preconditions(request, order)
+            except (TypeError, ValueError) as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+            # Вместимость проверяется под блокировкой грузовика в той же
+            # транзакции, что и запись назначения
+            try:
+                with transaction.atomic():
+                    truck = loading.lock_truck(truck.pk)
+                    loading.check_assignment(truck, [order])
+                    order.update_versioned(
+                        {
+                            'driver': driver,
+                            'truck': truck,
+                            'driver_assigned_at': timezone.now(),
+                            'status': 'accepted',
+                        },
+                        statuses=statuses,
                     )
-                    logger.info(f"Telegram user notification sent: {response.json()}")
-                except Exception as e:
-                    logger.error(f"Error sending Telegram user notification: {str(e)}")
-            else:
-                logger.warning(f"Order {order.id} has no telegram_user_id, skipping user notification")
+            except loading.CapacityError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            except OrderConflict as e:
+                return conflict_response(e)
+            
+            notify_assignment(order, driver, truck)
             
             return Response({
                 'success': True,
@@ -389,13 +527,14 @@ class OrderViewSet(viewsets.ModelViewSet):
             })
             
         except Exception as e:
-            logger.error(f"Error assigning driver and truck: {str(e)}")
+            logger.error("Error assigning driver and truck: %s", e)
             return Response(
                 {'error': str(e)},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
 
+@method_decorator(conditional_page, name="list")
 class ContainerTypesViewSet(viewsets.ViewSet):
     def list(self, request):
         data = {
@@ -421,7 +560,7 @@ def send_telegram_notification(request):
         order_data = request.data
 
         # Отправляем запрос к Telegram боту
-        response = requests.post(f"{TELEGRAM_BOT_URL}/api/send_notification", json=order_data)
+        response = post_to_bot("/api/send_notification", order_data)
 
         if response.status_code == 200:
             return Response({"status": "success"}, status=status.HTTP_200_OK)
@@ -439,9 +578,35 @@ def send_telegram_notification(request):
 
 @api_view(["GET"])
 def health_check(request):
+    """
+    Проверка работоспособности сервиса, включая доступность базы данных
+    """
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+    except DatabaseError as e:
+        logger.error("Health check failed: database unavailable: %s", e)
+        return Response(
+            {"status": "error", "database": "unavailable"},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
     return Response({"status": "ok"})
 
 
+@require_http_methods(["GET"])
+def metrics(request):
+    """
+    Метрики производительности запросов в текстовом формате Prometheus
+    """
+    return HttpResponse(
+        metrics_registry.render_prometheus() + pubsub.broker.render_prometheus(),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+@method_decorator(conditional_page, name="list")
+@method_decorator(conditional_page, name="retrieve")
+@method_decorator(conditional_page, name="get_additional_services")
 class PricingViewSet(viewsets.ModelViewSet):
     queryset = Pricing.objects.all()
     serializer_class = PricingSerializer
@@ -457,9 +622,9 @@ class PricingViewSet(viewsets.ModelViewSet):
             additional_services = request.data.get("additionalServices", []) or request.data.get("additional_services", [])
 
             # Log the received data for debugging
-            logger.info(f"Received price calculation request: {request.data}")
-            logger.info(f"Extracted cargo data: {cargo_data}")
-            logger.info(f"Extracted additional services: {additional_services}")
+            logger.debug("Received price calculation request with keys: %s", list(request.data))
+            logger.debug("Extracted cargo data: %s", cargo_data)
+            logger.debug("Extracted additional services: %s", additional_services)
 
             total_price = Decimal("0.00")
 
@@ -479,11 +644,13 @@ class PricingViewSet(viewsets.ModelViewSet):
                         if delivery_pricing:
                             delivery_price = delivery_pricing.base_price
                             total_price += delivery_price
-                            logger.info(
-                                f"Added delivery price: {delivery_price} using pricing {delivery_pricing.id}"
+                            logger.debug(
+                                "Added delivery price: %s using pricing %s",
+                                delivery_price,
+                                delivery_pricing.id,
                             )
                     except Exception as e:
-                        logger.error(f"Error calculating delivery price: {str(e)}")
+                        logger.error("Error calculating delivery price: %s", e)
 
             # 2. Расчет стоимости по типу груза
             cargo_price = Decimal("0.00")
@@ -516,12 +683,12 @@ class PricingViewSet(viewsets.ModelViewSet):
                             
                             if box_pricing:
                                 box_price = box_pricing.price
-                                logger.info(f"Using box price from BoxPricing: {box_price} for volume range {volume_range}")
+                                logger.debug("Using box price from BoxPricing: %s for volume range %s", box_price, volume_range)
                             else:
                                 # Если не нашли цену в БД, используем значения по умолчанию
                                 default_prices = BoxPricing.get_default_prices()
                                 box_price = Decimal(str(default_prices.get(volume_range, "450.00")))
-                                logger.info(f"Using default box price: {box_price} for volume range {volume_range}")
+                                logger.debug("Using default box price: %s for volume range %s", box_price, volume_range)
                         else:
                             # Если какой-то из размеров равен 0, используем минимальную цену
                             box_price = Decimal("450.00")
@@ -529,7 +696,7 @@ class PricingViewSet(viewsets.ModelViewSet):
                     except Exception as e:
                         # В случае ошибки используем минимальную цену
                         box_price = Decimal("450.00")
-                        logger.error(f"Error calculating custom box price: {e}")
+                        logger.error("Error calculating custom box price: %s", e)
                 else:
                     # Для стандартного размера ищем цену в БД
                     box_pricing = BoxPricing.objects.filter(
@@ -539,16 +706,16 @@ class PricingViewSet(viewsets.ModelViewSet):
                     
                     if box_pricing:
                         box_price = box_pricing.price
-                        logger.info(f"Using box price from BoxPricing: {box_price} for size {box_container_type}")
+                        logger.debug("Using box price from BoxPricing: %s for size %s", box_price, box_container_type)
                     else:
                         # Если не нашли цену в БД, используем значения по умолчанию
                         default_prices = BoxPricing.get_default_prices()
                         box_price = Decimal(str(default_prices.get(box_container_type, "450.00")))
-                        logger.info(f"Using default box price: {box_price} for size {box_container_type}")
+                        logger.debug("Using default box price: %s for size %s", box_price, box_container_type)
                 
                 box_cost = box_price * Decimal(box_count)
                 cargo_price += box_cost
-                logger.info(f"Added box price: {box_cost} for {box_count} boxes at {box_price} each")
+                logger.debug("Added box price: %s for %s boxes at %s each", box_cost, box_count, box_price)
 
             # Обработка паллет
             pallet_count = int(cargo_data.get("pallet_count", 0))
@@ -573,7 +740,7 @@ class PricingViewSet(viewsets.ModelViewSet):
                                 extra_hundreds = (extra_weight + 99) // 100  # Округляем вверх до сотен
                                 extra_cost = extra_hundreds * 1000  # 1000 руб. за каждые 100 кг
                                 pallet_price = Decimal("5000.00") + Decimal(str(extra_cost))
-                                logger.info(f"Calculated custom weight price: base 5000 + {extra_cost} for {extra_weight}kg over 500kg")
+                                logger.debug("Calculated custom weight price: base 5000 + %s for %skg over 500kg", extra_cost, extra_weight)
                         else:
                             # Если вес не указан или равен 0, используем минимальную цену
                             pallet_price = Decimal("2000.00")
@@ -581,7 +748,7 @@ class PricingViewSet(viewsets.ModelViewSet):
                     except Exception as e:
                         # В случае ошибки используем минимальную цену
                         pallet_price = Decimal("2000.00")
-                        logger.error(f"Error calculating custom pallet price: {e}")
+                        logger.error("Error calculating custom pallet price: %s", e)
                 else:
                     # Для стандартных весовых категорий ищем цену в БД
                     pallet_pricing = PalletPricing.objects.filter(
@@ -591,44 +758,47 @@ class PricingViewSet(viewsets.ModelViewSet):
                     
                     if pallet_pricing:
                         pallet_price = pallet_pricing.price
-                        logger.info(f"Using pallet price from PalletPricing: {pallet_price} for category {pallet_container_type}")
+                        logger.debug("Using pallet price from PalletPricing: %s for category %s", pallet_price, pallet_container_type)
                     else:
                         # Если не нашли, используем стандартные цены
                         default_prices = PalletPricing.get_default_prices()
                         pallet_price = Decimal(str(default_prices.get(pallet_container_type, "2000.00")))
-                        logger.info(f"Using default pallet price: {pallet_price} for category {pallet_container_type}")
+                        logger.debug("Using default pallet price: %s for category %s", pallet_price, pallet_container_type)
                 
                 pallet_cost = pallet_price * Decimal(pallet_count)
                 cargo_price += pallet_cost
-                logger.info(f"Added pallet price: {pallet_cost} for {pallet_count} pallets at {pallet_price} each")
+                logger.debug("Added pallet price: %s for %s pallets at %s each", pallet_cost, pallet_count, pallet_price)
 
             total_price += cargo_price
 
             # 3. Расчет стоимости дополнительных услуг
             additional_services_cost = Decimal("0.00")
             if additional_services:
-                logger.info(f"Processing additional services: {additional_services}")
+                logger.debug("Processing additional services: %s", additional_services)
                 for service_id in additional_services:
                     try:
                         service = AdditionalService.objects.get(id=service_id, is_active=True)
                         additional_services_cost += service.price
-                        logger.info(
-                            f"Added additional service price: {service.price} for {service.name} (ID: {service_id})"
+                        logger.debug(
+                            "Added additional service price: %s for %s (ID: %s)",
+                            service.price,
+                            service.name,
+                            service_id,
                         )
                     except AdditionalService.DoesNotExist:
-                        logger.warning(f"Additional service {service_id} not found")
+                        logger.warning("Additional service %s not found", service_id)
                     except Exception as e:
                         logger.error(
-                            f"Error processing additional service {service_id}: {str(e)}"
+                            "Error processing additional service %s: %s", service_id, e
                         )
 
             total_price += additional_services_cost
-            logger.info(f"Total additional services cost: {additional_services_cost}")
+            logger.debug("Total additional services cost: %s", additional_services_cost)
 
             # Округляем до 2 знаков после запятой
             total_price = total_price.quantize(Decimal("0.01"))
 
-            logger.info(f"Final calculated price: {total_price}")
+            logger.debug("Final calculated price: %s", total_price)
 
             return Response(
                 {
@@ -642,7 +812,7 @@ class PricingViewSet(viewsets.ModelViewSet):
                 }
             )
         except Exception as e:
-            logger.error(f"Error calculating price: {str(e)}")
+            logger.error("Error calculating price: %s", e)
             return Response(
                 {"error": f"Error calculating price: {str(e)}"},
                 status=status.HTTP_400_BAD_REQUEST,
@@ -706,6 +876,8 @@ class PricingViewSet(viewsets.ModelViewSet):
         return Response({"serviceGroups": service_groups})
 
 
+@method_decorator(conditional_page, name="list")
+@method_decorator(conditional_page, name="retrieve")
 class AdditionalServiceViewSet(viewsets.ModelViewSet):
     """
     ViewSet для управления дополнительными услугами
@@ -765,13 +937,53 @@ class AdditionalServiceViewSet(viewsets.ModelViewSet):
 @require_http_methods(["POST"])
 def create_order(request):
     """
-    Создание заказа через Django ORM
+    Создание заказа через Django ORM. С заголовком Idempotency-Key повтор
+    запроса возвращает первый ответ, не создавая второй заказ
+    (orders/idempotency.py)
+    """
+    key = request.headers.get(idempotency.HEADER)
+    if key is None:
+        return _create_order(request)[0]
+    try:
+        key = idempotency.parse_key(key)
+    except ValueError as e:
+        return JsonResponse({"success": False, "message": f"Некорректные параметры: {e}"}, status=400)
+
+    body_fingerprint = idempotency.fingerprint(request.body)
+    response = idempotency.replay(key, body_fingerprint)
+    if response is not None:
+        return response
+    try:
+        with transaction.atomic():
+            record = idempotency.claim(key, body_fingerprint)
+            response, order = _create_order(request)
+            if response.status_code >= 500:
+                # Откатываем заказ вместе с ключом: повтор выполнится заново
+                transaction.set_rollback(True)
+            else:
+                idempotency.store(record, response, order.pk if order else None)
+    except idempotency.KeyTaken:
+        # Параллельный запрос с тем же ключом успел зафиксировать ответ.
+        # Если он уже откатился, ответа нет — клиент повторит запрос
+        response = idempotency.replay(key, body_fingerprint)
+        if response is None:
+            return JsonResponse(
+                {"success": False, "message": "Запрос с этим ключом не завершен, повторите его"},
+                status=409,
+            )
+    return response
+
+
+def _create_order(request):
+    """
+    Создает заказ из тела запроса. Возвращает (ответ, заказ); заказ None
+    при ошибке. Уведомление администраторам уходит после фиксации транзакции
     """
     try:
         # Получение данных заказа
         try:
             order_data = json.loads(request.body.decode("utf-8"))
-            logging.info(f"Received order data: {order_data}")
+            logger.debug("Received order data with keys: %s", list(order_data))
         except json.JSONDecodeError:
             return JsonResponse(
                 {
@@ -779,7 +991,7 @@ def create_order(request):
                     "message": "Invalid JSON",
                 },
                 status=400,
-            )
+            ), None
 
         # Получаем данные из запроса
         delivery_data = order_data.get("delivery", {})
@@ -799,13 +1011,15 @@ def create_order(request):
                     "message": "Warehouse not found",
                 },
                 status=400,
-            )
+            ), None
 
         # Создаем заказ через ORM
         order = Order(
             warehouse=warehouse,
             cargo_type=cargo_data.get("cargo_type", ""),
             container_type=cargo_data.get("container_type", ""),
+            box_container_type=cargo_data.get("box_container_type") or None,
+            pallet_container_type=cargo_data.get("pallet_container_type") or None,
             box_count=cargo_data.get("box_count", 0),
             pallet_count=cargo_data.get("pallet_count", 0),
             client_name=client_data.get("name", ""),
@@ -818,7 +1032,7 @@ def create_order(request):
         )
 
         # Добавляем дополнительное логирование для проверки telegram_user_id
-        logger.info(f"Creating order with telegram_user_id: {order.telegram_user_id}, from client data: {client_data}")
+        logger.debug("Creating order with telegram_user_id: %s", order.telegram_user_id)
 
         # Сохраняем размеры и вес если они есть
         dimensions = cargo_data.get("dimensions", {})
@@ -891,14 +1105,7 @@ def create_order(request):
         }
 
         # Отправляем уведомление в Telegram
-        try:
-            response = requests.post(
-                f"{TELEGRAM_BOT_URL}/api/send_notification",
-                json=telegram_data
-            )
-            logger.info(f"Telegram notification sent: {response.json()}")
-        except Exception as e:
-            logger.error(f"Error sending Telegram notification: {str(e)}")
+        transaction.on_commit(lambda: notify_order_created(telegram_data))
 
         # Формируем ответ
         return JsonResponse(
@@ -942,15 +1149,25 @@ def create_order(request):
                 }
             },
             status=201,
-        )
+        ), order
 
     except Exception as e:
-        logger.error(f"Error creating order: {str(e)}")
-        logger.error(traceback.format_exc())
+        logger.exception("Error creating order: %s", e)
         return JsonResponse(
             {"success": False, "error": str(e)},
             status=500
-        )
+        ), None
+
+
+def notify_order_created(telegram_data):
+    """
+    Уведомление администраторам о новом заказе
+    """
+    try:
+        response = post_to_bot("/api/send_notification", telegram_data)
+        logger.info("Telegram notification sent: status %s", response.status_code)
+    except Exception as e:
+        logger.error("Error sending Telegram notification: %s", e)
 
 
 @api_view(["GET"])
@@ -1018,14 +1235,156 @@ def test_pricing(request):
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class DriverViewSet(viewsets.ModelViewSet):
+class AvailabilityMixin:
+    """
+    Фильтр списка ?available=true: только свободные в день забора
+    (параметр at, по умолчанию сегодня), см. orders/availability.py.
+    Водители дополнительно проверяются по календарю смен: на весь день
+    или на интервал from–to, если он задан
+    """
+    availability_field = None
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        params = self.request.query_params
+        if self.action == "list" and params.get("available", "").lower() in ("true", "1"):
+            window = None
+            if params.get("from") or params.get("to"):
+                window = schedule.parse_window(params.get("from"), params.get("to"))
+                day = timezone.localdate(window[0])
+            else:
+                day = availability.parse_at(params.get("at"))
+            queryset = availability.available(queryset, self.availability_field, day, window)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        try:
+            return super().list(request, *args, **kwargs)
+        except ValueError as e:
+            return Response(
+                {"error": f"Некорректные параметры: {e}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+
+@method_decorator(conditional_page, name="list")
+@method_decorator(conditional_page, name="retrieve")
+class DriverViewSet(AvailabilityMixin, viewsets.ModelViewSet):
     queryset = Driver.objects.filter(is_active=True)
     serializer_class = DriverSerializer
+    availability_field = "driver"
 
 
-class TruckViewSet(viewsets.ModelViewSet):
+@method_decorator(conditional_page, name="list")
+@method_decorator(conditional_page, name="retrieve")
+class TruckViewSet(AvailabilityMixin, viewsets.ModelViewSet):
     queryset = Truck.objects.filter(is_active=True)
     serializer_class = TruckSerializer
+    availability_field = "truck"
+
+
+class DriverShiftViewSet(viewsets.ModelViewSet):
+    """
+    Смены водителей (см. orders/schedule.py). Фильтры: driver_id, from и to —
+    смены, пересекающие интервал. Смена, пересекающая другую смену того же
+    водителя, не сохраняется — 409 со списком пересечений
+    """
+    queryset = DriverShift.objects.select_related("driver")
+    serializer_class = DriverShiftSerializer
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        # Фильтры — только для списка; ошибки в них list возвращает как 400
+        if self.action != "list":
+            return queryset
+        params = self.request.query_params
+        if params.get("driver_id"):
+            queryset = queryset.filter(driver_id=int(params["driver_id"]))
+        if params.get("from") or params.get("to"):
+            start, end = schedule.parse_window(params.get("from"), params.get("to"))
+            queryset = queryset.filter(starts_at__lt=end, ends_at__gt=start)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        try:
+            return super().list(request, *args, **kwargs)
+        except ValueError as e:
+            return Response(
+                {"error": f"Некорректные параметры: {e}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+    def create(self, request, *args, **kwargs):
+        try:
+            return super().create(request, *args, **kwargs)
+        except schedule.ScheduleConflict as e:
+            return shift_conflict_response(e)
+
+    def update(self, request, *args, **kwargs):
+        try:
+            return super().update(request, *args, **kwargs)
+        except schedule.ScheduleConflict as e:
+            return shift_conflict_response(e)
+
+    def perform_create(self, serializer):
+        data = serializer.validated_data
+        with transaction.atomic():
+            schedule.check(data["driver"], data["starts_at"], data["ends_at"])
+            serializer.save()
+
+    def perform_update(self, serializer):
+        shift, data = serializer.instance, serializer.validated_data
+        with transaction.atomic():
+            schedule.check(
+                data.get("driver", shift.driver),
+                data.get("starts_at", shift.starts_at),
+                data.get("ends_at", shift.ends_at),
+                exclude_id=shift.pk,
+            )
+            serializer.save()
+
+
+def shift_conflict_response(e):
+    """
+    Ответ 409 со сменами, с которыми пересекается запрошенная
+    """
+    return Response(
+        {"error": str(e), "conflicts": DriverShiftSerializer(e.shifts, many=True).data},
+        status=status.HTTP_409_CONFLICT,
+    )
+
+
+class TripViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Рейсы с заказами. Фильтры: date (YYYY-MM-DD), warehouse_id, status
+    """
+    queryset = Trip.objects.select_related("driver", "truck").prefetch_related(
+        Prefetch("orders", queryset=Order.objects.only("id", "trip_id"))
+    )
+    serializer_class = TripSerializer
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        # Фильтры — только для списка; ошибки в них list возвращает как 400
+        if self.action != "list":
+            return queryset
+        params = self.request.query_params
+        if params.get("date"):
+            queryset = queryset.filter(date=datetime.date.fromisoformat(params["date"]))
+        if params.get("warehouse_id"):
+            queryset = queryset.filter(warehouse_id=int(params["warehouse_id"]))
+        if params.get("status"):
+            queryset = queryset.filter(status=params["status"])
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        try:
+            return super().list(request, *args, **kwargs)
+        except ValueError as e:
+            return Response(
+                {"error": f"Некорректные параметры: {e}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
 
 @api_view(['POST'])
@@ -1053,10 +1412,31 @@ def assign_driver(request, order_id):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        order.driver = driver
-        order.truck = truck
-        order.status = 'accepted'  # Обновляем статус заказа
-        order.save()
+        try:
+            statuses = assign_preconditions(request, order)
+        except (TypeError, ValueError) as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Сравнение с версией: из двух одновременных подтверждений проходит одно.
+        # Вместимость проверяется под блокировкой грузовика в той же
+        # транзакции: параллельные назначения на него не перегрузят его вместе
+        try:
+            with transaction.atomic():
+                truck = loading.lock_truck(truck.pk)
+                loading.check_assignment(truck, [order])
+                order.update_versioned(
+                    {
+                        "driver": driver,
+                        "truck": truck,
+                        "driver_assigned_at": timezone.now(),
+                        "status": "accepted",
+                    },
+                    statuses=statuses,
+                )
+        except loading.CapacityError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except OrderConflict as e:
+            return conflict_response(e)
 
         return Response({
             "status": "success",
@@ -1078,7 +1458,7 @@ def assign_driver(request, order_id):
             status=status.HTTP_404_NOT_FOUND
         )
     except Exception as e:
-        logger.error(f"Error assigning driver to order: {e}")
+        logger.error("Error assigning driver to order: %s", e)
         return Response(
             {"error": str(e)},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -1111,24 +1491,18 @@ def reject_order(request, order_id):
         rejection_data = request.data
         reason = rejection_data.get("reason", "")
         
-        # Обновляем статус заказа
-        order.status = "rejected"
-        
-        # Сохраняем причину отклонения, если она указана
-        if reason:
-            if not order.additional_info:
-                order.additional_info = {}
-            
-            if isinstance(order.additional_info, dict):
-                order.additional_info["rejection_reason"] = reason
-            else:
-                # Если additional_info не словарь, создаем новый словарь
-                order.additional_info = {"rejection_reason": reason}
-        
-        # Сохраняем изменения
-        order.save()
+        # Отклонить можно только новый заказ; причина сохраняется в событии
+        # смены статуса
+        try:
+            order.update_versioned(
+                {"status": "rejected"},
+                details={"reason": reason} if reason else None,
+                statuses=("new",),
+            )
+        except OrderConflict as e:
+            return conflict_response(e)
         
-        logger.info(f"Order {order_id} rejected successfully")
+        logger.info("Order %s rejected successfully", order_id)
         
         return Response(
             {
@@ -1140,13 +1514,431 @@ def reject_order(request, order_id):
             status=status.HTTP_200_OK
         )
     except Exception as e:
-        logger.error(f"Error rejecting order {order_id}: {str(e)}")
+        logger.error("Error rejecting order %s: %s", order_id, e)
         return Response(
             {"error": f"Failed to reject order: {str(e)}"},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
 
+@api_view(["GET"])
+def order_stats(request):
+    """
+    Выручка, число заказов, коробок и паллет по складам за каждый день периода.
+
+    Параметры: date_from, date_to (YYYY-MM-DD, по умолчанию последние 30 дней),
+    warehouse_id. Читает только дневные сводки, без агрегации таблицы заказов.
+    """
+    try:
+        date_from, date_to = stats.parse_period(request.query_params)
+        warehouse_id = request.query_params.get("warehouse_id")
+        if warehouse_id is not None:
+            warehouse_id = int(warehouse_id)
+    except ValueError as e:
+        return Response(
+            {"error": f"Некорректные параметры: {e}"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    return Response(stats.report(date_from, date_to, warehouse_id))
+
+
+@api_view(["GET"])
+def order_timeline(request, order_id):
+    """
+    История заказа из журнала событий. Доступна и для удаленных заказов
+    """
+    events = OrderEvent.objects.filter(order_id=order_id).order_by("at", "id")
+    serializer = OrderEventSerializer(events, many=True)
+    if not serializer.data:
+        return Response({"error": "Заказ не найден"}, status=status.HTTP_404_NOT_FOUND)
+    return Response({"order_id": str(order_id), "events": serializer.data})
+
+
+@api_view(["GET"])
+def order_lead_times(request):
+    """
+    Среднее, минимальное и максимальное время между этапами заказа
+    (new→accepted, accepted→completed) для заказов, созданных в периоде
+    """
+    try:
+        date_from, date_to = stats.parse_period(request.query_params)
+    except ValueError as e:
+        return Response(
+            {"error": f"Некорректные параметры: {e}"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    return Response({
+        "date_from": date_from,
+        "date_to": date_to,
+        "stages": stats.lead_times(date_from, date_to),
+    })
+
+
+def _dispatch_max_orders(request):
+    max_orders = int(request.data.get("max_orders", dispatch.DEFAULT_MAX_ORDERS))
+    if max_orders <= 0:
+        raise ValueError("max_orders должен быть больше 0")
+    return max_orders
+
+
+@api_view(["POST"])
+def dispatch_plan(request):
+    """
+    Пробный план назначения водителей и грузовиков на открытые заказы
+    (см. orders/dispatch.py). Параметр max_orders — заказов на экипаж
+    """
+    try:
+        max_orders = _dispatch_max_orders(request)
+    except (TypeError, ValueError) as e:
+        return Response(
+            {"error": f"Некорректные параметры: {e}"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    return Response(dispatch.plan(max_orders))
+
+
+@api_view(["POST"])
+def dispatch_apply(request):
+    """
+    Строит план назначений и записывает его в одной транзакции;
+    уведомления по назначенным заказам уходят после фиксации
+    """
+    try:
+        max_orders = _dispatch_max_orders(request)
+    except (TypeError, ValueError) as e:
+        return Response(
+            {"error": f"Некорректные параметры: {e}"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    return Response(dispatch.apply(max_orders))
+
+
+# Заказов в одном запросе /orders/bulk-status/ и /orders/bulk-assign/
+BULK_LIMIT = 1000
+
+
+def parse_bulk_ids(request):
+    """
+    Список id заказов из тела массового запроса. ValueError при ошибке
+    """
+    ids = request.data.get("ids")
+    if not isinstance(ids, list) or not ids:
+        raise ValueError("ids должен быть непустым списком")
+    if len(ids) > BULK_LIMIT:
+        raise ValueError(f"не больше {BULK_LIMIT} заказов за запрос")
+    return [str(uuid.UUID(str(order_id))) for order_id in ids]
+
+
+def skipped_response(skipped):
+    return [{"id": order_id, "status": current, "error": error} for order_id, current, error in skipped]
+
+
+@api_view(["POST"])
+def bulk_status(request):
+    """
+    Массовая смена статуса: {"ids": [...], "status": "completed", "reason": "..."}.
+    Допустимые переходы (Order.STATUS_TRANSITIONS) применяются одним UPDATE
+    без пересчета стоимости, события журнала пишутся пачкой, администраторам
+    уходит одно уведомление на все заказы. Недопустимые и ненайденные
+    заказы возвращаются в skipped
+    """
+    try:
+        ids = parse_bulk_ids(request)
+        target = request.data.get("status")
+        if not any(target in targets for targets in Order.STATUS_TRANSITIONS.values()):
+            raise ValueError(f"недопустимый статус {target}")
+    except (TypeError, ValueError) as e:
+        return Response(
+            {"error": f"Некорректные параметры: {e}"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    reason = request.data.get("reason")
+    details = {"bulk": True, **({"reason": reason} if reason else {})}
+    with transaction.atomic():
+        updated, skipped = Order.bulk_transition(ids, target, details)
+        if updated:
+            sequence_numbers = sorted(order.sequence_number for order in updated)
+            transaction.on_commit(lambda: notify_bulk_status(target, sequence_numbers))
+    return Response({
+        "status": target,
+        "updated": [str(order.pk) for order in updated],
+        "skipped": skipped_response(skipped),
+    })
+
+
+def notify_bulk_status(target, sequence_numbers):
+    """
+    Одно уведомление администраторам о массовой смене статуса
+    """
+    try:
+        post_to_bot(
+            "/api/send_notification",
+            {
+                "notification_type": "orders_status_changed",
+                "status": target,
+                "status_display": dict(Order.STATUS_CHOICES).get(target, target),
+                "sequence_numbers": sequence_numbers,
+            },
+        )
+    except Exception as e:
+        logger.error("Error sending bulk status notification: %s", e)
+
+
+@api_view(["POST"])
+def bulk_assign(request):
+    """
+    Назначает одного водителя и грузовик нескольким заказам:
+    {"ids": [...], "driver_id": 1, "truck_id": 2, "expected_status": "new"}.
+    Заказы в статусах Order.ASSIGNABLE_STATUSES (или expected_status)
+    обновляются одним UPDATE без пересчета стоимости; остальные
+    возвращаются в skipped. Грузовик проверяется на вместимость по всем
+    заказам сразу. Администраторам уходит одно сообщение, клиентам — по
+    одному на telegram_user_id
+    """
+    try:
+        ids = parse_bulk_ids(request)
+        driver_id = int(request.data.get("driver_id"))
+        truck_id = int(request.data.get("truck_id"))
+        expected_status = request.data.get("expected_status")
+        statuses = Order.ASSIGNABLE_STATUSES
+        if expected_status:
+            statuses = tuple(value for value in statuses if value == expected_status)
+    except (TypeError, ValueError) as e:
+        return Response(
+            {"error": f"Некорректные параметры: {e}"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    try:
+        driver = Driver.objects.get(id=driver_id, is_active=True)
+        truck = Truck.objects.get(id=truck_id, is_active=True)
+    except (Driver.DoesNotExist, Truck.DoesNotExist):
+        return Response(
+            {"error": "Водитель или грузовик не найден"},
+            status=status.HTTP_404_NOT_FOUND,
+        )
+
+    try:
+        with transaction.atomic():
+            # Грузовик блокируется раньше заказов, см. orders/loading.py
+            truck = loading.lock_truck(truck.pk)
+            orders, skipped = Order.select_for_bulk(ids, loading.LOAD_FIELDS)
+            updated = []
+            for order in orders:
+                if order.status in statuses:
+                    updated.append(order)
+                else:
+                    skipped.append((str(order.pk), order.status, f"Заказ в статусе «{order.get_status_display()}»"))
+            loading.check_assignment(truck, updated)
+            Order.bulk_update_tracked(
+                updated,
+                {
+                    "driver_id": driver.id,
+                    "truck_id": truck.id,
+                    "driver_assigned_at": timezone.now(),
+                    "status": "accepted",
+                },
+                details={"bulk": True},
+            )
+            if updated:
+                transaction.on_commit(lambda: notify_bulk_assign(driver, truck, updated))
+    except loading.CapacityError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({
+        "driver": DriverSerializer(driver).data,
+        "truck": TruckSerializer(truck).data,
+        "updated": [str(order.pk) for order in updated],
+        "skipped": skipped_response(skipped),
+    })
+
+
+def notify_bulk_assign(driver, truck, orders):
+    """
+    Одно сообщение администраторам на все заказы и одно каждому клиенту
+    со списком его заказов
+    """
+    common = {
+        "driver_name": driver.full_name,
+        "driver_phone": driver.phone,
+        "truck_info": f"{truck.brand} {truck.plate_number}",
+    }
+    try:
+        post_to_bot(
+            "/api/send_notification",
+            {
+                **common,
+                "notification_type": "orders_assigned",
+                "sequence_numbers": sorted(order.sequence_number for order in orders),
+            },
+        )
+    except Exception as e:
+        logger.error("Error sending bulk assignment admin notification: %s", e)
+
+    by_user = defaultdict(list)
+    for order in orders:
+        if order.telegram_user_id:
+            by_user[order.telegram_user_id].append(order.sequence_number)
+    for telegram_user_id, sequence_numbers in by_user.items():
+        sequence_numbers.sort()
+        try:
+            post_to_bot(
+                "/api/send_user_notification",
+                {
+                    **common,
+                    "notification_type": "order_accepted",
+                    "telegram_user_id": telegram_user_id,
+                    "sequence_number": sequence_numbers[0],
+                    "sequence_numbers": sequence_numbers,
+                },
+            )
+        except Exception as e:
+            logger.error("Error sending bulk assignment notification to %s: %s", telegram_user_id, e)
+
+
+@api_view(["POST"])
+def import_orders(request):
+    """
+    Импорт заказов из CSV или NDJSON (см. orders/imports.py): файл в поле
+    file (multipart) или тело запроса с Content-Type text/csv или
+    application/x-ndjson. ?dry_run=true — только проверка и расчет
+    стоимости. Возвращает отчет по каждой строке
+    """
+    content_type = (request.content_type or "").split(";")[0].strip()
+    try:
+        if content_type in imports.CONTENT_TYPES:
+            fmt = imports.CONTENT_TYPES[content_type]
+            # Тело читается потоком, без request.data
+            stream = request.stream
+            if stream is None:
+                raise ValueError("пустое тело запроса")
+        else:
+            upload = request.FILES.get("file")
+            if upload is None:
+                raise ValueError("нужен файл в поле file или тело text/csv, application/x-ndjson")
+            fmt = imports.detect_format(upload.name, upload.content_type)
+            stream = upload
+    except ValueError as e:
+        return Response(
+            {"error": f"Некорректные параметры: {e}"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    dry_run = request.query_params.get("dry_run", "").lower() in ("true", "1")
+    return Response(imports.import_orders(stream, fmt, dry_run))
+
+
+@api_view(["GET"])
+def truck_loads(request):
+    """
+    Загрузка активных грузовиков за день забора (параметр date, YYYY-MM-DD):
+    паллетоместа, вес, объем и процент использования вместимости
+    """
+    try:
+        day = loading.parse_day(request.query_params.get("date"))
+    except ValueError as e:
+        return Response(
+            {"error": f"Некорректные параметры: {e}"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    return Response({"date": day, "trucks": loading.fleet(day)})
+
+
+@api_view(["POST"])
+def truck_load_plan(request):
+    """
+    Пробная раскладка заказов дня по грузовикам с учетом вместимости
+    (см. loading.pack). Параметры: date, order_ids — по умолчанию открытые
+    заказы дня
+    """
+    try:
+        day = loading.parse_day(request.data.get("date"))
+        order_ids = request.data.get("order_ids")
+        if order_ids is not None:
+            order_ids = [uuid.UUID(str(order_id)) for order_id in order_ids]
+    except (TypeError, ValueError) as e:
+        return Response(
+            {"error": f"Некорректные параметры: {e}"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    return Response(loading.pack(day, order_ids))
+
+
+def _trips_day(request):
+    value = request.data.get("date")
+    return datetime.date.fromisoformat(value) if value else None
+
+
+@api_view(["POST"])
+def trips_plan(request):
+    """
+    Пробный план рейсов для принятых заказов (см. orders/trips.py).
+    Параметр date — только заказы этого дня забора
+    """
+    try:
+        day = _trips_day(request)
+    except (TypeError, ValueError) as e:
+        return Response(
+            {"error": f"Некорректные параметры: {e}"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    return Response(trips.plan(day))
+
+
+@api_view(["POST"])
+def trips_apply(request):
+    """
+    Создает рейсы по плану и назначает экипажи заказам в одной транзакции,
+    затем отправляет уведомления по рейсам
+    """
+    try:
+        day = _trips_day(request)
+    except (TypeError, ValueError) as e:
+        return Response(
+            {"error": f"Некорректные параметры: {e}"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    return Response(trips.apply(day))
+
+
+@api_view(["GET"])
+def schedule_free(request):
+    """
+    Активные водители без смен в интервале from–to (ISO 8601)
+    """
+    try:
+        start, end = schedule.parse_window(request.query_params.get("from"), request.query_params.get("to"))
+    except ValueError as e:
+        return Response(
+            {"error": f"Некорректные параметры: {e}"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    drivers = schedule.free_drivers(start, end)
+    return Response({"from": start, "to": end, "drivers": DriverSerializer(drivers, many=True).data})
+
+
+@api_view(["GET"])
+def schedule_check(request):
+    """
+    Пересекается ли интервал from–to со сменами водителя driver_id.
+    exclude_id — смена, которую не учитывать (при переносе)
+    """
+    params = request.query_params
+    try:
+        start, end = schedule.parse_window(params.get("from"), params.get("to"))
+        driver_id = int(params.get("driver_id") or "")
+        exclude_id = int(params["exclude_id"]) if params.get("exclude_id") else None
+    except (TypeError, ValueError) as e:
+        return Response(
+            {"error": f"Некорректные параметры: {e}"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    shifts = schedule.conflicts(driver_id, start, end, exclude_id)
+    return Response({"collides": bool(shifts), "conflicts": DriverShiftSerializer(shifts, many=True).data})
+
+
+@conditional_page
 @api_view(["GET"])
 def get_service_names(request):
     """
@@ -1185,7 +1977,7 @@ def get_service_names(request):
         return Response(service_dict, status=status.HTTP_200_OK)
         
     except Exception as e:
-        logger.error(f"Error getting service names: {str(e)}")
+        logger.error("Error getting service names: %s", e)
         return Response(
             {"error": f"Failed to get service names: {str(e)}"},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
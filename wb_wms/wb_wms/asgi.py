@@ -5,12 +5,35 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
+
+Запуск: uvicorn wb_wms.asgi:application. Лента /orders/stream/ обслуживается
+отдельным ASGI-приложением (orders/stream.py) в обход Django.
 """
 
 import os
 
+from django.conf import settings
+from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "wb_wms.settings")
+# Без постоянных соединений по умолчанию (см. DB_CONN_MAX_AGE в settings.py)
+os.environ.setdefault("WB_WMS_ASGI", "1")
+
+django_application = get_asgi_application()
+if settings.DEBUG:
+    # Статика админки, как при runserver
+    django_application = ASGIStaticFilesHandler(django_application)
+
+# Импорт после настройки Django
+from orders.stream import OrderStreamApp  # noqa: E402
+
+STREAM_PATH = "/orders/stream/"
+stream_application = OrderStreamApp()
+
 
-application = get_asgi_application()
+async def application(scope, receive, send):
+    if scope["type"] == "http" and scope["path"] == STREAM_PATH:
+        await stream_application(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
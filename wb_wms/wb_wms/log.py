@@ -0,0 +1,93 @@
+"""
+Логирование вне пути обработки запроса.
+
+Запись попадает в ограниченную очередь через QueueHandler, а форматирование
+в JSON и запись в поток выполняет фоновый поток QueueListener. Запрос тратит
+на логирование только подстановку аргументов и помещение записи в очередь.
+"""
+import atexit
+import datetime
+import json
+import logging
+import queue
+import random
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+# Стандартные атрибуты LogRecord; всё остальное считается полями из extra
+_RECORD_ATTRS = frozenset(
+    vars(logging.LogRecord("", logging.INFO, "", 0, "", None, None))
+) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Форматирует запись в одну строку JSON, включая поля, переданные через extra
+    """
+
+    def format(self, record):
+        payload = {
+            "ts": datetime.datetime.fromtimestamp(
+                record.created, tz=datetime.timezone.utc
+            ).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            payload["stack_info"] = self.formatStack(record.stack_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class QueueListenerHandler(QueueHandler):
+    """
+    Обработчик для LOGGING: кладет записи в очередь и сам запускает
+    фоновый QueueListener, который пишет JSON в stderr.
+
+    При переполнении очереди запись отбрасывается, а не блокирует запрос.
+    """
+
+    def __init__(self, stream=None, queue_size=10000):
+        super().__init__(queue.Queue(maxsize=queue_size))
+        target = logging.StreamHandler(stream or sys.stderr)
+        target.setFormatter(JsonFormatter())
+        self.dropped = 0
+        self.listener = QueueListener(self.queue, target)
+        self.listener.start()
+        atexit.register(self.listener.stop)
+
+    def prepare(self, record):
+        # Очередь внутри процесса, поэтому запись не нужно сериализовать:
+        # фиксируем только текст сообщения, чтобы изменяемые аргументы
+        # не поменялись до форматирования в фоновом потоке
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Пропускает только долю rate записей уровня level и ниже.
+    Предназначен для отладочных строк на горячих путях (расчет стоимости).
+    """
+
+    def __init__(self, rate=0.01, level="DEBUG"):
+        super().__init__()
+        self.rate = float(rate)
+        self.level = logging.getLevelName(level) if isinstance(level, str) else level
+
+    def filter(self, record):
+        if record.levelno > self.level:
+            return True
+        return random.random() < self.rate
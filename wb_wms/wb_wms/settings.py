@@ -10,15 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
-import logging
 import os
 from pathlib import Path
 
 from dotenv import load_dotenv
 
-logging.basicConfig(level=logging.DEBUG)
-logger = logging.getLogger(__name__)
-
 # Загрузка переменных окружения из .env файла
 load_dotenv()
 
@@ -53,6 +49,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "orders.middleware.PerformanceMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -87,6 +84,14 @@ WSGI_APPLICATION = "wb_wms.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Под ASGI (wb_wms/asgi.py выставляет WB_WMS_ASGI) каждый запрос Django
+# выполняется в своем потоке, и постоянное соединение потока следующими
+# запросами не переиспользуется, а только занимает слот в PostgreSQL, —
+# поэтому по умолчанию соединения закрываются после запроса, как советует
+# документация Django. Под WSGI они держатся 60 секунд.
+SERVING_ASGI = os.environ.get("WB_WMS_ASGI") == "1"
+DB_CONN_MAX_AGE = (os.environ.get("DB_CONN_MAX_AGE") or ("0" if SERVING_ASGI else "60")).strip().lower()
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.postgresql",
@@ -95,6 +100,17 @@ DATABASES = {
         "PASSWORD": os.environ.get("POSTGRES_PASSWORD", "postgres"),
         "HOST": os.environ.get("POSTGRES_HOST", "db"),
         "PORT": os.environ.get("POSTGRES_PORT", "5432"),
+        # Постоянные соединения (WSGI): без CONN_MAX_AGE каждый запрос заново
+        # открывает TCP-соединение и проходит аутентификацию в PostgreSQL.
+        # "none" — держать соединение без ограничения по времени.
+        "CONN_MAX_AGE": (
+            None
+            if DB_CONN_MAX_AGE == "none"
+            else int(DB_CONN_MAX_AGE) if DB_CONN_MAX_AGE.isdigit() else DB_CONN_MAX_AGE
+        ),
+        # Перед переиспользованием соединение проверяется, чтобы запрос
+        # не упал на соединении, закрытом сервером или балансировщиком
+        "CONN_HEALTH_CHECKS": True,
     }
 }
 
@@ -142,12 +158,62 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 AUTH_USER_MODEL = "orders.User"
 
+# Django REST framework: JSON кодируется и разбирается orjson, если он
+# установлен (см. orders/renderers.py), иначе стандартным модулем json
+REST_FRAMEWORK = {
+    "DEFAULT_RENDERER_CLASSES": [
+        "orders.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "orders.renderers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
+}
+
 # Настройки CORS
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
 CORS_ALLOW_METHODS = ["*"]
 CORS_ALLOW_HEADERS = ["*"]
 
+# Логирование: JSON-записи пишутся фоновым потоком (см. wb_wms/log.py).
+# Отладочные строки расчета стоимости при LOG_LEVEL=DEBUG сэмплируются
+# с долей LOG_SAMPLE_RATE, чтобы не нагружать горячие пути.
+LOG_LEVEL = (os.environ.get("LOG_LEVEL") or "INFO").upper()
+LOG_SAMPLE_RATE = float(os.environ.get("LOG_SAMPLE_RATE") or "0.01")
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "filters": {
+        "hot_path_sampling": {
+            "()": "wb_wms.log.SamplingFilter",
+            "rate": LOG_SAMPLE_RATE,
+        },
+    },
+    "handlers": {
+        "queue": {
+            "()": "wb_wms.log.QueueListenerHandler",
+        },
+    },
+    "root": {
+        "handlers": ["queue"],
+        "level": LOG_LEVEL,
+    },
+    "loggers": {
+        "django": {
+            "handlers": ["queue"],
+            "level": "INFO",
+            "propagate": False,
+        },
+        "orders.models": {"filters": ["hot_path_sampling"]},
+        "orders.views": {"filters": ["hot_path_sampling"]},
+        "orders.serializers": {"filters": ["hot_path_sampling"]},
+    },
+}
+
 # Telegram settings
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 TELEGRAM_GROUP_ID = os.getenv("TELEGRAM_GROUP_ID")